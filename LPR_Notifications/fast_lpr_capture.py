@@ -213,7 +213,7 @@ class FastLPRCapture:
                     'confidence': confidence,
                     'thumbnail_id': thumbnail_id,
                     'vehicle_data': vehicle_data if vehicle_data else None,
-                    'detected_at': datetime.utcnow().isoformat()
+                    'detected_at': datetime.utcnow()
                 }
 
                 # Guard: ensure we only store events for allowed cameras
@@ -374,7 +374,7 @@ class FastLPRCapture:
                     'confidence': confidence,
                     'thumbnail_id': thumbnail_id,
                     'vehicle_data': vehicle_data if vehicle_data else None,
-                    'detected_at': datetime.utcnow().isoformat()
+                    'detected_at': datetime.utcnow()
                 }
                 
                 self.lpr_table.insert_one(doc)
@@ -16,6 +16,8 @@ import logging
 from datetime import datetime, timedelta
 from pymongo import MongoClient
 
+from LPR_Notifications.lpr_helpers import iter_event_windows
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -115,130 +117,129 @@ class FastLPRCapture:
             
             logger.info(f"⏱️  Catching up {gap_minutes:.0f} minutes of missing plates...")
             
-            # Get all events
-            events = await self.protect.get_events()
-            
+            # Page through the gap in bounded windows instead of fetching every event
             caught_up = 0
-            for event in events:
-                event_time = event.start.replace(tzinfo=None) if hasattr(event.start, 'replace') else event.start
+            async for events, _ in iter_event_windows(self.protect, catchup_start, catchup_end):
+                for event in events:
+                    event_time = event.start.replace(tzinfo=None) if hasattr(event.start, 'replace') else event.start
                 
-                # Only catch events in the gap
-                if event_time <= last_capture_time or event_time > catchup_end:
-                    continue
+                    # Only catch events in the gap
+                    if event_time <= last_capture_time or event_time > catchup_end:
+                        continue
                 
-                # Only process LPR camera events
-                if event.camera_id not in self.lpr_cameras:
-                    continue
+                    # Only process LPR camera events
+                    if event.camera_id not in self.lpr_cameras:
+                        continue
                 
-                # Check for license plate detection
-                if not event.smart_detect_types or 'licensePlate' not in event.smart_detect_types:
-                    continue
+                    # Check for license plate detection
+                    if not event.smart_detect_types or 'licensePlate' not in event.smart_detect_types:
+                        continue
                 
-                # Check if already stored
-                if self.lpr_table.find_one({'event_id': event.id}):
-                    continue
+                    # Check if already stored
+                    if self.lpr_table.find_one({'event_id': event.id}):
+                        continue
                 
-                # Extract license plate
-                license_plate = None
-                confidence = 0
-                thumbnail_id = None
-                vehicle_data = {}
+                    # Extract license plate
+                    license_plate = None
+                    confidence = 0
+                    thumbnail_id = None
+                    vehicle_data = {}
                 
-                if event.metadata and event.metadata.detected_thumbnails:
-                    for thumb in event.metadata.detected_thumbnails:
-                        if thumb.type == 'vehicle' and thumb.name:
-                            name_str = str(thumb.name).strip().upper()
-                            if len(name_str) > 0 and name_str != 'NONE':
-                                license_plate = name_str
-                                confidence = int(float(thumb.confidence)) if thumb.confidence else 0
-                                confidence = min(100, max(0, confidence))
+                    if event.metadata and event.metadata.detected_thumbnails:
+                        for thumb in event.metadata.detected_thumbnails:
+                            if thumb.type == 'vehicle' and thumb.name:
+                                name_str = str(thumb.name).strip().upper()
+                                if len(name_str) > 0 and name_str != 'NONE':
+                                    license_plate = name_str
+                                    confidence = int(float(thumb.confidence)) if thumb.confidence else 0
+                                    confidence = min(100, max(0, confidence))
                                 
-                                # Capture thumbnail and vehicle data
-                                thumbnail_id = thumb.cropped_id
+                                    # Capture thumbnail and vehicle data
+                                    thumbnail_id = thumb.cropped_id
                                 
-                                # Capture vehicle characteristics from thumbnail
-                                if thumb.coord:
-                                    vehicle_data['bounding_box'] = {
-                                        'x': thumb.coord[0] if len(thumb.coord) > 0 else None,
-                                        'y': thumb.coord[1] if len(thumb.coord) > 1 else None,
-                                        'width': thumb.coord[2] if len(thumb.coord) > 2 else None,
-                                        'height': thumb.coord[3] if len(thumb.coord) > 3 else None
-                                    }
+                                    # Capture vehicle characteristics from thumbnail
+                                    if thumb.coord:
+                                        vehicle_data['bounding_box'] = {
+                                            'x': thumb.coord[0] if len(thumb.coord) > 0 else None,
+                                            'y': thumb.coord[1] if len(thumb.coord) > 1 else None,
+                                            'width': thumb.coord[2] if len(thumb.coord) > 2 else None,
+                                            'height': thumb.coord[3] if len(thumb.coord) > 3 else None
+                                        }
                                 
-                                if thumb.object_id:
-                                    vehicle_data['object_id'] = thumb.object_id
+                                    if thumb.object_id:
+                                        vehicle_data['object_id'] = thumb.object_id
                                 
-                                # Capture vehicle attributes if available
-                                if thumb.attributes:
-                                    try:
-                                        attrs_dict = thumb.attributes.model_dump(exclude_none=True)
+                                    # Capture vehicle attributes if available
+                                    if thumb.attributes:
+                                        try:
+                                            attrs_dict = thumb.attributes.model_dump(exclude_none=True)
                                         
-                                        # Process attributes to extract readable values
-                                        processed_attrs = {}
-                                        for key, val in attrs_dict.items():
-                                            if isinstance(val, dict) and 'val' in val:
-                                                # Handle EventThumbnailAttribute with confidence and val
-                                                processed_attrs[key] = {
-                                                    'value': val['val'],
-                                                    'confidence': val.get('confidence', 0)
-                                                }
-                                            elif isinstance(val, dict) and 'confidence' in val and 'val' in val:
-                                                processed_attrs[key] = {
-                                                    'value': val['val'],
-                                                    'confidence': val.get('confidence', 0)
-                                                }
-                                            else:
-                                                processed_attrs[key] = val
+                                            # Process attributes to extract readable values
+                                            processed_attrs = {}
+                                            for key, val in attrs_dict.items():
+                                                if isinstance(val, dict) and 'val' in val:
+                                                    # Handle EventThumbnailAttribute with confidence and val
+                                                    processed_attrs[key] = {
+                                                        'value': val['val'],
+                                                        'confidence': val.get('confidence', 0)
+                                                    }
+                                                elif isinstance(val, dict) and 'confidence' in val and 'val' in val:
+                                                    processed_attrs[key] = {
+                                                        'value': val['val'],
+                                                        'confidence': val.get('confidence', 0)
+                                                    }
+                                                else:
+                                                    processed_attrs[key] = val
                                         
-                                        vehicle_data['attributes'] = processed_attrs
-                                    except Exception as e:
-                                        # Fallback if model_dump fails
-                                        logger.warning(f"Could not extract attributes: {e}")
+                                            vehicle_data['attributes'] = processed_attrs
+                                        except Exception as e:
+                                            # Fallback if model_dump fails
+                                            logger.warning(f"Could not extract attributes: {e}")
                                 
-                                if thumb.group:
-                                    try:
-                                        group_dict = thumb.group.model_dump(exclude_none=True)
-                                        vehicle_data['group'] = group_dict
-                                    except Exception as e:
-                                        logger.warning(f"Could not extract group: {e}")
+                                    if thumb.group:
+                                        try:
+                                            group_dict = thumb.group.model_dump(exclude_none=True)
+                                            vehicle_data['group'] = group_dict
+                                        except Exception as e:
+                                            logger.warning(f"Could not extract group: {e}")
                                 
-                                break
+                                    break
                 
-                # Store event
-                doc = {
-                    'event_id': event.id,
-                    'timestamp': event.start,
-                    'camera_id': event.camera_id,
-                    'camera_name': self.lpr_cameras[event.camera_id],
-                    'license_plate': license_plate or 'UNREAD',
-                    'confidence': confidence,
-                    'thumbnail_id': thumbnail_id,
-                    'vehicle_data': vehicle_data if vehicle_data else None,
-                    'detected_at': datetime.utcnow().isoformat()
-                }
+                    # Store event
+                    doc = {
+                        'event_id': event.id,
+                        'timestamp': event.start,
+                        'camera_id': event.camera_id,
+                        'camera_name': self.lpr_cameras[event.camera_id],
+                        'license_plate': license_plate or 'UNREAD',
+                        'confidence': confidence,
+                        'thumbnail_id': thumbnail_id,
+                        'vehicle_data': vehicle_data if vehicle_data else None,
+                        'detected_at': datetime.utcnow()
+                    }
 
-                # Guard: ensure we only store events for allowed cameras
-                cam = doc.get('camera_name') or ''
-                cam_id = doc.get('camera_id')
-                allowed_ids = {s.strip() for s in os.getenv('LPR_CAMERA_IDS', '').split(',') if s.strip()}
-                allowed_names = [s.strip() for s in os.getenv('LPR_CAMERA_NAMES', '').split(',') if s.strip()]
-                skip_subs = [s.strip().lower() for s in os.getenv('LPR_SKIP_CAMERA_SUBSTRINGS', 'Entry,Exit,Kiosk').split(',') if s.strip()]
+                    # Guard: ensure we only store events for allowed cameras
+                    cam = doc.get('camera_name') or ''
+                    cam_id = doc.get('camera_id')
+                    allowed_ids = {s.strip() for s in os.getenv('LPR_CAMERA_IDS', '').split(',') if s.strip()}
+                    allowed_names = [s.strip() for s in os.getenv('LPR_CAMERA_NAMES', '').split(',') if s.strip()]
+                    skip_subs = [s.strip().lower() for s in os.getenv('LPR_SKIP_CAMERA_SUBSTRINGS', 'Entry,Exit,Kiosk').split(',') if s.strip()]
 
-                if allowed_ids and cam_id not in allowed_ids:
-                    logger.info(f"Skipping store for event {event.id}: camera_id {cam_id} not in LPR_CAMERA_IDS")
-                    continue
-                if allowed_names and not any(sub in cam for sub in allowed_names):
-                    logger.info(f"Skipping store for event {event.id}: camera_name '{cam}' not matching LPR_CAMERA_NAMES")
-                    continue
-                if not allowed_ids and not allowed_names and any(sub in cam.lower() for sub in skip_subs):
-                    logger.info(f"Skipping store for event {event.id}: camera '{cam}' matches skip substrings {skip_subs}")
-                    continue
+                    if allowed_ids and cam_id not in allowed_ids:
+                        logger.info(f"Skipping store for event {event.id}: camera_id {cam_id} not in LPR_CAMERA_IDS")
+                        continue
+                    if allowed_names and not any(sub in cam for sub in allowed_names):
+                        logger.info(f"Skipping store for event {event.id}: camera_name '{cam}' not matching LPR_CAMERA_NAMES")
+                        continue
+                    if not allowed_ids and not allowed_names and any(sub in cam.lower() for sub in skip_subs):
+                        logger.info(f"Skipping store for event {event.id}: camera '{cam}' matches skip substrings {skip_subs}")
+                        continue
 
-                self.lpr_table.insert_one(doc)
-                caught_up += 1
+                    self.lpr_table.insert_one(doc)
+                    caught_up += 1
 
-                if license_plate and license_plate != 'UNREAD':
-                    logger.info(f"  ↻ Caught: {license_plate} ({confidence}%) @ {self.lpr_cameras[event.camera_id]}")
+                    if license_plate and license_plate != 'UNREAD':
+                        logger.info(f"  ↻ Caught: {license_plate} ({confidence}%) @ {self.lpr_cameras[event.camera_id]}")
             
             if caught_up > 0:
                 logger.info(f"✓ Catch-up complete: {caught_up} plates recovered")
@@ -314,7 +315,7 @@ class FastLPRCapture:
                     'camera_name': self.lpr_cameras[event.camera_id],
                     'license_plate': license_plate or 'UNREAD',
                     'confidence': confidence,
-                    'detected_at': datetime.utcnow().isoformat(),
+                    'detected_at': datetime.utcnow(),
                     'origin': 'fast_capture_fixed'
                 }
 
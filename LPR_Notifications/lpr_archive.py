@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Cold-storage format for archived LPR detections: day partitions on local disk
+plus a JSON manifest with per-file counts, plate/time ranges and checksums.
+
+Partitions are zstd Parquet when pyarrow is installed, otherwise zstd NDJSON
+(`zstandard`), otherwise gzip NDJSON. Every row keeps the full document as
+MongoDB extended JSON so an archived detection can be restored as-is."""
+
+import io
+import os
+import json
+import gzip
+import hashlib
+from datetime import datetime, timedelta
+
+from bson import json_util
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional
+    pa = pq = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+FORMATS = {'parquet': '.parquet', 'ndjson.zst': '.ndjson.zst', 'ndjson.gz': '.ndjson.gz'}
+MANIFEST = 'manifest.json'
+# Archived timestamps come back naive UTC, like pymongo returns them
+JSON_OPTIONS = json_util.JSONOptions(tz_aware=False)
+# Columns kept outside the JSON blob so Parquet readers can filter on them
+COLUMNS = ('event_id', 'timestamp', 'camera_id', 'camera_name', 'license_plate', 'confidence', 'user_email', 'user_name')
+
+
+def archive_dir():
+    return os.getenv('LPR_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lpr_archive'))
+
+
+def available_formats():
+    formats = []
+    if pq is not None:
+        formats.append('parquet')
+    if zstandard is not None:
+        formats.append('ndjson.zst')
+    formats.append('ndjson.gz')
+    return formats
+
+
+def pick_format(preferred='auto'):
+    """Return the best available format, or `preferred` if it is installed."""
+    formats = available_formats()
+    if preferred == 'auto':
+        return formats[0]
+    if preferred not in formats:
+        raise ValueError(f"format {preferred!r} needs a missing dependency (available: {', '.join(formats)})")
+    return preferred
+
+
+def day_start(ts):
+    return datetime(ts.year, ts.month, ts.day)
+
+
+def partition_path(root, day, part, fmt):
+    return os.path.join(root, f"date={day:%Y-%m-%d}", f"part-{part:04d}{FORMATS[fmt]}")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_partition(path, docs, fmt):
+    """Write docs (sorted by plate, then time) to `path` atomically; returns the sha256."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    if fmt == 'parquet':
+        rows = {col: [d.get(col) for d in docs] for col in COLUMNS}
+        rows['_id'] = [str(d['_id']) for d in docs]
+        rows['doc'] = [json_util.dumps(d) for d in docs]
+        schema = pa.schema([
+            ('_id', pa.string()), ('event_id', pa.string()), ('timestamp', pa.timestamp('ms')),
+            ('camera_id', pa.string()), ('camera_name', pa.string()), ('license_plate', pa.string()),
+            ('confidence', pa.float64()), ('user_email', pa.string()), ('user_name', pa.string()),
+            ('doc', pa.string()),
+        ])
+        rows['confidence'] = [float(c) if isinstance(c, (int, float)) else None for c in rows['confidence']]
+        for col in ('event_id', 'camera_id', 'camera_name', 'license_plate', 'user_email', 'user_name'):
+            rows[col] = [None if v is None else str(v) for v in rows[col]]
+        # Small row groups keep plate min/max statistics selective
+        pq.write_table(pa.Table.from_pydict(rows, schema=schema), tmp, compression='zstd', row_group_size=10000)
+    else:
+        with _open_ndjson(tmp, fmt, 'wb') as f:
+            for d in docs:
+                f.write(json_util.dumps(d).encode('utf-8') + b'\n')
+    with open(tmp, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return file_sha256(path)
+
+
+def _open_ndjson(path, fmt, mode):
+    if fmt == 'ndjson.zst':
+        cctx = zstandard.ZstdCompressor(level=10) if 'w' in mode else zstandard.ZstdDecompressor()
+        raw = open(path, mode)
+        return cctx.stream_writer(raw, closefd=True) if 'w' in mode else cctx.stream_reader(raw, closefd=True)
+    return gzip.open(path, mode, compresslevel=9) if 'w' in mode else gzip.open(path, mode)
+
+
+def read_partition(path, fmt, plate=None, camera=None, start=None, end=None):
+    """Yield archived documents from one partition matching the optional filters."""
+    if fmt == 'parquet':
+        filters = []
+        if plate:
+            filters.append(('license_plate', '=', plate))
+        table = pq.read_table(path, columns=['doc'], filters=filters or None)
+        for line in table.column('doc').to_pylist():
+            doc = json_util.loads(line, json_options=JSON_OPTIONS)
+            if _matches(doc, plate, camera, start, end):
+                yield doc
+        return
+    with io.TextIOWrapper(_open_ndjson(path, fmt, 'rb'), encoding='utf-8') as lines:
+        for line in lines:
+            doc = json_util.loads(line, json_options=JSON_OPTIONS)
+            if _matches(doc, plate, camera, start, end):
+                yield doc
+
+
+def _matches(doc, plate, camera, start, end):
+    if plate and doc.get('license_plate') != plate:
+        return False
+    if camera and camera not in (doc.get('camera_id'), doc.get('camera_name')):
+        return False
+    ts = doc.get('timestamp')
+    if start and (ts is None or ts < start):
+        return False
+    if end and (ts is None or ts >= end):
+        return False
+    return True
+
+
+def partition_entry(path, root, fmt, day, docs, sha256):
+    """Manifest entry for a written partition."""
+    plates = [d['license_plate'] for d in docs if d.get('license_plate')]
+    stamps = [d['timestamp'] for d in docs]
+    return {
+        'file': os.path.relpath(path, root),
+        'format': fmt,
+        'date': f"{day:%Y-%m-%d}",
+        'count': len(docs),
+        'min_plate': min(plates) if plates else None,
+        'max_plate': max(plates) if plates else None,
+        'start': min(stamps).isoformat(),
+        'end': max(stamps).isoformat(),
+        'cameras': sorted({d.get(k) for d in docs for k in ('camera_id', 'camera_name') if d.get(k)}),
+        'bytes': os.path.getsize(path),
+        'sha256': sha256,
+        'created_at': datetime.utcnow().isoformat(),
+        'deleted': False,
+    }
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'partitions': []}
+
+
+def save_manifest(root, manifest):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def prune_partitions(entries, plate=None, camera=None, start=None, end=None):
+    """Return manifest entries that can contain matches, using date, plate range and camera stats."""
+    selected = []
+    for e in entries:
+        day = datetime.strptime(e['date'], '%Y-%m-%d')
+        if start and day + timedelta(days=1) <= start:
+            continue
+        if end and day >= end:
+            continue
+        if plate and e.get('min_plate') and not (e['min_plate'] <= plate <= e['max_plate']):
+            continue
+        if camera and camera not in e.get('cameras', []):
+            continue
+        selected.append(e)
+    return selected
+
+
+__all__ = [
+    'FORMATS', 'archive_dir', 'available_formats', 'pick_format', 'day_start', 'partition_path',
+    'file_sha256', 'write_partition', 'read_partition', 'partition_entry', 'load_manifest',
+    'save_manifest', 'prune_partitions',
+]
@@ -139,7 +139,7 @@ class LPRCaptureV3:
                 'camera_name': self.lpr_cameras[event.camera_id],
                 'license_plate': license_plate or 'UNREAD',
                 'confidence': confidence,
-                'detected_at': datetime.utcnow().isoformat(),
+                'detected_at': datetime.utcnow(),
                 'raw_metadata': str(event.metadata) if event.metadata else None,
                 'origin': 'capture_v3'
             }
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Time-window coalescing of repeat reads of the same vehicle.
+
+An LPR camera often reports several events for one car waiting at the gate.
+`ReadCoalescer` holds the first read of a plate at a camera for `window`
+seconds; later reads of the same plate key at that camera within the window
+(by event timestamp) fold into it instead of becoming their own document:
+
+    read_count          reads folded into the document
+    first_seen/last_seen  event timestamps of the first and last read
+    confidence          highest read confidence; plate text and vehicle data
+                        come from that read and `best_event_id` names its event
+    coalesced_event_ids event ids of the folded reads (capped), so a later
+                        replay of the same events is recognized as stored
+
+A held read is released once its window has passed on the wall clock, when a
+read of the same key falls outside the window, when more than `max_pending`
+keys are held (oldest first), or by `drain()` at shutdown. Held reads exist only
+in memory, so `oldest_pending()` bounds how far a persisted checkpoint may
+advance."""
+
+import time
+from collections import OrderedDict
+
+from LPR_Notifications.lpr_helpers import plate_key
+
+MAX_COALESCED_IDS = 50
+# Fields taken from the highest-confidence read
+BEST_READ_FIELDS = ('license_plate', 'confidence', 'vehicle_data', 'color', 'vehicle_type', 'group',
+                    'plate_key', 'plate_ngrams')
+
+
+class ReadCoalescer:
+    def __init__(self, window, max_pending=1000, clock=time.monotonic):
+        self.window = window
+        self.max_pending = max_pending
+        self.clock = clock
+        self.pending = OrderedDict()  # (plate key, camera_id) -> [doc, released at]
+        self.held_ids = set()
+        self.stats = {'reads': 0, 'written': 0, 'folded': 0, 'evicted': 0}
+
+    def _key(self, doc):
+        return plate_key(doc.get('license_plate')), doc.get('camera_id')
+
+    def holds(self, event_id):
+        """True when the event is part of a read still held in memory."""
+        return event_id in self.held_ids
+
+    def add(self, doc):
+        """Add a read; returns the documents that are ready to be written."""
+        self.stats['reads'] += 1
+        ready = []
+        key = self._key(doc)
+        if key[0] is None:
+            self.stats['written'] += 1
+            return [doc]
+        entry = self.pending.get(key)
+        if entry is not None:
+            held = entry[0]
+            if abs((doc['timestamp'] - held['first_seen']).total_seconds()) <= self.window:
+                self._fold(held, doc)
+                return ready
+            ready.append(self._release(key))
+
+        doc = dict(doc, read_count=1, first_seen=doc['timestamp'], last_seen=doc['timestamp'])
+        self.pending[key] = [doc, self.clock() + self.window]
+        self.held_ids.add(doc['event_id'])
+        while len(self.pending) > self.max_pending:
+            self.stats['evicted'] += 1
+            ready.append(self._release(next(iter(self.pending))))
+        return ready
+
+    def _fold(self, held, doc):
+        self.stats['folded'] += 1
+        held['read_count'] += 1
+        held['first_seen'] = min(held['first_seen'], doc['timestamp'])
+        held['last_seen'] = max(held['last_seen'], doc['timestamp'])
+        ids = held.setdefault('coalesced_event_ids', [])
+        if len(ids) < MAX_COALESCED_IDS:
+            ids.append(doc['event_id'])
+            self.held_ids.add(doc['event_id'])
+        if (doc.get('confidence') or 0) > (held.get('confidence') or 0):
+            for field in BEST_READ_FIELDS:
+                if field in doc:
+                    held[field] = doc[field]
+            held['best_event_id'] = doc['event_id']
+
+    def _release(self, key):
+        doc, _ = self.pending.pop(key)
+        self.held_ids.discard(doc['event_id'])
+        self.held_ids.difference_update(doc.get('coalesced_event_ids', ()))
+        self.stats['written'] += 1
+        return doc
+
+    def oldest_pending(self):
+        """Return the earliest first_seen of the held reads, or None when nothing is held."""
+        return min((doc['first_seen'] for doc, _ in self.pending.values()), default=None)
+
+    def expire(self):
+        """Return the held documents whose window has passed."""
+        now = self.clock()
+        return [self._release(key) for key, (_, release_at) in list(self.pending.items()) if release_at <= now]
+
+    def drain(self):
+        """Return every held document (shutdown)."""
+        return [self._release(key) for key in list(self.pending)]
+
+    def report(self):
+        """Return the coalescing ratio and write reduction so far."""
+        reads, written = self.stats['reads'], self.stats['written'] + len(self.pending)
+        return {
+            **self.stats,
+            'pending': len(self.pending),
+            'ratio': reads / written if written else 1.0,
+            'writes_saved_pct': (1 - written / reads) * 100 if reads else 0.0,
+        }
+
+
+__all__ = ['MAX_COALESCED_IDS', 'ReadCoalescer']
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Compact detection schema.
+
+A compact detection keeps only what cannot be derived elsewhere, under short
+field names:
+
+    _id  same ObjectId as the license_plates document (its generation time
+         stands in for the dropped `detected_at`)
+    e    Protect event id, as an ObjectId when it is 24 hex characters
+    t    timestamp
+    c    small integer camera reference into `lpr_cameras` ({_id, camera_id, name})
+    p    plate as read
+    cf   confidence
+    o    owner reference {s: 'u'|'v', id: users_cache/visitors _id}; absent when unknown.
+         Resolved from `misread_link.plate` when reconcile_misreads.py linked the read
+    ml   misread_link audit field, as stored
+    pc   plate_candidate (nearest registered plate for an unowned read), as stored
+    og   origin code (absent for live capture)
+    v    normalized vehicle attributes {c: color, t: vehicle_type, g: group}
+    ng   plate n-grams for partial-plate search
+    th   thumbnail metadata, when present
+
+Owner names and e-mails are resolved through the reference when read, so they
+never go stale. `expand_compact` turns a compact document back into the
+license_plates shape."""
+
+import re
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from LPR_Notifications.lpr_helpers import plate_ngrams, plate_key, vehicle_fields, owner_info, registered_plates
+
+CAMERA_COLLECTION = 'lpr_cameras'
+ORIGIN_CODES = {
+    'catchup': 'c', 'backfill': 'b', 'event_capture': 'e', 'microservice': 'm', 'microservice_v2': 'm2',
+    'websocket_listener': 'w', 'capture_v3': 'v3', 'synthetic': 's',
+}
+ORIGIN_NAMES = {code: name for name, code in ORIGIN_CODES.items()}
+OWNER_SOURCES = {'users_cache': 'u', 'visitors': 'v'}
+VEHICLE_KEYS = {'color': 'c', 'vehicle_type': 't', 'group': 'g'}
+_HEX24 = re.compile(r'^[0-9a-f]{24}$')
+
+
+def encode_event_id(event_id):
+    """Return a 12-byte ObjectId for 24-hex Protect event ids, otherwise the string."""
+    if isinstance(event_id, str) and _HEX24.match(event_id):
+        return ObjectId(event_id)
+    return event_id
+
+
+def decode_event_id(value):
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+class CameraRegistry:
+    """Maps Protect camera ids to small integer references stored in `lpr_cameras`"""
+
+    def __init__(self, db):
+        self.coll = db[CAMERA_COLLECTION]
+        self.coll.create_index('camera_id', unique=True)
+        self.by_camera = {}
+        self.by_ref = {}
+        for doc in self.coll.find():
+            self.by_camera[doc['camera_id']] = doc['_id']
+            self.by_ref[doc['_id']] = doc
+
+    def ref(self, camera_id, name=None):
+        """Return the reference for a camera, registering it (and renames) as needed."""
+        if camera_id is None:
+            return None
+        ref = self.by_camera.get(camera_id)
+        if ref is not None:
+            if name and self.by_ref[ref].get('name') != name:
+                self.coll.update_one({'_id': ref}, {'$set': {'name': name}})
+                self.by_ref[ref]['name'] = name
+            return ref
+        while True:
+            existing = self.coll.find_one({'camera_id': camera_id})
+            if existing:
+                doc = existing
+                break
+            last = self.coll.find_one(sort=[('_id', -1)])
+            doc = {'_id': (last['_id'] + 1) if last else 1, 'camera_id': camera_id, 'name': name}
+            try:
+                self.coll.insert_one(doc)
+                break
+            except DuplicateKeyError:
+                continue  # another writer took this number or registered the camera
+        self.by_camera[camera_id] = doc['_id']
+        self.by_ref[doc['_id']] = doc
+        return doc['_id']
+
+
+def load_owner_refs(db):
+    """Return {PLATE: {s, id}} owner references from users_cache/visitors (users_cache wins)."""
+    refs = {}
+    for source, code in OWNER_SOURCES.items():
+        for doc in db[source].find({'license_plates.0': {'$exists': True}}, {'license_plates': 1}):
+            for plate in registered_plates(doc):
+                refs.setdefault(plate, {'s': code, 'id': doc['_id']})
+    return refs
+
+
+def load_owner_details(db):
+    """Return {(source code, _id): owner fields} for resolving compact owner references."""
+    details = {}
+    for source, code in OWNER_SOURCES.items():
+        for doc in db[source].find({'license_plates.0': {'$exists': True}}):
+            info = owner_info(doc, source)
+            details[(code, doc['_id'])] = {'user_email': info['user_email'], 'user_name': info['user_name']}
+    return details
+
+
+def to_compact(doc, cameras, owner_refs):
+    """Return the compact form of a license_plates document."""
+    plate = doc.get('license_plate')
+    compact = {
+        '_id': doc['_id'],
+        'e': encode_event_id(doc.get('event_id') or doc.get('protect_event_id')),
+        't': doc.get('timestamp'),
+        'c': cameras.ref(doc.get('camera_id'), doc.get('camera_name')),
+        'p': plate,
+        'cf': doc.get('confidence'),
+    }
+    # A linked misread belongs to the owner of the plate it was linked to
+    linked = (doc.get('misread_link') or {}).get('plate') or plate
+    owner = owner_refs.get(str(linked).strip().upper()) if linked else None
+    if owner:
+        compact['o'] = owner
+    if doc.get('misread_link'):
+        compact['ml'] = doc['misread_link']
+    if doc.get('plate_candidate'):
+        compact['pc'] = doc['plate_candidate']
+    origin = doc.get('origin')
+    if origin:
+        compact['og'] = ORIGIN_CODES.get(origin, origin)
+    vehicle = {VEHICLE_KEYS[k]: v for k, v in vehicle_fields(doc).items()}
+    if vehicle:
+        compact['v'] = vehicle
+    grams = plate_ngrams(plate_key(plate))
+    if grams:
+        compact['ng'] = grams
+    if doc.get('thumbnails'):
+        compact['th'] = doc['thumbnails']
+    return {k: v for k, v in compact.items() if v is not None}
+
+
+def expand_compact(compact, cameras, owners=None):
+    """Return a license_plates-shaped document for a compact one.
+
+    `cameras` is a CameraRegistry; `owners` is the mapping from
+    `load_owner_details` and may be omitted.
+    """
+    camera = cameras.by_ref.get(compact.get('c')) or {}
+    doc = {
+        '_id': compact['_id'],
+        'event_id': decode_event_id(compact.get('e')),
+        'timestamp': compact.get('t'),
+        'camera_id': camera.get('camera_id'),
+        'camera_name': camera.get('name'),
+        'license_plate': compact.get('p'),
+        'confidence': compact.get('cf'),
+        'detected_at': compact['_id'].generation_time.replace(tzinfo=None),
+        'user_email': 'unknown',
+        'user_name': 'Unknown',
+    }
+    owner = compact.get('o')
+    if owner and owners is not None:
+        doc.update(owners.get((owner['s'], owner['id'])) or {})
+    if compact.get('og'):
+        doc['origin'] = ORIGIN_NAMES.get(compact['og'], compact['og'])
+    for field, key in VEHICLE_KEYS.items():
+        if key in compact.get('v', {}):
+            doc[field] = compact['v'][key]
+    if compact.get('ml'):
+        doc['misread_link'] = compact['ml']
+    if compact.get('pc'):
+        doc['plate_candidate'] = compact['pc']
+    if compact.get('th'):
+        doc['thumbnails'] = compact['th']
+    return doc
+
+
+__all__ = [
+    'CAMERA_COLLECTION', 'ORIGIN_CODES', 'encode_event_id', 'decode_event_id', 'CameraRegistry',
+    'load_owner_refs', 'load_owner_details', 'to_compact', 'expand_compact',
+]
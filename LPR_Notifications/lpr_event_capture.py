@@ -2,7 +2,7 @@
 """
 UniFi Protect LPR Event Capture Service
 Continuously polls for license plate detection events from the 2 LPR cameras
-Stores all detected plates in MongoDB with full metadata
+Stores all detected plates in MongoDB; raw event metadata goes to `event_raw`
 
 Usage:
   python lpr_event_capture.py              # Run continuously
@@ -43,7 +43,8 @@ if not MONGO_URL:
 import re
 
 # Shared sanitizer helper
-from LPR_Notifications.lpr_helpers import sanitize_plate
+from LPR_Notifications.lpr_helpers import sanitize_plate, plate_search_fields, record_plate_activity
+from LPR_Notifications.lpr_event_raw import raw_enabled, store_event_raw
 
 PLATE_REGEX = re.compile(r'^[A-Z0-9-]{2,}$')
 MIN_CONF = int(os.getenv('LPR_MIN_CONF', '50'))
@@ -119,7 +120,9 @@ class LPREventCapture:
             self.lpr_collection.create_index('timestamp')
             self.lpr_collection.create_index('license_plate')
             self.lpr_collection.create_index('camera_id')
-            self.lpr_collection.create_index('protect_event_id', unique=True)
+            self.lpr_collection.create_index('event_id', unique=True)
+            self.lpr_collection.create_index('plate_key')
+            self.lpr_collection.create_index('plate_ngrams')
             
             logger.info(f"✓ Connected to MongoDB (db: {self.db.name})")
             logger.info(f"✓ Using collection: license_plates")
@@ -160,7 +163,7 @@ class LPREventCapture:
                     
                     # Check if already stored
                     existing = self.lpr_collection.find_one({
-                        'protect_event_id': event.id
+                        'event_id': event.id
                     })
                     
                     if existing:
@@ -209,7 +212,7 @@ class LPREventCapture:
 
                     # Store event
                     doc = {
-                        'protect_event_id': event.id,
+                        'event_id': event.id,
                         'timestamp': event.start,
                         'end_time': event.end,
                         'camera_id': event.camera_id,
@@ -219,11 +222,10 @@ class LPREventCapture:
                         'thumbnail': event.thumbnail,
                         'license_plate': license_plate,
                         'confidence': confidence,
-                    'origin': 'event_capture',
-                    
-                    # Attach metadata if available
-                    if hasattr(event, 'metadata') and event.metadata:
-                        doc['metadata'] = event.metadata
+                        'origin': 'event_capture',
+                        # plate_key / plate_ngrams for /api/lpr/search partial matches
+                        **plate_search_fields(license_plate),
+                    }
 
                     # Guard: enforce allowed cameras if configured, otherwise skip common non-LPR substrings
                     cam = doc.get('camera_name') or ''
@@ -244,6 +246,16 @@ class LPREventCapture:
 
                     try:
                         result = self.lpr_collection.insert_one(doc)
+                        try:
+                            record_plate_activity(self.db, doc)
+                        except Exception as e:
+                            logger.warning(f"plate_activity update failed for {license_plate}: {e}")
+                        # Raw metadata goes to the compressed side store, not the hot document
+                        if raw_enabled() and getattr(event, 'metadata', None):
+                            try:
+                                store_event_raw(self.db, event.id, event.metadata, 'event_capture')
+                            except Exception as e:
+                                logger.warning(f"event_raw write failed for event {event.id}: {e}")
                         self.stats['lpr_events_found'] += 1
                         self.stats['plates_captured'] += 1
                         logger.info(f"✓ Stored LPR event from {camera_name}: {event.id} (plate: {license_plate})")
@@ -258,6 +270,7 @@ class LPREventCapture:
                                     'license_plate': license_plate,
                                     'confidence': confidence,
                                     'error': str(e),
+                                    'error_type': type(e).__name__,
                                     'timestamp': datetime.utcnow()
                                 })
                         except Exception:
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Compressed side store for raw Protect event payloads.
+
+Detections keep only the fields we query; the raw event metadata (or the raw
+websocket message) goes to the `event_raw` collection, one document per event:
+
+    {_id: event id, source, codec: 'zstd'|'zlib', data: <compressed JSON>,
+     raw_bytes, stored_bytes, stored_at}
+
+Payloads are compact JSON compressed with zstd when `zstandard` is installed,
+otherwise zlib; `load_event_raw` reads either. Nothing on the hot path reads
+this collection: it is for debugging and re-extraction. Set LPR_EVENT_RAW=false
+to stop storing payloads."""
+
+import os
+import json
+import zlib
+from datetime import datetime
+
+from bson import Binary
+
+try:
+    import zstandard
+except ImportError:  # optional: better ratio and speed than zlib
+    zstandard = None
+
+RAW_COLLECTION = os.getenv('LPR_EVENT_RAW_COLLECTION', 'event_raw')
+ZSTD_LEVEL = 10
+
+
+def raw_enabled():
+    return os.getenv('LPR_EVENT_RAW', 'true').lower() not in ('0', 'false', 'no')
+
+
+def raw_payload(obj):
+    """Return a JSON-serializable form of a Protect object (event metadata, websocket message)."""
+    if obj is None or isinstance(obj, (dict, list, str, int, float, bool)):
+        return obj
+    for method in ('unifi_dict', 'model_dump', 'dict'):
+        fn = getattr(obj, method, None)
+        if callable(fn):
+            try:
+                return fn()
+            except Exception:
+                continue
+    if hasattr(obj, '__dict__'):
+        return {k: raw_payload(v) for k, v in vars(obj).items() if not k.startswith('_') and not callable(v)}
+    return str(obj)
+
+
+def encode_raw(payload):
+    """Return (codec, compressed bytes, uncompressed size) for a payload."""
+    data = json.dumps(raw_payload(payload), separators=(',', ':'), default=str).encode('utf-8')
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), len(data)
+    return 'zlib', zlib.compress(data, 9), len(data)
+
+
+def decode_raw(doc):
+    """Return the payload stored in an event_raw document."""
+    data = bytes(doc['data'])
+    if doc.get('codec') == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('event_raw payload is zstd-compressed; pip install zstandard to read it')
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+def raw_document(key, payload, source):
+    codec, data, raw_bytes = encode_raw(payload)
+    return {
+        '_id': key,
+        'source': source,
+        'codec': codec,
+        'data': Binary(data),
+        'raw_bytes': raw_bytes,
+        'stored_bytes': len(data),
+        'stored_at': datetime.utcnow(),
+    }
+
+
+def store_event_raw(db, key, payload, source):
+    """Store a payload under `key` (the event id) unless one is already stored. Returns the document."""
+    doc = raw_document(key, payload, source)
+    fields = {k: v for k, v in doc.items() if k != '_id'}
+    db[RAW_COLLECTION].update_one({'_id': key}, {'$setOnInsert': fields}, upsert=True)
+    return doc
+
+
+def load_event_raw(db, key):
+    """Return the stored payload for an event id, or None."""
+    doc = db[RAW_COLLECTION].find_one({'_id': key})
+    return decode_raw(doc) if doc else None
+
+
+__all__ = [
+    'RAW_COLLECTION', 'raw_enabled', 'raw_payload', 'encode_raw', 'decode_raw', 'raw_document',
+    'store_event_raw', 'load_event_raw',
+]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Detection fields extracted from a raw Protect event payload.
+
+This is the extraction pipeline applied to payloads read back from the
+`event_raw` side store (LPR_Notifications/lpr_event_raw.py), so historical
+detections can be recomputed when the rules change. A payload is the event
+metadata as serialized by the producers (camelCase `detectedThumbnails` or
+snake_case `detected_thumbnails`), the `{metadata: ...}` wrapper written by
+offload_event_raw.py, or a stringified websocket message.
+
+The plate is the first vehicle thumbnail's name passed through
+`sanitize_plate`; Protect reports thumbnail confidence as a 0-100 percentage in
+every payload shape, which is what the other producers store (callers with a
+0-1 source pass `fraction=True` to `normalize_confidence`); vehicle attributes
+are flattened into `vehicle_data` and the normalized `color`/`vehicle_type`/`group`."""
+
+import re
+
+from LPR_Notifications.lpr_helpers import sanitize_plate, plate_search_fields, vehicle_fields
+
+_WS_PLATE = re.compile(r"name='?([A-Z0-9-]{2,})'?")
+_WS_CONFIDENCE = re.compile(r"confidence=(\d+(?:\.\d+)?)")
+
+
+def normalize_confidence(value, fraction=False):
+    """Return a 0-100 integer confidence (None if missing).
+
+    The scale comes from the source, not the value: a percentage by default,
+    a 0-1 fraction with `fraction=True` (so 1.0 is 100%, and 1 stays 1% otherwise).
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if fraction:
+        value *= 100
+    return int(min(100, max(0, round(value))))
+
+
+def _get(d, *names):
+    for name in names:
+        if isinstance(d, dict) and d.get(name) is not None:
+            return d[name]
+    return None
+
+
+def thumbnail_vehicle_data(thumb):
+    """Return `vehicle_data` ({attributes: {color, vehicleType}, group}) from a serialized vehicle thumbnail."""
+    vehicle_data = {}
+    attrs = _get(thumb, 'attributes') or {}
+    attributes = {}
+    for key, names in (('color', ('color',)), ('vehicleType', ('vehicleType', 'vehicle_type'))):
+        attr = _get(attrs, *names)
+        value = _get(attr, 'val', 'value') if isinstance(attr, dict) else attr
+        if value:
+            attributes[key] = {'value': value, 'confidence': _get(attr, 'confidence')}
+    if attributes:
+        vehicle_data['attributes'] = attributes
+    group = _get(thumb, 'group')
+    name = _get(group, 'matchedName', 'matched_name', 'name') if isinstance(group, dict) else group
+    if name:
+        vehicle_data['group'] = {'name': name, 'confidence': _get(group, 'confidence')}
+    return vehicle_data
+
+
+def extract_detection(payload):
+    """Return the detection fields derived from a raw payload, or None when it holds no plate."""
+    if isinstance(payload, dict) and 'metadata' in payload:
+        payload = payload['metadata']
+    if isinstance(payload, dict) and 'raw_message' in payload:
+        payload = payload['raw_message']
+
+    if isinstance(payload, str):
+        # Websocket messages were only kept as str(msg); read the plate the way the listener does
+        start = max(payload.find('detected_thumbnails'), payload.find('detectedThumbnails'))
+        match = _WS_PLATE.search(payload, start) if start >= 0 else None
+        plate = sanitize_plate(match.group(1)) if match else None
+        if not plate:
+            return None
+        conf = _WS_CONFIDENCE.search(payload[match.end():])
+        fields = {'license_plate': plate, 'confidence': normalize_confidence(conf.group(1)) if conf else None}
+    else:
+        thumbs = _get(payload, 'detectedThumbnails', 'detected_thumbnails') or []
+        thumb = next((t for t in thumbs if isinstance(t, dict) and t.get('type') == 'vehicle'
+                      and sanitize_plate(t.get('name'))), None)
+        if thumb is None:
+            return None
+        fields = {
+            'license_plate': sanitize_plate(thumb['name']),
+            'confidence': normalize_confidence(thumb.get('confidence')),
+        }
+        vehicle_data = thumbnail_vehicle_data(thumb)
+        if vehicle_data:
+            fields['vehicle_data'] = vehicle_data
+        fields.update(vehicle_fields(fields))
+
+    fields.update(plate_search_fields(fields['license_plate']))
+    return {k: v for k, v in fields.items() if v is not None}
+
+
+__all__ = ['normalize_confidence', 'thumbnail_vehicle_data', 'extract_detection']
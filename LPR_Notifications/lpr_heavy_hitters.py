@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Bounded-memory tracking of the most frequent unregistered plates.
+
+`SpaceSaving` is the Space-Saving heavy-hitter summary: at most `capacity`
+counters. A plate that is already counted is incremented; a new plate takes
+over the smallest counter when the table is full and inherits its count as
+`error`. Every plate seen more than N / capacity times is guaranteed to be in
+the table, `count` never underestimates and `count - error` never
+overestimates. Summaries of the same period merge by adding counts.
+
+`UnknownPlateTracker` keeps one summary per UTC day (`day:2026-10-18`) and ISO
+week (`week:2026-W42`) for detections with `user_email: 'unknown'`. It keeps
+the current and previous period of each, so catch-up of yesterday's events
+still counts, and drops older reads. Once a plate's guaranteed count reaches
+the day or week threshold the tracker returns an alert for it, once per plate
+per period. Snapshots look like:
+
+    {_id: 'day:2026-10-18', granularity: 'day', period: '2026-10-18',
+     period_start, capacity, reads, counters: [{plate_key, license_plate,
+     count, error}], updated_at}
+
+Memory is fixed: 2 granularities x 2 periods x `capacity` counters."""
+
+import heapq
+from datetime import datetime, timedelta
+
+from LPR_Notifications.lpr_helpers import plate_key
+
+HEAVY_HITTERS_COLLECTION = 'lpr_unknown_heavy_hitters'
+ALERTS_COLLECTION = 'lpr_unknown_alerts'
+GRANULARITIES = ('day', 'week')
+DEFAULT_CAPACITY = 500
+
+
+def period_of(ts, granularity):
+    """Return (period id, period start) of a timestamp: '2026-10-18' or '2026-W42'."""
+    day = datetime(ts.year, ts.month, ts.day)
+    if granularity == 'day':
+        return day.strftime('%Y-%m-%d'), day
+    year, week, weekday = ts.isocalendar()[:3]
+    return f"{year}-W{week:02d}", day - timedelta(days=weekday - 1)
+
+
+class SpaceSaving:
+    """Top-k counter summary in `capacity` slots"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError('capacity must be at least 1')
+        self.capacity = capacity
+        self.counters = {}   # key -> [count, error, label]
+        self.heap = []       # (count, key); stale entries are skipped lazily
+        self.total = 0
+
+    def __len__(self):
+        return len(self.counters)
+
+    def __contains__(self, key):
+        return key in self.counters
+
+    def _pop_min(self):
+        while True:
+            count, key = heapq.heappop(self.heap)
+            entry = self.counters.get(key)
+            if entry is not None and entry[0] == count:
+                return key, entry
+
+    def _push(self, key, count):
+        heapq.heappush(self.heap, (count, key))
+        if len(self.heap) > 4 * self.capacity:
+            # Drop stale entries so the heap stays bounded
+            self.heap = [(e[0], k) for k, e in self.counters.items()]
+            heapq.heapify(self.heap)
+
+    def add(self, key, label=None, n=1):
+        """Count `key` n times; returns its [count, error, label] entry."""
+        self.total += n
+        entry = self.counters.get(key)
+        if entry is None:
+            if len(self.counters) < self.capacity:
+                entry = self.counters[key] = [0, 0, label]
+            else:
+                evicted, smallest = self._pop_min()
+                del self.counters[evicted]
+                entry = self.counters[key] = [smallest[0], smallest[0], label]
+        entry[0] += n
+        if label:
+            entry[2] = label
+        self._push(key, entry[0])
+        return entry
+
+    def guaranteed(self, key):
+        entry = self.counters.get(key)
+        return entry[0] - entry[1] if entry else 0
+
+    def top(self, k=None):
+        """Return [(key, count, error, label)] by count, highest first."""
+        items = sorted(self.counters.items(), key=lambda kv: (-kv[1][0], kv[0]))
+        return [(key, *entry) for key, entry in items[:k]]
+
+    def merge(self, other):
+        """Add another summary's counters (same period, e.g. from a snapshot)."""
+        for key, (count, error, label) in other.counters.items():
+            entry = self.add(key, label, count)
+            entry[1] += error
+        self.total += other.total - sum(e[0] for e in other.counters.values())
+        return self
+
+    def to_doc(self):
+        return {
+            'capacity': self.capacity,
+            'reads': self.total,
+            'counters': [{'plate_key': key, 'license_plate': label, 'count': count, 'error': error}
+                         for key, count, error, label in self.top()],
+        }
+
+    @classmethod
+    def from_doc(cls, doc, capacity=None):
+        summary = cls(capacity or doc.get('capacity') or DEFAULT_CAPACITY)
+        for c in doc.get('counters') or []:
+            entry = summary.add(c['plate_key'], c.get('license_plate'), c['count'])
+            entry[1] += c.get('error', 0)
+        summary.total = max(summary.total, doc.get('reads') or 0)
+        return summary
+
+
+class UnknownPlateTracker:
+    """Day and week Space-Saving summaries of unknown plates with threshold alerts"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, thresholds=None, keep=2):
+        self.capacity = capacity
+        self.thresholds = thresholds or {}  # granularity -> reads per period that raise an alert (0 = off)
+        self.keep = keep
+        self.periods = {}      # 'day:2026-10-18' -> (granularity, period, start, SpaceSaving)
+        self.alerted = {}      # period _id -> plate keys already alerted
+        self.dirty = set()
+        self.retired = []      # final snapshots of dropped periods, returned by take_snapshots()
+        self.stats = {'reads': 0, 'late': 0, 'alerts': 0}
+
+    def _summary(self, granularity, ts):
+        period, start = period_of(ts, granularity)
+        sid = f"{granularity}:{period}"
+        if sid not in self.periods:
+            current = sorted(s for s, p in self.periods.items() if p[0] == granularity)
+            if len(current) >= self.keep and sid < current[0]:
+                return None, None
+            self.periods[sid] = (granularity, period, start, SpaceSaving(self.capacity))
+            self.alerted.setdefault(sid, set())
+            self._retire(granularity)
+        return sid, self.periods[sid][3]
+
+    def _retire(self, granularity):
+        """Drop periods beyond the newest `keep`, keeping their final snapshots."""
+        ids = sorted(s for s, p in self.periods.items() if p[0] == granularity)
+        for sid in ids[:-self.keep]:
+            self.retired.append(self.snapshot(sid))
+            del self.periods[sid]
+            del self.alerted[sid]
+            self.dirty.discard(sid)
+
+    def add(self, doc):
+        """Count an unknown-plate detection; returns the alerts it raises."""
+        key = plate_key(doc.get('license_plate'))
+        ts = doc.get('timestamp')
+        if not key or ts is None:
+            return []
+        self.stats['reads'] += 1
+        alerts = []
+        for granularity in GRANULARITIES:
+            sid, summary = self._summary(granularity, ts)
+            if summary is None:
+                self.stats['late'] += 1
+                continue
+            summary.add(key, doc.get('license_plate'))
+            self.dirty.add(sid)
+            threshold = self.thresholds.get(granularity) or 0
+            if threshold and key not in self.alerted[sid] and summary.guaranteed(key) >= threshold:
+                self.alerted[sid].add(key)
+                self.stats['alerts'] += 1
+                alerts.append(self._alert(sid, key, summary, threshold, doc))
+        return alerts
+
+    def _alert(self, sid, key, summary, threshold, doc):
+        granularity, period, start, _ = self.periods[sid]
+        count, error, label = summary.counters[key]
+        return {
+            '_id': f"{sid}:{key}", 'granularity': granularity, 'period': period, 'period_start': start,
+            'plate_key': key, 'license_plate': label, 'count': count, 'error': error, 'threshold': threshold,
+            'event_id': doc.get('event_id'), 'camera_name': doc.get('camera_name'), 'timestamp': doc.get('timestamp'),
+        }
+
+    def snapshot(self, sid):
+        granularity, period, start, summary = self.periods[sid]
+        return {'_id': sid, 'granularity': granularity, 'period': period, 'period_start': start,
+                **summary.to_doc()}
+
+    def take_snapshots(self):
+        """Return snapshots of the periods changed or dropped since the last call."""
+        snaps = self.retired + [self.snapshot(sid) for sid in sorted(self.dirty)]
+        self.dirty, self.retired = set(), []
+        return snaps
+
+    def load(self, snapshots, alerts=()):
+        """Restore periods from stored snapshots and alerts (restart)."""
+        for doc in snapshots:
+            self.periods[doc['_id']] = (doc['granularity'], doc['period'], doc['period_start'],
+                                        SpaceSaving.from_doc(doc, self.capacity))
+            self.alerted.setdefault(doc['_id'], set())
+        for granularity in GRANULARITIES:
+            self._retire(granularity)
+        self.retired = []
+        for alert in alerts:
+            sid = alert['_id'].rsplit(':', 1)[0]
+            if sid in self.alerted:
+                self.alerted[sid].add(alert['plate_key'])
+
+
+__all__ = [
+    'HEAVY_HITTERS_COLLECTION', 'ALERTS_COLLECTION', 'GRANULARITIES', 'DEFAULT_CAPACITY', 'period_of',
+    'SpaceSaving', 'UnknownPlateTracker',
+]
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
-"""Shared helpers for LPR producers: camera filters and plate sanitization"""
+"""Shared helpers for LPR producers and maintenance jobs: camera filters, plate
+sanitization and search keys, vehicle attributes, Protect event paging, plate owner lookup, per-plate activity
+summaries and job checkpoints"""
 
 import os
 import re
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
 
 
 def get_camera_filters():
@@ -43,4 +48,321 @@ def sanitize_plate(p):
     return s if len(s) >= 2 else None
 
 
-__all__ = ['get_camera_filters', 'should_skip_camera', 'sanitize_plate']
+PLATE_NGRAM_SIZE = 3
+
+
+def plate_key(p):
+    """Return the canonical search key for a plate (sanitized, hyphens dropped), or None."""
+    s = sanitize_plate(p)
+    s = s.replace('-', '') if s else ''
+    return s or None
+
+
+def plate_ngrams(key, n=PLATE_NGRAM_SIZE):
+    """Return the sorted distinct n-grams of a plate key ([] when it is shorter than n)."""
+    if not key:
+        return []
+    return sorted({key[i:i + n] for i in range(len(key) - n + 1)})
+
+
+def plate_search_fields(p):
+    """Return the `plate_key`/`plate_ngrams` fields stored on a detection for partial-plate search."""
+    key = plate_key(p)
+    return {'plate_key': key, 'plate_ngrams': plate_ngrams(key)}
+
+
+def plate_search_filter(query):
+    """Return a Mongo filter matching detections whose plate contains `query`.
+
+    Queries of PLATE_NGRAM_SIZE or more characters require every query n-gram
+    (`$all`, served by the multikey `plate_ngrams` index) and then verify the
+    substring on `plate_key`, since n-grams alone do not guarantee the order.
+    Shorter queries fall back to the substring check alone. Returns None when
+    the query has no plate characters.
+    """
+    key = re.sub(r'[^A-Z0-9]', '', str(query or '').upper())
+    if not key:
+        return None
+    flt = {'plate_key': {'$regex': re.escape(key)}}
+    grams = plate_ngrams(key)
+    if grams:
+        flt = {'plate_ngrams': {'$all': grams}, **flt}
+    return flt
+
+
+def _attribute_value(value):
+    """Return a lowercase attribute string from a plain value or a `{value: ...}`/`{name: ...}` dict."""
+    if isinstance(value, dict):
+        value = value.get('value') or value.get('name') or value.get('matched_name') or value.get('val')
+    if not isinstance(value, str):
+        return None
+    value = ' '.join(value.split()).lower()
+    return value or None
+
+
+def vehicle_fields(doc):
+    """Return normalized top-level `color`, `vehicle_type` and `group` for a detection.
+
+    Producers have stored vehicle attributes in several shapes
+    (`vehicle_data.attributes.color.value`, `vehicle_data.color`, top-level
+    `vehicle_color`/`vehicle_type`, `vehicle_data.group.name`); the first value
+    found wins and is lowercased so filters can use indexed equality matches.
+    Attributes that are not present are left out.
+    """
+    vd = doc.get('vehicle_data') if isinstance(doc.get('vehicle_data'), dict) else {}
+    attrs = vd.get('attributes') if isinstance(vd.get('attributes'), dict) else {}
+    sources = {
+        'color': (attrs.get('color'), vd.get('color'), vd.get('colour'), doc.get('vehicle_color'), doc.get('color')),
+        'vehicle_type': (attrs.get('vehicleType'), attrs.get('vehicle_type'), vd.get('vehicleType'),
+                         vd.get('vehicle_type'), vd.get('type'), doc.get('vehicle_type')),
+        'group': (vd.get('group'), doc.get('group')),
+    }
+    fields = {}
+    for field, values in sources.items():
+        for value in values:
+            value = _attribute_value(value)
+            if value:
+                fields[field] = value
+                break
+    return fields
+
+
+async def iter_event_windows(protect, start, end, window_minutes=15, page_size=100):
+    """Yield (events, done_until) pages of Protect events between start and end.
+
+    Each request covers at most `window_minutes` and returns at most `page_size`
+    events; a full page is re-requested from its newest event start so busy
+    windows are paged instead of truncated. `done_until` is the point through
+    which every event has been yielded once the page is handled, for checkpoints.
+    """
+    window = timedelta(minutes=max(1, window_minutes))
+    cursor = start
+    while cursor < end:
+        window_end = min(cursor + window, end)
+        events = await protect.get_events(start=cursor, end=window_end, limit=page_size)
+        if len(events) >= page_size:
+            newest = max((e.start for e in events if getattr(e, 'start', None)), default=None)
+            if newest is not None and cursor.tzinfo is None and newest.tzinfo is not None:
+                newest = newest.astimezone(timezone.utc).replace(tzinfo=None)
+            if newest is not None and newest > cursor:
+                yield events, cursor
+                cursor = newest
+                continue
+        yield events, window_end
+        cursor = window_end
+
+
+def parse_timestamp(value):
+    """Coerce a stored timestamp (datetime, ISO string, epoch seconds/ms) to a naive UTC datetime.
+
+    Returns None when the value cannot be interpreted.
+    """
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, bool) or value is None:
+        return None
+    elif isinstance(value, (int, float)):
+        # Epoch milliseconds are larger than any plausible epoch-seconds value
+        seconds = value / 1000.0 if abs(value) >= 1e11 else float(value)
+        try:
+            dt = datetime.fromtimestamp(seconds, tz=timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    elif isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None
+        try:
+            return parse_timestamp(float(text))
+        except ValueError:
+            pass
+        try:
+            dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    else:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def timeseries_mode():
+    """Return 'off', 'dual' or 'only' from LPR_TIMESERIES_WRITE.
+
+    'dual' writes detections to both `license_plates` and the time-series
+    collection; 'only' writes to the time-series collection alone.
+    """
+    mode = os.getenv('LPR_TIMESERIES_WRITE', 'off').strip().lower()
+    return mode if mode in ('dual', 'only') else 'off'
+
+
+def timeseries_collection_name():
+    return os.getenv('LPR_TIMESERIES_COLLECTION', 'license_plates_ts')
+
+
+def to_timeseries_doc(doc):
+    """Map a `license_plates` document onto the time-series layout (camera/site in `meta`)."""
+    ts_doc = {k: v for k, v in doc.items() if k not in ('_id', 'camera_id')}
+    ts_doc['meta'] = {'camera_id': doc.get('camera_id'), 'site': os.getenv('LPR_SITE', 'default')}
+    return ts_doc
+
+
+def timeseries_keys_name():
+    """Collection of event ids already written to the time-series collection (`_id` = event_id)."""
+    return f"{timeseries_collection_name()}_keys"
+
+
+def insert_timeseries_detection(db, doc, source='producer'):
+    """Write the time-series copy of a detection once per event_id; returns False if it is already there.
+
+    Time-series collections cannot have unique indexes, so the event id is
+    claimed in `timeseries_keys_name()` first; a failed insert releases the claim.
+    """
+    keys = db[timeseries_keys_name()]
+    try:
+        keys.insert_one({'_id': doc['event_id'], 'source': source, 'claimed_at': datetime.utcnow()})
+    except DuplicateKeyError:
+        return False
+    try:
+        db[timeseries_collection_name()].insert_one(to_timeseries_doc(doc))
+    except Exception:
+        keys.delete_one({'_id': doc['event_id'], 'source': source})
+        raise
+    return True
+
+
+UNKNOWN_OWNER = {
+    'user_email': 'unknown',
+    'user_name': 'Unknown',
+    'user_type': 'unknown',
+    'owner': 'Unknown',
+    'source': None,
+}
+
+
+def owner_info(doc, source):
+    """Return the owner fields stamped on detections for a users_cache/visitors document."""
+    return {
+        'user_email': doc.get('user_email') or doc.get('email') or 'unknown',
+        'user_name': doc.get('name') or doc.get('user_name') or doc.get('first_name') or 'Unknown',
+        'user_type': doc.get('user_type') or ('visitor' if source == 'visitors' else 'resident'),
+        'owner': doc.get('owner') or 'Unknown',
+        'source': source,
+    }
+
+
+def registered_plates(doc):
+    """Return the uppercase plate credentials registered on a users_cache/visitors document."""
+    plates = []
+    entries = doc.get('license_plates')
+    if not isinstance(entries, list):
+        return plates
+    for entry in entries:
+        cred = entry.get('credential') if isinstance(entry, dict) else entry
+        if cred and isinstance(cred, str) and cred.strip():
+            plates.append(cred.strip().upper())
+    return plates
+
+
+def load_plate_owners(db):
+    """Load {PLATE: owner_info} for every registered plate in one pass.
+
+    users_cache takes precedence over visitors when a plate is registered on both.
+    """
+    owners = {}
+    projection = {'license_plates': 1, 'user_email': 1, 'email': 1, 'name': 1,
+                  'user_name': 1, 'first_name': 1, 'user_type': 1, 'owner': 1}
+    for source in ('users_cache', 'visitors'):
+        for doc in db[source].find({'license_plates.0': {'$exists': True}}, projection):
+            info = owner_info(doc, source)
+            for plate in registered_plates(doc):
+                owners.setdefault(plate, info)
+    return owners
+
+
+def plate_detections_filter(plate):
+    """Match the detections owned through `plate`: read as it, or linked to it by reconcile_misreads.py."""
+    return {'$or': [{'license_plate': plate}, {'misread_link.plate': plate}]}
+
+
+PLATE_ACTIVITY_DAYS = 30
+PLATE_ACTIVITY_HOURS = 24
+
+
+def _bump_bucket(field, bucket, cutoff):
+    """Pipeline expression: drop `field` buckets older than cutoff, then add one to `bucket`."""
+    kept = {'$filter': {'input': {'$ifNull': [field, []]}, 'cond': {'$gte': ['$$this.t', cutoff]}}}
+    if bucket < cutoff:
+        return kept
+    return {'$let': {'vars': {'kept': kept}, 'in': {'$cond': [
+        {'$in': [bucket, '$$kept.t']},
+        {'$map': {'input': '$$kept', 'in': {'$cond': [
+            {'$eq': ['$$this.t', bucket]}, {'t': '$$this.t', 'n': {'$add': ['$$this.n', 1]}}, '$$this']}}},
+        {'$concatArrays': ['$$kept', [{'t': bucket, 'n': 1}]]},
+    ]}}}
+
+
+def plate_activity_update(doc, now=None):
+    """Return (plate, pipeline update) folding one stored detection into its plate_activity summary.
+
+    The summary keeps last/first seen, the camera of the latest detection, a total
+    count, rolling UTC `daily` (30 days) and `hourly` (24 hours) `{t, n}` buckets and
+    the owner the producer resolved. Returns (None, None) for unreadable plates.
+    """
+    plate = sanitize_plate(doc.get('license_plate'))
+    ts = parse_timestamp(doc.get('timestamp'))
+    if not plate or ts is None:
+        return None, None
+    now = now or datetime.utcnow()
+    day = datetime(ts.year, ts.month, ts.day)
+    hour = ts.replace(minute=0, second=0, microsecond=0)
+    day_cutoff = datetime(now.year, now.month, now.day) - timedelta(days=PLATE_ACTIVITY_DAYS - 1)
+    hour_cutoff = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=PLATE_ACTIVITY_HOURS - 1)
+
+    fields = {
+        # Every expression in one $set sees the document as it was before the update
+        'last_camera': {'$cond': [{'$gte': [ts, {'$ifNull': ['$last_seen', datetime(1970, 1, 1)]}]},
+                                  {'$literal': doc.get('camera_name') or doc.get('camera_id')}, '$last_camera']},
+        'last_seen': {'$max': ['$last_seen', ts]},
+        'first_seen': {'$min': ['$first_seen', ts]},
+        'count': {'$add': [{'$ifNull': ['$count', 0]}, 1]},
+        'daily': _bump_bucket('$daily', day, day_cutoff),
+        'hourly': _bump_bucket('$hourly', hour, hour_cutoff),
+        'updated_at': '$$NOW',
+    }
+    if doc.get('user_email') not in (None, '', 'unknown'):
+        fields['user_email'] = {'$literal': doc['user_email']}
+        fields['user_name'] = {'$literal': doc.get('user_name') or 'Unknown'}
+    return plate, [{'$set': fields}]
+
+
+def record_plate_activity(db, doc):
+    """Upsert the plate_activity summary for a newly stored detection; returns True if recorded."""
+    plate, update = plate_activity_update(doc)
+    if plate is None:
+        return False
+    db['plate_activity'].update_one({'_id': plate}, update, upsert=True)
+    return True
+
+
+def load_job_state(db, job_id):
+    """Return the checkpoint document a maintenance job saved in lpr_job_state (or {})."""
+    return db['lpr_job_state'].find_one({'_id': job_id}) or {}
+
+
+def save_job_state(db, job_id, fields):
+    """Merge `fields` into the job's checkpoint document in lpr_job_state."""
+    db['lpr_job_state'].update_one({'_id': job_id}, {'$set': fields}, upsert=True)
+
+
+__all__ = [
+    'get_camera_filters', 'should_skip_camera', 'sanitize_plate', 'iter_event_windows', 'parse_timestamp',
+    'PLATE_NGRAM_SIZE', 'plate_key', 'plate_ngrams', 'plate_search_fields', 'plate_search_filter',
+    'vehicle_fields',
+    'timeseries_mode', 'timeseries_collection_name', 'to_timeseries_doc', 'timeseries_keys_name',
+    'insert_timeseries_detection',
+    'UNKNOWN_OWNER', 'owner_info', 'registered_plates', 'load_plate_owners', 'plate_detections_filter',
+    'PLATE_ACTIVITY_DAYS', 'PLATE_ACTIVITY_HOURS', 'plate_activity_update', 'record_plate_activity',
+    'load_job_state', 'save_job_state',
+]
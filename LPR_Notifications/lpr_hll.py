@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""HyperLogLog sketches for unique-plate counts.
+
+A sketch is 2**p one-byte registers (4 KiB at the default p=12) and estimates
+the number of distinct values added to it with a relative standard error of
+1.04 / sqrt(2**p), about 1.6% at p=12 (within ~3.3% for 95% of estimates).
+Small counts use linear counting and are close to exact. Sketches merge by
+taking the register-wise maximum, so hourly/per-camera sketches can be combined
+into any window; merging is idempotent, so re-adding a plate never changes the
+estimate. index.js merges and estimates the stored registers itself
+(`estimateLprUniquePlates`), so the hash and estimator here must stay in step
+with it."""
+
+import math
+import hashlib
+
+DEFAULT_P = 12
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch with 64-bit blake2b hashing"""
+
+    def __init__(self, p=DEFAULT_P, registers=None):
+        if not 4 <= p <= 16:
+            raise ValueError('p must be between 4 and 16')
+        self.p = p
+        self.m = 1 << p
+        if registers is not None and len(registers) != self.m:
+            raise ValueError(f'expected {self.m} registers, got {len(registers)}')
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        x = int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+        idx = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError('cannot merge sketches with different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(estimate)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data, p=DEFAULT_P):
+        return cls(p, bytearray(data))
+
+    @staticmethod
+    def relative_error(p=DEFAULT_P):
+        return 1.04 / math.sqrt(1 << p)
+
+
+def merged_count(sketches, p=DEFAULT_P):
+    """Estimate distinct values across stored register blobs."""
+    total = HyperLogLog(p)
+    for data in sketches:
+        total.merge(HyperLogLog.from_bytes(data, p))
+    return total.count()
+
+
+__all__ = ['DEFAULT_P', 'HyperLogLog', 'merged_count']
@@ -160,7 +160,7 @@ class LPRMicroserviceV2:
                     'license_plate': plate,
                     'confidence': detection_data.get('confidence'),
                     'raw_detection': str(detection_data),
-                    'detected_at': datetime.utcnow().isoformat(),
+                    'detected_at': datetime.utcnow(),
                     'origin': 'microservice_v2'
                 }
                 
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""E-mail notification queue and the pooled SMTP sender behind it.
+
+Producers call `enqueue_notification`, which writes one job per recipient to
+`notification_jobs`:
+
+    {recipient, kind, subject, body, key, event_time, created_at,
+     status: 'pending'|'sending'|'sent'|'failed', attempts, next_attempt_at,
+     claim, claimed_at, sent_at, last_error}
+
+`key` (optional, unique per recipient) makes enqueueing idempotent, so a
+replayed event does not notify twice. notification_dispatcher.py claims due
+jobs, folds each recipient's jobs into one message (`digest_message`) and
+sends it through `SMTPPool`: up to `size` logged-in SMTP connections that are
+kept open and reused, reconnecting only when the server drops one or it sat
+idle past `idle_timeout`. `RateLimiter` is a token bucket shared by all sends.
+
+SMTP settings are the EMAIL_* variables the portal uses: EMAIL_HOST,
+EMAIL_PORT (587), EMAIL_USER/EMAIL_PASS (no login when unset, e.g. a local
+sink), EMAIL_FROM (EMAIL_USER) and EMAIL_SECURE=true for SMTPS; otherwise
+STARTTLS is used whenever the server offers it."""
+
+import os
+import time
+import asyncio
+import smtplib
+from email.message import EmailMessage
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+NOTIFICATION_JOBS = 'notification_jobs'
+# SMTP errors that will not succeed on retry
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPNotSupportedError)
+
+
+def email_settings():
+    """Return the SMTP settings from the environment."""
+    user = os.getenv('EMAIL_USER')
+    return {
+        'host': os.getenv('EMAIL_HOST'),
+        'port': int(os.getenv('EMAIL_PORT') or 587),
+        'user': user,
+        'password': (os.getenv('EMAIL_PASS') or '').strip('"\''),
+        'sender': os.getenv('EMAIL_FROM') or user,
+        'secure': os.getenv('EMAIL_SECURE', 'false').lower() == 'true',
+        'timeout': float(os.getenv('EMAIL_TIMEOUT_SECONDS', '30')),
+    }
+
+
+def notification_indexes(db):
+    jobs = db[NOTIFICATION_JOBS]
+    jobs.create_index([('status', 1), ('next_attempt_at', 1)])
+    jobs.create_index([('key', 1), ('recipient', 1)], unique=True, partialFilterExpression={'key': {'$type': 'string'}})
+    jobs.create_index('claim', sparse=True)
+    jobs.create_index([('created_at', -1)])
+
+
+def enqueue_notification(db, recipients, subject, body, kind='notice', key=None, event_time=None):
+    """Queue one job per recipient; with `key`, a job already queued under it is left alone. Returns jobs added."""
+    now = datetime.utcnow()
+    jobs = [{'recipient': recipient, 'kind': kind, 'subject': subject, 'body': body, 'event_time': event_time,
+             'created_at': now, 'status': 'pending', 'attempts': 0, 'next_attempt_at': now}
+            for recipient in dict.fromkeys(r.strip().lower() for r in recipients if r and r.strip())]
+    if not jobs:
+        return 0
+    if not key:
+        return len(db[NOTIFICATION_JOBS].insert_many(jobs).inserted_ids)
+    ops = [UpdateOne({'key': key, 'recipient': job['recipient']}, {'$setOnInsert': {**job, 'key': key}}, upsert=True)
+           for job in jobs]
+    return db[NOTIFICATION_JOBS].bulk_write(ops, ordered=False).upserted_count
+
+
+def digest_message(recipient, jobs, sender):
+    """Build one e-mail for a recipient's jobs (oldest first)."""
+    msg = EmailMessage()
+    msg['From'] = sender
+    msg['To'] = recipient
+    if len(jobs) == 1:
+        msg['Subject'] = jobs[0]['subject']
+        msg.set_content(jobs[0]['body'])
+        return msg
+    msg['Subject'] = f"{len(jobs)} notifications: {jobs[-1]['subject']}"
+    parts = []
+    for job in jobs:
+        when = job.get('event_time') or job['created_at']
+        parts.append(f"[{when:%Y-%m-%d %H:%M:%S} UTC] {job['subject']}\n{job['body']}")
+    msg.set_content('\n\n'.join(parts))
+    return msg
+
+
+class RateLimiter:
+    """Async token bucket: `rate` acquisitions per second with bursts up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class SMTPPool:
+    """Persistent SMTP connections shared by concurrent async senders"""
+
+    def __init__(self, settings, size=2, idle_timeout=60.0):
+        self.settings = settings
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._slots = asyncio.Queue()
+        for _ in range(size):
+            self._slots.put_nowait((None, 0.0))  # (connection, last used)
+        self.stats = {'connects': 0, 'sends': 0, 'reconnects': 0}
+
+    def _connect(self):
+        s = self.settings
+        if s['secure']:
+            conn = smtplib.SMTP_SSL(s['host'], s['port'], timeout=s['timeout'])
+        else:
+            conn = smtplib.SMTP(s['host'], s['port'], timeout=s['timeout'])
+            conn.ehlo()
+            if conn.has_extn('starttls'):
+                conn.starttls()
+                conn.ehlo()
+        if s['user'] and s['password']:
+            conn.login(s['user'], s['password'])
+        self.stats['connects'] += 1
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.quit()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _send(self, conn, last_used, msg):
+        """Send on `conn` (connecting or reconnecting as needed); returns the connection to keep."""
+        if conn is not None and time.monotonic() - last_used > self.idle_timeout:
+            try:
+                if conn.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected('noop failed')
+            except (smtplib.SMTPException, OSError):
+                self._close(conn)
+                conn = None
+                self.stats['reconnects'] += 1
+        try:
+            if conn is None:
+                conn = self._connect()
+            try:
+                conn.send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Dropped while idle; one fresh connection before giving up
+                self.stats['reconnects'] += 1
+                conn = self._connect()
+                conn.send_message(msg)
+        except BaseException:
+            if conn is not None:
+                self._close(conn)
+            raise
+        self.stats['sends'] += 1
+        return conn
+
+    async def send(self, msg):
+        """Send a message on a pooled connection (blocking SMTP runs in a worker thread)."""
+        conn, last_used = await self._slots.get()
+        try:
+            conn = await asyncio.to_thread(self._send, conn, last_used, msg)
+        except BaseException:
+            # _send closed the connection; the slot reconnects on next use
+            self._slots.put_nowait((None, 0.0))
+            raise
+        self._slots.put_nowait((conn, time.monotonic()))
+
+    async def close(self):
+        while not self._slots.empty():
+            conn, _ = self._slots.get_nowait()
+            if conn is not None:
+                await asyncio.to_thread(self._close, conn)
+
+
+__all__ = [
+    'NOTIFICATION_JOBS', 'PERMANENT_ERRORS', 'email_settings', 'notification_indexes', 'enqueue_notification',
+    'digest_message', 'RateLimiter', 'SMTPPool',
+]
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Visit sessionization: pair entry and exit detections into visits.
+
+Every plate is in one of two states: off site, or on site with an open visit.
+Detections are fed in timestamp order:
+
+- an entry read opens a visit, unless the plate is already on site and the
+  read repeats within `repeat_seconds` of the last one (the car is still at
+  the gate); an entry read for a plate already on site otherwise closes that
+  visit with `missing_exit` and opens a new one
+- an exit read closes the open visit with departure and dwell time; repeat
+  exit reads within `repeat_seconds` extend the departure of the visit just
+  closed; an exit with no open visit is recorded as a visit with
+  `missing_entry`
+- an open visit older than `max_visit_hours` is closed with `missing_exit`
+
+Visits look like:
+
+    {_id, plate_key, license_plate, user_email, status: 'open'|'closed',
+     arrival, departure, dwell_seconds, entry_event_id, exit_event_id,
+     entry_camera, exit_camera, reads, missing_exit, missing_entry}
+
+`on_site` maps plate key to open visit, so "is this plate here" and "who is
+here" are dictionary lookups. Cameras are assigned a role by
+LPR_ENTRY_CAMERAS / LPR_EXIT_CAMERAS (comma-separated camera ids or name
+substrings; defaults `LPR Camera Left` / `LPR Camera Right`)."""
+
+import os
+from datetime import timedelta
+from bson import ObjectId
+
+from LPR_Notifications.lpr_helpers import plate_key
+
+VISITS_COLLECTION = 'visits'
+ON_SITE_COLLECTION = 'lpr_on_site'
+
+
+def camera_roles():
+    """Return (entry patterns, exit patterns) from the environment."""
+    def patterns(name, default):
+        return [s.strip() for s in os.getenv(name, default).split(',') if s.strip()]
+    return patterns('LPR_ENTRY_CAMERAS', 'LPR Camera Left'), patterns('LPR_EXIT_CAMERAS', 'LPR Camera Right')
+
+
+def camera_role(doc, roles):
+    """Return 'entry', 'exit' or None for a detection."""
+    entry, exit_ = roles
+    cam_id, cam_name = doc.get('camera_id'), doc.get('camera_name') or ''
+    for role, pats in (('entry', entry), ('exit', exit_)):
+        if any(p == cam_id or p.lower() in cam_name.lower() for p in pats):
+            return role
+    return None
+
+
+class VisitSessionizer:
+    def __init__(self, roles=None, repeat_seconds=300, max_visit_hours=24):
+        self.roles = roles or camera_roles()
+        self.repeat = timedelta(seconds=repeat_seconds)
+        self.max_visit = timedelta(hours=max_visit_hours)
+        self.on_site = {}        # plate key -> open visit
+        self.last_closed = {}    # plate key -> visit closed by an exit read
+        self.changed = {}        # visit _id -> visit, since the last take_changes()
+        self.left = set()        # plate keys that left since the last take_changes()
+        self.stats = {'reads': 0, 'ignored': 0, 'opened': 0, 'closed': 0, 'missing_exit': 0, 'missing_entry': 0}
+
+    def load_open(self, visits):
+        """Restore on-site state from stored open visits."""
+        for visit in visits:
+            self.on_site[visit['plate_key']] = visit
+
+    def load_closed(self, visits):
+        """Restore recently closed visits, so repeat exit reads after a restart extend them."""
+        for visit in visits:
+            self.last_closed[visit['plate_key']] = visit
+
+    def is_on_site(self, key):
+        return key in self.on_site
+
+    def _touch(self, visit):
+        self.changed[visit['_id']] = visit
+
+    def _open(self, doc, key):
+        visit = {
+            '_id': ObjectId(), 'plate_key': key, 'license_plate': doc.get('license_plate'),
+            'user_email': doc.get('user_email'), 'status': 'open', 'arrival': doc['timestamp'],
+            'departure': None, 'dwell_seconds': None, 'entry_event_id': doc.get('event_id'),
+            'exit_event_id': None, 'entry_camera': doc.get('camera_name'), 'exit_camera': None,
+            'last_read': doc['timestamp'], 'reads': 1, 'missing_exit': False, 'missing_entry': False,
+        }
+        self.on_site[key] = visit
+        self.left.discard(key)
+        self.stats['opened'] += 1
+        self._touch(visit)
+        return visit
+
+    def _close(self, key, departure=None, doc=None):
+        visit = self.on_site.pop(key)
+        visit['status'] = 'closed'
+        if departure is None:
+            visit['missing_exit'] = True
+            self.stats['missing_exit'] += 1
+        else:
+            visit['departure'] = departure
+            visit['dwell_seconds'] = (departure - visit['arrival']).total_seconds()
+            visit['exit_event_id'] = doc.get('event_id')
+            visit['exit_camera'] = doc.get('camera_name')
+            visit['reads'] += 1
+            visit['last_read'] = departure
+            self.last_closed[key] = visit
+        self.left.add(key)
+        self.stats['closed'] += 1
+        self._touch(visit)
+        return visit
+
+    def process(self, doc):
+        """Apply one detection (in timestamp order)."""
+        self.stats['reads'] += 1
+        key = plate_key(doc.get('license_plate'))
+        role = camera_role(doc, self.roles)
+        ts = doc.get('timestamp')
+        if not key or not role or ts is None:
+            self.stats['ignored'] += 1
+            return
+
+        visit = self.on_site.get(key)
+        if visit is not None and ts - visit['last_read'] > self.max_visit:
+            self._close(key)
+            visit = None
+
+        if role == 'entry':
+            if visit is not None:
+                if ts - visit['last_read'] <= self.repeat:
+                    visit['reads'] += 1
+                    visit['last_read'] = ts
+                    self._touch(visit)
+                    return
+                self._close(key)
+            self.last_closed.pop(key, None)
+            self._open(doc, key)
+            return
+
+        if visit is not None:
+            self._close(key, ts, doc)
+            return
+        closed = self.last_closed.get(key)
+        if closed is not None and ts - closed['last_read'] <= self.repeat:
+            closed['reads'] += 1
+            closed['last_read'] = closed['departure'] = ts
+            closed['dwell_seconds'] = (ts - closed['arrival']).total_seconds() if closed['arrival'] else None
+            self._touch(closed)
+            return
+        # Exit with nothing open: the entry was missed
+        visit = {
+            '_id': ObjectId(), 'plate_key': key, 'license_plate': doc.get('license_plate'),
+            'user_email': doc.get('user_email'), 'status': 'closed', 'arrival': None, 'departure': ts,
+            'dwell_seconds': None, 'entry_event_id': None, 'exit_event_id': doc.get('event_id'),
+            'entry_camera': None, 'exit_camera': doc.get('camera_name'), 'last_read': ts, 'reads': 1,
+            'missing_exit': False, 'missing_entry': True,
+        }
+        self.last_closed[key] = visit
+        self.stats['missing_entry'] += 1
+        self._touch(visit)
+
+    def expire(self, now):
+        """Close open visits with no read for max_visit_hours before `now`."""
+        for key in [k for k, v in self.on_site.items() if now - v['last_read'] > self.max_visit]:
+            self._close(key)
+        horizon = now - self.repeat
+        for key in [k for k, v in self.last_closed.items() if v['last_read'] < horizon]:
+            del self.last_closed[key]
+
+    def take_changes(self):
+        """Return (changed visits, plate keys now on site, plate keys that left) and reset them."""
+        changed, self.changed = list(self.changed.values()), {}
+        left, self.left = self.left - set(self.on_site), set()
+        arrived = {v['plate_key'] for v in changed if v['status'] == 'open' and self.on_site.get(v['plate_key']) is v}
+        return changed, arrived, left
+
+
+__all__ = [
+    'VISITS_COLLECTION', 'ON_SITE_COLLECTION', 'camera_roles', 'camera_role', 'VisitSessionizer',
+]
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Real-time watchlist matching for the capture path.
+
+Flagged plates (banned vehicles, expired visitors, ...) live in `lpr_watchlist`:
+
+    {plate, list: 'banned'|'expired_visitor'|..., reason, active: bool,
+     expires_at, notify: [e-mail], added_by, created_at}
+
+`Watchlist` is an immutable snapshot of the active entries: a dict keyed by
+plate key for exact reads, plus a `PlateFuzzyIndex` with one edit
+(O/0, I/1, B/8, S/5 are free, see lpr_fuzzy.py) for misreads. `match` is one
+dict probe for exact reads and a few dozen for the fuzzy fallback.
+
+`WatchlistMatcher` holds the current snapshot and swaps in a new one whenever
+`lpr_watchlist` changes, from a change stream on a background thread (polling
+every `refresh` seconds on a standalone server without change streams). It
+times every check into a fixed log2 histogram of microseconds, so the match
+latency distribution is reported without keeping samples. Hits look like:
+
+    {_id: event_id, event_id, timestamp, camera_name, license_plate,
+     watch_plate, match: 'exact'|'fuzzy', distance, list, reason, notify,
+     entry_id, matched_at}"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from LPR_Notifications.lpr_helpers import plate_key
+from LPR_Notifications.lpr_fuzzy import PlateFuzzyIndex
+
+WATCHLIST_COLLECTION = 'lpr_watchlist'
+HITS_COLLECTION = 'lpr_watchlist_hits'
+# Error code a standalone server returns for $changeStream
+CHANGE_STREAM_UNSUPPORTED = 40573
+HIT_FIELDS = ('list', 'reason', 'notify')
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Fixed-size histogram of durations in power-of-two microsecond buckets"""
+
+    BUCKETS = 24  # bucket i holds durations < 2**i µs; the last one is open-ended
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def record(self, seconds):
+        us = seconds * 1e6
+        self.counts[min(int(us).bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_us += us
+        self.max_us = max(self.max_us, us)
+
+    def percentile(self, q):
+        """Upper bound (µs) of the bucket holding the q-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return float(min(1 << i, self.max_us))
+        return self.max_us
+
+    def report(self):
+        return {
+            'count': self.count,
+            'mean_us': round(self.total_us / self.count, 2) if self.count else 0.0,
+            'p50_us': self.percentile(50), 'p90_us': self.percentile(90), 'p99_us': self.percentile(99),
+            'max_us': round(self.max_us, 2),
+            'buckets_us': {f"<{1 << i}": n for i, n in enumerate(self.counts) if n},
+        }
+
+
+class Watchlist:
+    """Exact + edit-distance-1 lookup over active watchlist entries"""
+
+    def __init__(self, entries=(), now=None):
+        now = now or datetime.utcnow()
+        self.exact = {}   # plate key -> entry
+        self.by_plate = {}
+        for entry in entries:
+            key = plate_key(entry.get('plate'))
+            if not key or entry.get('active') is False:
+                continue
+            if entry.get('expires_at') and entry['expires_at'] <= now:
+                continue
+            self.exact[key] = entry
+            self.by_plate[entry['plate']] = entry
+        self.fuzzy = PlateFuzzyIndex(self.by_plate, max_distance=1)
+
+    def __len__(self):
+        return len(self.exact)
+
+    def match(self, plate):
+        """Return (entry, 'exact'|'fuzzy', distance) for a read, or None."""
+        key = plate_key(plate)
+        if not key or not self.exact:
+            return None
+        entry = self.exact.get(key)
+        if entry is not None:
+            return entry, 'exact', 0
+        best = self.fuzzy.best(plate)
+        if best is None:
+            return None
+        return self.by_plate[best.plate], 'fuzzy', best.distance
+
+
+class WatchlistMatcher:
+    """Current watchlist snapshot, hot-reloaded from `lpr_watchlist`, with match metrics"""
+
+    def __init__(self, db, refresh=60.0):
+        self.db = db
+        self.coll = db[WATCHLIST_COLLECTION]
+        self.refresh = refresh
+        self.watchlist = Watchlist()
+        self.latency = LatencyHistogram()
+        self.stats = {'checks': 0, 'hits': 0, 'exact': 0, 'fuzzy': 0, 'expired': 0, 'reloads': 0}
+        self.loaded_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reload(self):
+        """Build a new snapshot and swap it in (readers keep using the old one until then)."""
+        self.watchlist = Watchlist(self.coll.find({'active': {'$ne': False}}))
+        self.loaded_at = datetime.utcnow()
+        self.stats['reloads'] += 1
+        logger.info(f"✓ Watchlist loaded: {len(self.watchlist)} active plates")
+
+    def start(self):
+        self.coll.create_index('plate')
+        self.reload()
+        self._thread = threading.Thread(target=self._follow, name='watchlist-reload', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _follow(self):
+        while not self._stop.is_set():
+            try:
+                with self.coll.watch(max_await_time_ms=1000) as stream:
+                    # Opened before reloading, so a change between the two is not missed
+                    self.reload()
+                    while not self._stop.is_set():
+                        if stream.try_next() is not None:
+                            # Drain a burst of changes before rebuilding once
+                            while stream.try_next() is not None:
+                                pass
+                            self.reload()
+            except OperationFailure as e:
+                if e.code != CHANGE_STREAM_UNSUPPORTED:
+                    logger.error(f"Watchlist change stream failed: {e}")
+                    self._stop.wait(5)
+                    continue
+                logger.info(f"Change streams unavailable; reloading the watchlist every {self.refresh:.0f}s")
+                while not self._stop.wait(self.refresh):
+                    try:
+                        self.reload()
+                    except PyMongoError as e:
+                        logger.error(f"Watchlist reload failed: {e}")
+            except PyMongoError as e:
+                logger.error(f"Watchlist change stream interrupted: {e}; reconnecting in 5s")
+                self._stop.wait(5)
+
+    def check(self, doc):
+        """Match a detection against the watchlist; returns a hit document or None."""
+        started = time.perf_counter()
+        found = self.watchlist.match(doc.get('license_plate'))
+        self.latency.record(time.perf_counter() - started)
+        self.stats['checks'] += 1
+        if found is None:
+            return None
+        entry, kind, distance = found
+        if entry.get('expires_at') and entry['expires_at'] <= datetime.utcnow():
+            self.stats['expired'] += 1
+            return None
+        self.stats['hits'] += 1
+        self.stats[kind] += 1
+        hit = {
+            '_id': doc['event_id'], 'event_id': doc['event_id'], 'timestamp': doc.get('timestamp'),
+            'camera_name': doc.get('camera_name'), 'license_plate': doc.get('license_plate'),
+            'watch_plate': entry['plate'], 'match': kind, 'distance': distance, 'entry_id': entry.get('_id'),
+            'matched_at': datetime.utcnow(),
+        }
+        hit.update({f: entry[f] for f in HIT_FIELDS if entry.get(f) is not None})
+        return hit
+
+    def report(self):
+        return {**self.stats, 'entries': len(self.watchlist), 'loaded_at': self.loaded_at,
+                'latency': self.latency.report()}
+
+
+__all__ = [
+    'WATCHLIST_COLLECTION', 'HITS_COLLECTION', 'LatencyHistogram', 'Watchlist', 'WatchlistMatcher',
+]
@@ -2,6 +2,7 @@
 """
 UniFi Protect LPR WebSocket Listener
 Captures real-time license plate detections and stores in MongoDB
+(raw messages go to the compressed `event_raw` side store)
 """
 
 import asyncio
@@ -20,6 +21,8 @@ async def listen_for_lpr_events():
     try:
         from uiprotect import ProtectApiClient
         from pymongo import MongoClient
+        from LPR_Notifications.lpr_event_raw import raw_enabled, store_event_raw
+        from LPR_Notifications.lpr_helpers import plate_search_fields
     except ImportError as e:
         print(f"ERROR: Missing required package: {e}")
         print("Install with: pip install uiprotect pymongo")
@@ -77,6 +80,8 @@ async def listen_for_lpr_events():
         lpr_collection.create_index('timestamp')
         lpr_collection.create_index('license_plate')
         lpr_collection.create_index('camera_name')
+        lpr_collection.create_index('plate_key')
+        lpr_collection.create_index('plate_ngrams')
         
         print("✓ Connected to MongoDB")
         print(f"  Collection: license_plate_detections\n")
@@ -123,16 +128,17 @@ async def listen_for_lpr_events():
                 try:
                     event_data = {
                         'timestamp': datetime.utcnow(),
-                        'raw_message': str(msg),
                         'message_type': getattr(msg, 'action_frame', 'unknown'),
                         'origin': 'websocket_listener'
                     }
 
-                    # Try to extract structured data
+                    # Try to extract structured data (inspected here, not stored: the raw
+                    # message goes to the compressed event_raw side store)
                     if hasattr(msg, '__dict__'):
                         for key, val in msg.__dict__.items():
                             if val and not callable(val):
                                 event_data[key] = str(val)
+                    event_id = getattr(getattr(msg, 'new_obj', None), 'id', None)
 
                     # Determine camera and license plate presence for safety checks
                     camera_name = event_data.get('camera_name') or event_data.get('camera') or None
@@ -154,8 +160,7 @@ async def listen_for_lpr_events():
 
                     print("Event Data Captured:")
                     for key, val in event_data.items():
-                        if key not in ['raw_message']:
-                            print(f"  {key}: {val}")
+                        print(f"  {key}: {val[:200] if isinstance(val, str) else val}")
 
                     # Require license plate to store events
                     if not license_plate:
@@ -167,9 +172,19 @@ async def listen_for_lpr_events():
                         print(f"Skipping storing event: camera_id {camera_id} is not configured as an LPR camera (camera_name: {camera_name})")
                         return
 
-                    # Store in MongoDB, include explicit license_plate for easier querying
-                    event_data['license_plate'] = license_plate
-                    result = lpr_collection.insert_one(event_data)
+                    # Store only the queried fields, with an explicit license_plate
+                    hot_doc = {k: event_data[k] for k in ('timestamp', 'message_type', 'origin')}
+                    hot_doc.update({'license_plate': license_plate, 'camera_id': camera_id, 'camera_name': camera_name})
+                    # plate_key / plate_ngrams for /api/lpr/search partial matches
+                    hot_doc.update(plate_search_fields(license_plate))
+                    if event_id:
+                        hot_doc['event_id'] = event_id
+                    result = lpr_collection.insert_one(hot_doc)
+                    if raw_enabled():
+                        try:
+                            store_event_raw(db, event_id or result.inserted_id, str(msg), 'websocket_listener')
+                        except Exception as e:
+                            print(f"event_raw write failed: {e}")
                     event_count['stored'] += 1
 
                     print(f"\n✓ Stored to MongoDB: {result.inserted_id} (camera: {camera_name}, plate: {license_plate})")
@@ -1,15 +1,23 @@
 #!/usr/bin/env python3
 """
 Query MongoDB for License Plate Detections
+
+Usage:
+  python -m LPR_Notifications.query_mongodb_lpr          # recent detections
+  python -m LPR_Notifications.query_mongodb_lpr 7KX      # plus a partial-plate search
 """
 
 import os
+import re
+import sys
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 
 load_dotenv()
 
+from LPR_Notifications.lpr_helpers import plate_search_filter
+
 mongo_url = os.getenv('MONGO_URL')
 if not mongo_url:
     print('Error: MONGO_URL not set. See .env.example')
@@ -47,22 +55,28 @@ try:
                 if key not in ['_id', 'timestamp']:
                     print(f"  {key}: {val}")
             print()
-        
-        # Query by license plate if provided
-        import sys
-        if len(sys.argv) > 1:
-            plate = sys.argv[1].upper()
-            print(f"\nSearching for license plate: {plate}\n")
-            
-            count = 0
-            for doc in lpr_collection.find():
-                if plate in str(doc).upper():
-                    print(f"Found: {doc}")
-                    count += 1
-            
-            if count == 0:
-                print(f"No records found for plate: {plate}")
-    
+
+    # Query by license plate if provided
+    if len(sys.argv) > 1:
+        plate = sys.argv[1].upper()
+        print(f"\nSearching for license plate: {plate}\n")
+
+        # license_plates carries the n-gram index (see plate_ngram_index.py);
+        # the legacy collection only has license_plate, matched server-side
+        searches = [(lpr_collection, {'license_plate': {'$regex': re.escape(plate), '$options': 'i'}})]
+        ngram_filter = plate_search_filter(plate)
+        if ngram_filter:
+            searches.append((db['license_plates'], ngram_filter))
+
+        count = 0
+        for collection, query in searches:
+            for doc in collection.find(query).sort('timestamp', -1):
+                print(f"Found ({collection.name}): {doc}")
+                count += 1
+
+        if count == 0:
+            print(f"No records found for plate: {plate}")
+
     mongo_client.close()
     
 except Exception as e:
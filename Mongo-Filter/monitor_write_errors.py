@@ -1,81 +1,298 @@
 #!/usr/bin/env python3
-"""Monitor license_plate_write_errors and email admins if any errors found.
+"""Watch license_plate_write_errors and alert admins when something new goes wrong.
+
+Long-running replacement for the cron rescan: new errors are tailed with a
+change stream whose resume token is saved in `lpr_job_state`
+(`monitor_write_errors`) in the same write as the groups it produced, so a
+restart picks up exactly where it stopped and nothing is counted twice. Without a replica set the collection is tailed by
+`_id` instead; either way no time window is ever rescanned.
+
+Errors are grouped by error class (`error_type` when the producer stored it,
+otherwise derived from the message, e.g. DocumentValidationFailure for
+validator rejections) and camera. A group is reported once it has had no new
+error for --debounce seconds, or --max-delay seconds after its first unreported
+error during a continuous burst. After a report, further errors of the same
+group within --dedupe minutes are only counted; they are reported together
+once that window has passed. One summary covers every group that is due and
+is queued in `notification_jobs` for ADMIN_EMAILS, sent by
+notification_dispatcher.py over its pooled SMTP connections.
 
 Usage:
-  ./monitor_write_errors.py --minutes 60
+  ./monitor_write_errors.py                                 # watch continuously
+  ./monitor_write_errors.py --debounce 120 --dedupe 30
+  ./monitor_write_errors.py --status                        # groups being tracked
 """
 import os
+import re
 import sys
-import json
+import time
+import logging
 import argparse
-import smtplib
-from email.message import EmailMessage
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
 
 load_dotenv()
 
-MONGO_URL = os.getenv('MONGO_URL')
-if not MONGO_URL:
-    mongodb_host = os.getenv('MONGODB_HOST')
-    mongodb_port = os.getenv('MONGODB_PORT','27017')
-    if not mongodb_host:
-        print('Error: MONGO_URL or MONGODB_HOST must be set. See .env.example')
-        sys.exit(1)
-    MONGO_URL = f"{mongodb_host}:{mongodb_port}"
-DB = os.getenv('MONGODB_DATABASE','web-portal')
-ADMIN_EMAILS = [e.strip() for e in (os.getenv('ADMIN_EMAILS') or '').split(',') if e.strip()]
-EMAIL_HOST = os.getenv('EMAIL_HOST')
-EMAIL_PORT = int(os.getenv('EMAIL_PORT') or 587)
-EMAIL_USER = os.getenv('EMAIL_USER')
-EMAIL_PASS = (os.getenv('EMAIL_PASS') or '').strip('"\'')
-EMAIL_FROM = os.getenv('EMAIL_FROM') or EMAIL_USER
-
-parser = argparse.ArgumentParser()
-parser.add_argument('--minutes', type=int, default=15, help='Time window in minutes to look back')
-parser.add_argument('--threshold', type=int, default=1, help='Minimum number of errors to trigger alert')
-args = parser.parse_args()
-
-since = datetime.utcnow() - timedelta(minutes=args.minutes)
-
-client = MongoClient(MONGO_URL)
-db = client[DB]
-col = db.get_collection('license_plate_write_errors')
-count = col.count_documents({'timestamp': {'$gte': since}})
-print(f"Write errors in last {args.minutes} minutes: {count}")
-
-if count >= args.threshold and ADMIN_EMAILS and EMAIL_HOST and EMAIL_USER and EMAIL_PASS:
-    samples = list(col.find({'timestamp': {'$gte': since}}).sort('timestamp', -1).limit(20))
-    body = []
-    body.append(f"Found {count} license_plate write errors in the last {args.minutes} minutes (since {since.isoformat()} UTC)\n")
-    body.append('\nRecent samples (up to 20):\n')
-    for s in samples:
-        s.pop('_id', None)
-        # stringify timestamp
-        if 'timestamp' in s and hasattr(s['timestamp'], 'isoformat'):
-            s['timestamp'] = s['timestamp'].isoformat()
-        body.append(json.dumps(s, default=str))
-    body_text = '\n'.join(body)
-
-    msg = EmailMessage()
-    msg['Subject'] = f"[ALERT] LPR write errors: {count} in last {args.minutes}m"
-    msg['From'] = EMAIL_FROM
-    msg['To'] = ','.join(ADMIN_EMAILS)
-    msg.set_content(body_text)
+# Shared helpers live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from LPR_Notifications.lpr_helpers import load_job_state, save_job_state
+from LPR_Notifications.lpr_notify import enqueue_notification
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'monitor_write_errors'
+COLLECTION = 'license_plate_write_errors'
+MAX_SAMPLES = 5
+# Error code a standalone server returns for $changeStream
+CHANGE_STREAM_UNSUPPORTED = 40573
+# Error code MongoDB returns when a resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+ERROR_CLASSES = (
+    (re.compile(r'E11000|duplicate key', re.I), 'DuplicateKeyError'),
+    (re.compile(r'document failed validation', re.I), 'DocumentValidationFailure'),
+    (re.compile(r'timed? ?out', re.I), 'Timeout'),
+    (re.compile(r'connection|server selection|not ?(writable )?primary|AutoReconnect', re.I), 'ConnectionFailure'),
+    (re.compile(r'too large|InvalidDocument|cannot encode', re.I), 'InvalidDocument'),
+)
+
+
+def positive_int(value):
+    n = int(value)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Alert on new license_plate write errors')
+    p.add_argument('--debounce', type=float, default=60, help='Seconds without new errors before a group is reported')
+    p.add_argument('--max-delay', type=float, default=600, help='Report a continuous burst after this many seconds')
+    p.add_argument('--dedupe', type=float, default=60, help='Minutes a reported group stays quiet')
+    p.add_argument('--threshold', type=positive_int, default=1, help='Minimum new errors in a group to report it')
+    p.add_argument('--poll', type=float, default=5, help='Seconds between polls without change streams')
+    p.add_argument('--status', action='store_true', help='Print tracked groups and exit')
+    return p.parse_args()
+
+
+def error_class(doc):
+    """Return the error class of a write-error document."""
+    if doc.get('error_type'):
+        return doc['error_type']
+    message = str(doc.get('error') or '')
+    for pattern, name in ERROR_CLASSES:
+        if pattern.search(message):
+            return name
+    # Unknown errors group by message shape (numbers and ids blanked)
+    return re.sub(r'\d+', '#', message.split(':', 1)[0])[:60] or 'Unknown'
+
+
+class WriteErrorWatcher:
+    """Groups write errors and decides when a summary is due"""
+
+    def __init__(self, db, args):
+        self.db = db
+        self.coll = db[COLLECTION]
+        self.args = args
+        self.admins = [e.strip() for e in (os.getenv('ADMIN_EMAILS') or '').split(',') if e.strip()]
+        self.groups = {}        # (error class, camera) -> group
+        self.resume_token = None
+        self.last_id = None
+        self.dirty = False
+        self._saved_at = 0.0
+        self._saved_token = None
+        self.stats = {'errors': 0, 'summaries': 0}
+
+    def load(self):
+        state = load_job_state(self.db, JOB_ID)
+        self.resume_token = state.get('resume_token')
+        self.last_id = state.get('last_id')
+        for g in state.get('groups', []):
+            self.groups[(g['error_class'], g['camera'])] = g
+        if self.last_id is None:
+            # First start: only errors from now on are news
+            latest = self.coll.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+            self.last_id = latest['_id'] if latest else None
 
+    def save(self, force=False):
+        """Persist groups and position after every change, and the idle resume token every minute.
+
+        Groups and the resume token / last `_id` are written together, so a
+        crash never replays errors that were already counted.
+        """
+        now = time.time()
+        moved = self.resume_token != self._saved_token and now - self._saved_at >= 60
+        if force or moved or self.dirty:
+            fields = {'groups': list(self.groups.values()), 'last_id': self.last_id, 'updated_at': datetime.utcnow()}
+            if self.resume_token is not None:
+                fields['resume_token'] = self.resume_token
+            save_job_state(self.db, JOB_ID, fields)
+            self.dirty = False
+            self._saved_at = now
+            self._saved_token = self.resume_token
+
+    def ingest(self, doc, now):
+        """Count one new error in its group."""
+        if self.last_id is None or doc['_id'] > self.last_id:
+            self.last_id = doc['_id']
+        self.stats['errors'] += 1
+        camera = doc.get('camera_name') or doc.get('camera_id') or 'unknown'
+        key = (error_class(doc), camera)
+        g = self.groups.get(key)
+        if g is None:
+            g = self.groups[key] = {'error_class': key[0], 'camera': camera, 'total': 0, 'pending': 0,
+                                    'pending_since': None, 'first_seen': now, 'last_seen': now,
+                                    'alerted_at': None, 'samples': []}
+        g['total'] += 1
+        g['pending'] += 1
+        g['last_seen'] = now
+        if g['pending_since'] is None:
+            g['pending_since'] = now
+        g['samples'] = (g['samples'] + [{
+            'event_id': doc.get('event_id'), 'license_plate': doc.get('license_plate'),
+            'error': str(doc.get('error') or '')[:300], 'timestamp': doc.get('timestamp'),
+        }])[-MAX_SAMPLES:]
+        self.dirty = True
+
+    def due(self, now):
+        """Return the groups to report now."""
+        ready = []
+        dedupe = timedelta(minutes=self.args.dedupe)
+        for g in self.groups.values():
+            if not g['pending'] or g['pending'] < self.args.threshold:
+                continue
+            if g['alerted_at'] is not None and now - g['alerted_at'] < dedupe:
+                continue
+            quiet = now - g['last_seen'] >= timedelta(seconds=self.args.debounce)
+            overdue = now - g['pending_since'] >= timedelta(seconds=self.args.max_delay)
+            if quiet or overdue:
+                ready.append(g)
+        return ready
+
+    def summary(self, groups):
+        total = sum(g['pending'] for g in groups)
+        subject = f"[ALERT] LPR write errors: {total} new in {len(groups)} group{'s' if len(groups) != 1 else ''}"
+        lines = []
+        for g in sorted(groups, key=lambda g: -g['pending']):
+            again = ' (again)' if g['alerted_at'] else ''
+            lines.append(f"{g['error_class']} at {g['camera']}{again}: {g['pending']} new "
+                         f"({g['total']} since {g['first_seen']:%Y-%m-%d %H:%M} UTC), "
+                         f"{g['pending_since']:%H:%M:%S}-{g['last_seen']:%H:%M:%S} UTC")
+            for s in g['samples']:
+                lines.append(f"    event {s['event_id']} plate={s['license_plate']}: {s['error']}")
+            lines.append('')
+        return subject, '\n'.join(lines)
+
+    def flush(self, now):
+        """Report due groups and forget old quiet ones."""
+        groups = self.due(now)
+        if groups:
+            subject, body = self.summary(groups)
+            logger.warning(f"🚨 {subject}\n{body}")
+            if self.admins:
+                enqueue_notification(self.db, self.admins, subject, body, kind='write_errors', event_time=now)
+            else:
+                logger.warning('ADMIN_EMAILS not set; summary only logged')
+            for g in groups:
+                g.update(alerted_at=now, pending=0, pending_since=None, samples=[])
+            self.stats['summaries'] += 1
+            self.dirty = True
+        horizon = now - timedelta(minutes=self.args.dedupe)
+        for key in [k for k, g in self.groups.items()
+                    if not g['pending'] and g['last_seen'] < horizon and (g['alerted_at'] or now) < horizon]:
+            del self.groups[key]
+            self.dirty = True
+
+    def catch_up(self):
+        """Ingest errors inserted after the saved `_id`; returns their ids."""
+        query = {'_id': {'$gt': self.last_id}} if self.last_id is not None else {}
+        seen = set()
+        for doc in self.coll.find(query).sort('_id', 1):
+            self.ingest(doc, datetime.utcnow())
+            seen.add(doc['_id'])
+        return seen
+
+    def tail(self):
+        """Follow the collection by `_id` (no change streams on a standalone server)."""
+        logger.info(f"👀 Change streams unavailable; polling {COLLECTION} every {self.args.poll:g}s by _id")
+        while True:
+            try:
+                self.catch_up()
+                self.flush(datetime.utcnow())
+                self.save()
+            except PyMongoError as e:
+                logger.error(f"Poll failed: {e}")
+            time.sleep(self.args.poll)
+
+    def run(self):
+        self.load()
+        pipeline = [{'$match': {'operationType': 'insert'}}]
+        while True:
+            try:
+                with self.coll.watch(pipeline, resume_after=self.resume_token, max_await_time_ms=1000) as stream:
+                    # A new stream starts now: errors since the saved _id are read first
+                    seen = self.catch_up() if self.resume_token is None else set()
+                    logger.info(f"👀 Watching {COLLECTION} ({len(self.groups)} groups tracked)")
+                    while True:
+                        # Drain what is available, so a burst is saved in one write with its token
+                        for _ in range(1000):
+                            change = stream.try_next()
+                            if change is None:
+                                break
+                            if change['documentKey']['_id'] not in seen:
+                                self.ingest(change['fullDocument'], datetime.utcnow())
+                        self.resume_token = stream.resume_token
+                        self.flush(datetime.utcnow())
+                        self.save()
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    self.tail()
+                elif e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.error("Resume token no longer in the oplog; catching up by _id")
+                    self.resume_token = None
+                    self.db['lpr_job_state'].update_one({'_id': JOB_ID}, {'$unset': {'resume_token': ''}})
+                else:
+                    logger.error(f"Change stream failed: {e}")
+                    time.sleep(5)
+            except PyMongoError as e:
+                logger.error(f"Change stream interrupted: {e}; reconnecting in 5s")
+                time.sleep(5)
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    if not mongo_url:
+        mongodb_host = os.getenv('MONGODB_HOST')
+        mongodb_port = os.getenv('MONGODB_PORT', '27017')
+        if not mongodb_host:
+            print('Error: MONGO_URL or MONGODB_HOST must be set. See .env.example')
+            sys.exit(1)
+        mongo_url = f"{mongodb_host}:{mongodb_port}"
+    client = MongoClient(mongo_url)
+    db = client[os.getenv('MONGODB_DATABASE', 'web-portal')]
+
+    watcher = WriteErrorWatcher(db, args)
     try:
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=30) as smtp:
-            smtp.ehlo()
-            if EMAIL_PORT != 25 and EMAIL_PORT != 465:
-                smtp.starttls()
-            smtp.login(EMAIL_USER, EMAIL_PASS)
-            smtp.send_message(msg)
-        print(f"Alert emailed to: {', '.join(ADMIN_EMAILS)}")
-    except Exception as e:
-        print(f"Failed to send alert email: {e}")
-else:
-    if count >= args.threshold:
-        print('Cannot send email: missing ADMIN_EMAILS or email configuration.')
-
-client.close()
+        if args.status:
+            watcher.load()
+            print(f"{len(watcher.groups)} error groups tracked (last _id {watcher.last_id})")
+            for g in sorted(watcher.groups.values(), key=lambda g: g['last_seen'], reverse=True):
+                print(f"  {g['error_class']:<28} {g['camera']:<24} total {g['total']:>6}, unreported {g['pending']:>4}, "
+                      f"last {g['last_seen']:%Y-%m-%d %H:%M}, reported {g['alerted_at'] or 'never'}")
+            return
+        watcher.run()
+    except KeyboardInterrupt:
+        logger.info("\n⚠️  Stopped")
+    finally:
+        if not args.status:
+            watcher.save(force=True)
+            logger.info(f"Errors: {watcher.stats['errors']} | Summaries: {watcher.stats['summaries']}")
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
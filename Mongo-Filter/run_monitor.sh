@@ -1,5 +1,6 @@
 #!/usr/bin/env bash
-# Run monitor with sensible defaults
+# Run the write-error watcher (long-running; run under systemd/supervisor, not cron)
 PYTHON=${PYTHON:-python3}
 SCRIPT="$(dirname "$0")/monitor_write_errors.py"
-$PYTHON "$SCRIPT" --minutes ${MINUTES:-15} --threshold ${THRESHOLD:-1}
+exec $PYTHON "$SCRIPT" --debounce ${DEBOUNCE_SECONDS:-60} --max-delay ${MAX_DELAY_SECONDS:-600} \
+  --dedupe ${DEDUPE_MINUTES:-60} --threshold ${THRESHOLD:-1}
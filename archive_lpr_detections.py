@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Archive old LPR detections to compressed day partitions on local disk.
+
+Detections older than the configured age are written one UTC day at a time to
+`<archive-dir>/<collection>/date=YYYY-MM-DD/part-NNNN.<ext>` (zstd Parquet when
+pyarrow is installed, otherwise zstd or gzip NDJSON; see
+LPR_Notifications/lpr_archive.py). Each file is read back and checked against
+its sha256 and the exact set of archived `_id`s before it is recorded in
+`manifest.json`, and documents are only deleted from MongoDB, in batches, once
+their partition is in the manifest. A run interrupted between the manifest and
+the delete finishes the delete on the next run, and partitions written with
+--keep (`kept` in the manifest) are deleted by the first run without --keep
+whose cutoff covers their day; documents changed since they were archived are
+archived again first. Documents already in a day's
+partitions are not written again, so rerunning with --keep only archives
+detections that are new since the last run.
+
+Use query_lpr_archive.py to search MongoDB and the archive together.
+
+Usage:
+  python archive_lpr_detections.py --dry-run                 # show what would be archived
+  python archive_lpr_detections.py                           # archive detections older than 180 days
+  python archive_lpr_detections.py --older-than-days 365 --keep   # write files, keep Mongo docs
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_archive import (
+    archive_dir, pick_format, day_start, partition_path, file_sha256, write_partition,
+    read_partition, partition_entry, load_manifest, save_manifest,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Move old LPR detections to compressed day partitions')
+    p.add_argument('--older-than-days', type=int, default=int(os.getenv('LPR_ARCHIVE_AFTER_DAYS', '180')),
+                   help='Archive whole days older than this (default: LPR_ARCHIVE_AFTER_DAYS or 180)')
+    p.add_argument('--collection', default='license_plates', help='Detections collection (default: license_plates)')
+    p.add_argument('--archive-dir', default=None, help='Archive root (default: LPR_ARCHIVE_DIR or ./lpr_archive)')
+    p.add_argument('--format', default='auto', choices=['auto', 'parquet', 'ndjson.zst', 'ndjson.gz'])
+    p.add_argument('--batch-size', type=int, default=1000, help='Documents per delete batch')
+    p.add_argument('--max-days', type=int, default=0, help='Stop after archiving this many days (0 = no limit)')
+    p.add_argument('--keep', action='store_true', help='Write and verify partitions but do not delete from MongoDB')
+    p.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+    return p.parse_args()
+
+
+def verify_partition(root, entry, expected_ids=None):
+    """Re-read a partition; returns its _ids, or None if the checksum or contents do not match."""
+    path = os.path.join(root, entry['file'])
+    if not os.path.exists(path) or file_sha256(path) != entry['sha256']:
+        logger.error(f"✗ {entry['file']}: missing or checksum mismatch")
+        return None
+    ids = [doc['_id'] for doc in read_partition(path, entry['format'])]
+    if len(ids) != entry['count'] or (expected_ids is not None and set(ids) != set(expected_ids)):
+        logger.error(f"✗ {entry['file']}: expected {entry['count']} documents, read {len(ids)}")
+        return None
+    return ids
+
+
+def archived_ids(root, manifest, day):
+    """Return the _ids already in a day's partitions (with --keep they are still in MongoDB)."""
+    ids = set()
+    for entry in manifest['partitions']:
+        if entry['date'] == f"{day:%Y-%m-%d}":
+            ids.update(verify_partition(root, entry) or ())
+    return ids
+
+
+def delete_archived(coll, ids, batch_size):
+    deleted = 0
+    for i in range(0, len(ids), batch_size):
+        deleted += coll.delete_many({'_id': {'$in': ids[i:i + batch_size]}}).deleted_count
+    return deleted
+
+
+def write_verified(root, manifest, day, docs, fmt, kept=False):
+    """Write, verify and record a new partition for `docs` of `day`; returns its manifest entry."""
+    part = 1 + sum(1 for e in manifest['partitions'] if e['date'] == f"{day:%Y-%m-%d}")
+    path = partition_path(root, day, part, fmt)
+    sha256 = write_partition(path, docs, fmt)
+    entry = partition_entry(path, root, fmt, day, docs, sha256)
+    if verify_partition(root, entry, [d['_id'] for d in docs]) is None:
+        logger.error(f"Stopping: {entry['file']} failed verification, nothing deleted for {day:%Y-%m-%d}")
+        sys.exit(1)
+    if kept:
+        # Written by --keep: the documents stay in MongoDB until a run whose cutoff covers the day
+        entry['kept'] = True
+    manifest['partitions'].append(entry)
+    save_manifest(root, manifest)
+    return entry
+
+
+def finish_pending(coll, root, manifest, fmt, cutoff, batch_size):
+    """Delete documents of partitions that are archived but still in MongoDB.
+
+    These are runs interrupted between the manifest and the delete, and
+    partitions written with --keep. Only days before this run's cutoff are
+    touched; documents changed since they were archived (relinks,
+    re-extraction) are archived again first, so the newest version is kept.
+    """
+    for entry in list(manifest['partitions']):
+        if entry.get('deleted'):
+            continue
+        day = datetime.strptime(entry['date'], '%Y-%m-%d')
+        if day + timedelta(days=1) > cutoff:
+            continue
+        if verify_partition(root, entry) is None:
+            continue
+        archived = {d['_id']: d for d in read_partition(os.path.join(root, entry['file']), entry['format'])}
+        ids = list(archived)
+        changed = []
+        for i in range(0, len(ids), batch_size):
+            changed += [d for d in coll.find({'_id': {'$in': ids[i:i + batch_size]}}) if d != archived[d['_id']]]
+        if changed:
+            newer = write_verified(root, manifest, day, changed, fmt)
+            logger.info(f"↻ {entry['file']}: {len(changed)} documents changed since archiving -> {newer['file']}")
+        deleted = delete_archived(coll, ids, batch_size)
+        entry['deleted'] = True
+        if changed:
+            newer['deleted'] = True
+        save_manifest(root, manifest)
+        logger.info(f"✓ {entry['file']}: removed {deleted} previously archived documents")
+
+
+def archive(db, args):
+    coll = db[args.collection]
+    root = os.path.join(args.archive_dir or archive_dir(), args.collection)
+    fmt = pick_format(args.format)
+    manifest = load_manifest(root)
+    cutoff = day_start(datetime.utcnow() - timedelta(days=args.older_than_days))
+    logger.info(f"Archiving {args.collection} before {cutoff:%Y-%m-%d} to {root} ({fmt})")
+
+    if not args.dry_run and not args.keep:
+        finish_pending(coll, root, manifest, fmt, cutoff, args.batch_size)
+
+    days = archived = deleted = 0
+    started = time.time()
+    day = None
+    while not args.max_days or days < args.max_days:
+        # Jump straight to the next day that has detections
+        query = {'timestamp': {'$lt': cutoff, '$type': 'date'}}
+        if day is not None:
+            query['timestamp']['$gte'] = day
+        oldest = coll.find_one(query, {'timestamp': 1}, sort=[('timestamp', 1)])
+        if not oldest:
+            break
+        day = day_start(oldest['timestamp'])
+        next_day = day + timedelta(days=1)
+        day_query = {'timestamp': {'$gte': day, '$lt': next_day}}
+
+        if args.dry_run:
+            count = coll.count_documents(day_query)
+            logger.info(f"{day:%Y-%m-%d}: {count} detections would be archived")
+            archived += count
+        else:
+            docs = list(coll.find(day_query).sort([('license_plate', 1), ('timestamp', 1)]))
+            done = archived_ids(root, manifest, day)
+            if done:
+                docs = [d for d in docs if d['_id'] not in done]
+            if not docs:
+                logger.info(f"{day:%Y-%m-%d}: already archived")
+                days += 1
+                day = next_day
+                continue
+            entry = write_verified(root, manifest, day, docs, fmt, kept=args.keep)
+            ids = [d['_id'] for d in docs]
+            if not args.keep:
+                deleted += delete_archived(coll, ids, args.batch_size)
+                entry['deleted'] = True
+                save_manifest(root, manifest)
+            archived += len(docs)
+            logger.info(f"✓ {day:%Y-%m-%d}: {len(docs)} detections -> {entry['file']} ({entry['bytes'] / 1024:.0f} KiB)")
+
+        days += 1
+        day = next_day
+
+    elapsed = max(time.time() - started, 1e-6)
+    logger.info(f"Done: {days} days, {archived} detections {'to archive' if args.dry_run else 'archived'}, "
+                f"{deleted} deleted ({archived / elapsed:.0f} docs/sec)")
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+
+    try:
+        archive(client[mongo_db], args)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -25,7 +25,11 @@ load_dotenv()
 MINUTES = int(sys.argv[1]) if len(sys.argv) > 1 else 45
 
 # Use shared helpers for camera filters and plate sanitization
-from LPR_Notifications.lpr_helpers import get_camera_filters, should_skip_camera, sanitize_plate
+from LPR_Notifications.lpr_helpers import (
+    get_camera_filters, should_skip_camera, sanitize_plate, record_plate_activity, plate_search_fields, load_plate_owners,
+    vehicle_fields, timeseries_mode, timeseries_collection_name, insert_timeseries_detection,
+)
+from LPR_Notifications.lpr_fuzzy import PlateFuzzyIndex, plate_candidate
 
 
 async def main():
@@ -74,6 +78,11 @@ async def main():
             client = MongoClient(f"{mongo_host}:{mongo_port}")
             db = client[mongo_db]
         plates = db['license_plates']
+        # LPR_TIMESERIES_WRITE=dual|only also writes the time-series layout (see lpr_timeseries.py)
+        ts_mode = timeseries_mode()
+        ts_plates = db[timeseries_collection_name()] if ts_mode != 'off' else None
+        plate_owners = load_plate_owners(db)
+        fuzzy_index = PlateFuzzyIndex(plate_owners)
         print("✓ Connected to MongoDB")
     except Exception as e:
         print(f"Failed to connect to Mongo: {e}")
@@ -301,9 +310,18 @@ async def main():
                 'vehicle_color': vehicle_color,
                 'vehicle_type': vehicle_type,
                 'thumbnails': thumbnails_meta,
-                'detected_at': datetime.now(timezone.utc).isoformat(),
-                'origin': 'backfill'
+                'detected_at': datetime.now(timezone.utc),
+                'origin': 'backfill',
+                **plate_search_fields(license_plate),
             }
+            # Normalized top-level color/vehicle_type/group for indexed filters
+            doc.update(vehicle_fields(doc))
+            if user_email == 'unknown':
+                # Nearest registered plate for a misread (see LPR_Notifications/lpr_fuzzy.py)
+                candidate = plate_candidate(fuzzy_index, plate_owners, license_plate,
+                                            float(os.getenv('LPR_FUZZY_MIN_SCORE', '0.5')))
+                if candidate:
+                    doc['plate_candidate'] = candidate
 
             # Guard: enforce allowed camera filters before attempting DB writes
             allowed_ids, allowed_names, skip_subs = get_camera_filters()
@@ -324,7 +342,18 @@ async def main():
             # insert or update if event already exists
             # upsert with error handling
             try:
-                plates.update_one({'event_id': event.id}, {'$set': doc}, upsert=True)
+                new = False
+                if ts_mode != 'only':
+                    res = plates.update_one({'event_id': event.id}, {'$set': doc}, upsert=True)
+                    new = res.upserted_id is not None
+                # Time-series collections cannot upsert; the copy is written once per event_id
+                if ts_plates is not None:
+                    written = insert_timeseries_detection(db, doc)
+                    if ts_mode == 'only':
+                        new = written
+                # Only new detections count towards the plate's activity summary
+                if new:
+                    record_plate_activity(db, doc)
                 inserted += 1
                 if license_plate:
                     print(f"Inserted/Updated: {license_plate} @ {event.start} (event {event.id}) | color={vehicle_color} type={vehicle_type}")
@@ -342,6 +371,7 @@ async def main():
                         'license_plate': license_plate,
                         'confidence': confidence,
                         'error': str(e),
+                        'error_type': type(e).__name__,
                         'timestamp': datetime.now(timezone.utc)
                     })
                 except Exception:
@@ -25,7 +25,12 @@ import argparse
 load_dotenv()
 
 # Use shared helpers for camera filters and plate sanitization
-from LPR_Notifications.lpr_helpers import get_camera_filters, should_skip_camera, sanitize_plate
+from LPR_Notifications.lpr_helpers import (
+    get_camera_filters, should_skip_camera, sanitize_plate,
+    timeseries_mode, timeseries_collection_name, insert_timeseries_detection, record_plate_activity,
+    plate_search_fields, load_plate_owners, vehicle_fields,
+)
+from LPR_Notifications.lpr_fuzzy import PlateFuzzyIndex, plate_candidate
 
 
 def parse_args():
@@ -114,6 +119,10 @@ async def main():
             db = client[mongo_db]
 
         plates = db['license_plates']
+        ts_mode = timeseries_mode()
+        ts_plates = db[timeseries_collection_name()] if ts_mode != 'off' else None
+        plate_owners = load_plate_owners(db)
+        fuzzy_index = PlateFuzzyIndex(plate_owners)
         print("✓ Connected to MongoDB")
     except Exception as e:
         print(f"Failed to connect to Mongo: {e}")
@@ -348,13 +357,33 @@ async def main():
                 'vehicle_color': vehicle_color,
                 'vehicle_type': vehicle_type,
                 'thumbnails': thumbnails_meta,
-                'detected_at': datetime.now(timezone.utc).isoformat(),
-                'origin': 'backfill'
+                'detected_at': datetime.now(timezone.utc),
+                'origin': 'backfill',
+                **plate_search_fields(license_plate),
             }
+            # Normalized top-level color/vehicle_type/group for indexed filters
+            doc.update(vehicle_fields(doc))
+            if user_email == 'unknown':
+                # Nearest registered plate for a misread (see LPR_Notifications/lpr_fuzzy.py)
+                candidate = plate_candidate(fuzzy_index, plate_owners, license_plate,
+                                            float(os.getenv('LPR_FUZZY_MIN_SCORE', '0.5')))
+                if candidate:
+                    doc['plate_candidate'] = candidate
 
             # Upsert into Mongo (event_id dedupe)
             try:
-                res = plates.update_one({'event_id': doc['event_id']}, {'$set': doc}, upsert=True)
+                new = False
+                if ts_mode != 'only':
+                    res = plates.update_one({'event_id': doc['event_id']}, {'$set': doc}, upsert=True)
+                    new = res.upserted_id is not None
+                # Time-series collections cannot upsert; the copy is written once per event_id
+                if ts_plates is not None:
+                    written = insert_timeseries_detection(db, doc)
+                    if ts_mode == 'only':
+                        new = written
+                # Only new detections count towards the plate's activity summary
+                if new:
+                    record_plate_activity(db, doc)
                 # We treat upsert as an insert/update; count as inserted for visibility
                 inserted += 1
                 print(f"Inserted/Updated: {doc['license_plate']} event={doc['event_id']}")
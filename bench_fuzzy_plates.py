@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark the fuzzy plate index (LPR_Notifications/lpr_fuzzy.py).
+
+Builds the index over synthetic registered plates (LPR_Notifications/lpr_synthetic.py)
+and looks up misreads generated the way Protect gets plates wrong: confusable
+substitutions (O/0, I/1, B/8, S/5), a dropped, added or substituted character,
+swapped neighbours, plus reads of plates that are not registered at all.
+Reported: build time and index size, lookups/sec, p50/p99 latency, and how
+often the true plate is the best match (or, for unregistered reads, how often
+something is matched anyway).
+
+No MongoDB needed.
+
+Usage:
+  python bench_fuzzy_plates.py                      # 10k registered plates
+  python bench_fuzzy_plates.py --plates 50000 --lookups 50000
+"""
+
+import time
+import random
+import string
+import argparse
+import statistics
+
+from LPR_Notifications.lpr_fuzzy import PlateFuzzyIndex
+from LPR_Notifications.lpr_synthetic import plate_pool, random_plate
+
+SWAPS = {'O': '0', '0': 'O', 'I': '1', '1': 'I', 'B': '8', '8': 'B', 'S': '5', '5': 'S'}
+ALPHABET = string.ascii_uppercase + string.digits
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Benchmark fuzzy plate lookups')
+    p.add_argument('--plates', type=int, default=10000, help='Registered plates in the index')
+    p.add_argument('--lookups', type=int, default=20000, help='Lookups per misread kind')
+    p.add_argument('--max-distance', type=int, default=2)
+    p.add_argument('--seed', type=int, default=42)
+    return p.parse_args()
+
+
+def confusable(plate, rng):
+    spots = [i for i, c in enumerate(plate) if c in SWAPS]
+    if not spots:
+        return plate
+    i = rng.choice(spots)
+    return plate[:i] + SWAPS[plate[i]] + plate[i + 1:]
+
+
+def dropped(plate, rng):
+    i = rng.randrange(len(plate))
+    return plate[:i] + plate[i + 1:]
+
+
+def added(plate, rng):
+    i = rng.randrange(len(plate) + 1)
+    return plate[:i] + rng.choice(ALPHABET) + plate[i:]
+
+
+def substituted(plate, rng):
+    i = rng.randrange(len(plate))
+    return plate[:i] + rng.choice(ALPHABET) + plate[i + 1:]
+
+
+def swapped(plate, rng):
+    i = rng.randrange(len(plate) - 1)
+    return plate[:i] + plate[i + 1] + plate[i] + plate[i + 2:]
+
+
+def run(index, reads):
+    """Return (lookups/sec, p50 µs, p99 µs, best matches) for a list of reads."""
+    latencies, results = [], []
+    started = time.perf_counter()
+    for read in reads:
+        t0 = time.perf_counter()
+        results.append(index.best(read))
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return (len(reads) / elapsed, statistics.median(latencies),
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], results)
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    registered = plate_pool(args.plates, args.seed)
+
+    t0 = time.perf_counter()
+    index = PlateFuzzyIndex(registered, max_distance=args.max_distance)
+    build = time.perf_counter() - t0
+    stats = index.stats()
+    print(f"Indexed {stats['plates']:,} plates in {build:.2f}s "
+          f"({stats['variants']:,} deletion variants, max distance {args.max_distance})")
+
+    registered_set = set(registered)
+    print(f"\n{'misread':<14}{'lookups/sec':>14}{'p50 µs':>10}{'p99 µs':>10}{'true best':>12}")
+    for name, mutate in (('exact', lambda p, r: p), ('confusable', confusable), ('dropped', dropped),
+                         ('added', added), ('substituted', substituted), ('swapped', swapped)):
+        truth = [rng.choice(registered) for _ in range(args.lookups)]
+        reads = [mutate(p, rng) for p in truth]
+        rate, p50, p99, results = run(index, reads)
+        hits = sum(1 for t, m in zip(truth, results) if m is not None and m.plate == t)
+        print(f"{name:<14}{rate:>14,.0f}{p50:>10.1f}{p99:>10.1f}{hits / len(truth) * 100:>11.1f}%")
+
+    unregistered = []
+    while len(unregistered) < args.lookups:
+        plate = random_plate(rng)
+        if plate not in registered_set:
+            unregistered.append(plate)
+    rate, p50, p99, results = run(index, unregistered)
+    matched = sum(1 for m in results if m is not None)
+    print(f"{'unregistered':<14}{rate:>14,.0f}{p50:>10.1f}{p99:>10.1f}{'-':>12}")
+    print(f"\nUnregistered reads matched to some plate: {matched / len(unregistered) * 100:.1f}% "
+          f"(score >= 0.5: {sum(1 for m in results if m and m.score >= 0.5) / len(unregistered) * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
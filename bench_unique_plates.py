@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark unique-plate counting: exact `$addToSet` vs merged HyperLogLog sketches.
+
+For each dataset size, synthetic detections (LPR_Notifications/lpr_synthetic.py)
+are loaded into a scratch collection and unique plates over the whole window
+are counted three ways:
+  - `$addToSet`: what the dashboards used to run; the set is returned in one
+    document, so it is bounded by the 16 MB BSON limit
+  - `$group` + `$count`: exact, without the document limit, still a full scan
+  - hourly HyperLogLog sketches built the way lpr_rollup_worker.py builds them,
+    merged and estimated at query time
+
+Reported per method: latency, result/sketch bytes read, and error against the
+exact count.
+
+Usage:
+  python bench_unique_plates.py                                  # 1M and 10M detections
+  python bench_unique_plates.py --counts 100000 --plates 50000   # quick run
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime
+import bson
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_hll import HyperLogLog
+from LPR_Notifications.lpr_synthetic import generate_detections
+from lpr_rollup_worker import accumulate_sketches, save_sketches
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Compare $addToSet and HyperLogLog unique-plate counts')
+    p.add_argument('--counts', default='1000000,10000000', help='Comma-separated dataset sizes')
+    p.add_argument('--plates', type=int, default=500000, help='Distinct plates in the synthetic pool')
+    p.add_argument('--days', type=int, default=30, help='Days the dataset spans')
+    p.add_argument('--batch-size', type=int, default=10000)
+    p.add_argument('--keep', action='store_true', help='Keep the scratch collections')
+    return p.parse_args()
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def load(db, count, plates, days, batch_size):
+    """Insert detections and build hourly sketches from the same stream; returns sketch build seconds."""
+    coll, sketch_coll = db['bench_unique_plates'], db['bench_unique_sketches']
+    coll.drop()
+    sketch_coll.drop()
+    end = datetime.utcnow()
+    batch, sketches, sketch_secs = [], {}, 0.0
+    for doc in generate_detections(count, days=days, plates=plates, end=end):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            coll.insert_many(batch, ordered=False)
+            t0 = time.perf_counter()
+            for d in batch:
+                accumulate_sketches(sketches, d, granularities=('hour',))
+            sketch_secs += time.perf_counter() - t0
+            batch = []
+    if batch:
+        coll.insert_many(batch, ordered=False)
+        t0 = time.perf_counter()
+        for d in batch:
+            accumulate_sketches(sketches, d, granularities=('hour',))
+        sketch_secs += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    save_sketches(sketch_coll, sketches, replace=True)
+    return sketch_secs + time.perf_counter() - t0
+
+
+def run(db, count, args):
+    print(f"\nLoading {count:,} detections ({args.plates:,} plate pool, {args.days} days)...")
+    build_secs = load(db, count, args.plates, args.days, args.batch_size)
+    coll, sketch_coll = db['bench_unique_plates'], db['bench_unique_sketches']
+    rows = []
+
+    def add_to_set():
+        return list(coll.aggregate([{'$group': {'_id': None, 'plates': {'$addToSet': '$license_plate'}}}], allowDiskUse=True))
+    try:
+        result, ms = timed(add_to_set)
+        rows.append(('$addToSet', len(result[0]['plates']), ms, len(bson.encode(result[0]))))
+    except OperationFailure as e:
+        rows.append(('$addToSet', None, None, f"failed: {e.details.get('codeName', e.code)}"))
+
+    result, ms = timed(lambda: list(coll.aggregate([{'$group': {'_id': '$license_plate'}}, {'$count': 'n'}], allowDiskUse=True)))
+    exact = result[0]['n'] if result else 0
+    rows.append(('$group + $count', exact, ms, len(bson.encode(result[0])) if result else 0))
+
+    def merge_sketches():
+        docs = list(sketch_coll.find({'dim': 'all'}, {'registers': 1}))
+        total = HyperLogLog()
+        for d in docs:
+            total.merge(HyperLogLog.from_bytes(d['registers']))
+        return total.count(), sum(len(d['registers']) for d in docs)
+    (estimate, read_bytes), ms = timed(merge_sketches)
+    rows.append(('HyperLogLog merge', estimate, ms, read_bytes))
+
+    print(f"Sketch build: {build_secs:.1f}s ({count / max(build_secs, 1e-6):,.0f} detections/sec)")
+    print(f"{'method':<20}{'unique':>12}{'ms':>12}{'bytes read':>16}{'error':>10}")
+    for method, unique, ms, size in rows:
+        error = f"{(unique - exact) / exact * 100:+.2f}%" if unique is not None and exact else '-'
+        unique = '-' if unique is None else str(unique)
+        ms = '-' if ms is None else f"{ms:.0f}"
+        print(f"{method:<20}{unique:>12}{ms:>12}{size:>16}{error:>10}")
+    print(f"HyperLogLog standard error: {HyperLogLog.relative_error() * 100:.2f}%")
+
+    if not args.keep:
+        coll.drop()
+        sketch_coll.drop()
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+
+    try:
+        for count in (int(c) for c in args.counts.split(',') if c.strip()):
+            run(client[mongo_db], count, args)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,110 +2,159 @@
 """
 Consolidate and link all LPR user/visitor/plate data in MongoDB.
 Ensures every plate detection has proper user_name and user_email fields.
+
+Only plates whose owner changed since the previous run are relinked: the
+plate-to-owner mapping is snapshotted in `lpr_job_state` and diffed on each run,
+so a run with no registration changes touches no detections.
+
+Usage:
+  python consolidate_lpr_data.py           # relink added/changed/removed plates
+  python consolidate_lpr_data.py --full    # ignore the snapshot and relink every plate
+  python consolidate_lpr_data.py --stats   # also print linked/unlinked statistics
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateMany
 from dotenv import load_dotenv
+from datetime import datetime
+import argparse
 import os
 import sys
+import time
 
 load_dotenv()
 
-MONGO_URI = os.getenv('MONGODB_URI') or os.getenv('MONGO_URL')
-if not MONGO_URI:
-    print('Error: MONGO_URI or MONGO_URL not set. See .env.example')
-    sys.exit(1)
-DB_NAME = os.getenv('DB_NAME', 'web-portal')
-
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-
-print("🔗 Consolidating LPR data...")
-print(f"Connected to {DB_NAME} at {MONGO_URI}")
-
-# Collections
-users = db['users_cache']
-visitors = db['visitors']
-plates = db['license_plates']
-
-# Get all users and visitors with their plates
-all_user_data = {}
-updates_made = 0
-
-# Process users_cache
-print("\n👥 Processing users_cache...")
-user_count = 0
-for user in users.find():
-    if user.get('license_plates') and isinstance(user['license_plates'], list):
-        for plate_obj in user['license_plates']:
-            plate_num = plate_obj.get('credential', '').upper()
-            if plate_num:
-                all_user_data[plate_num] = {
-                    'user_name': user.get('name') or user.get('user_name') or user.get('first_name') or 'Unknown',
-                    'user_email': user.get('user_email') or user.get('email') or 'unknown',
-                    'source': 'users_cache'
-                }
-                user_count += 1
-
-print(f"Found {user_count} registered plates from {users.count_documents({})} users")
-
-# Process visitors
-print("\n👤 Processing visitors...")
-visitor_count = 0
-for visitor in visitors.find():
-    if visitor.get('license_plates') and isinstance(visitor['license_plates'], list):
-        for plate_obj in visitor['license_plates']:
-            plate_num = plate_obj.get('credential', '').upper()
-            if plate_num:
-                if plate_num not in all_user_data:  # Don't overwrite users_cache
-                    all_user_data[plate_num] = {
-                        'user_name': visitor.get('name') or visitor.get('user_name') or visitor.get('first_name') or 'Unknown',
-                        'user_email': visitor.get('user_email') or visitor.get('email') or 'unknown',
-                        'source': 'visitors'
-                    }
-                visitor_count += 1
-
-print(f"Found {visitor_count} registered plates from {visitors.count_documents({})} visitors")
-
-# Update all plate detections with user information
-print(f"\n🔄 Updating {plates.count_documents({})} plate detections...")
-
-for plate_num, user_info in all_user_data.items():
-    # Update all detections for this plate
-    result = plates.update_many(
-        {'license_plate': plate_num},
-        {
-            '$set': {
-                'user_name': user_info['user_name'],
-                'user_email': user_info['user_email'],
-                'user_source': user_info['source']
-            }
-        }
-    )
-    if result.modified_count > 0:
-        updates_made += result.modified_count
-        print(f"  {plate_num}: {user_info['user_name']} ({user_info['user_email']}) - {result.modified_count} detections updated")
-
-# Fix any plates that are still marked as "unknown" email
-print("\n⚠️  Checking for unlinked plates...")
-unlinked = plates.find({'user_email': 'unknown'})
-unlinked_count = plates.count_documents({'user_email': 'unknown'})
-
-if unlinked_count > 0:
-    print(f"Found {unlinked_count} unlinked plate detections:")
-    for detection in unlinked:
-        print(f"  {detection['license_plate']} - {detection['timestamp']}")
-
-print(f"\n✅ Data consolidation complete!")
-print(f"Total updates made: {updates_made}")
-print(f"Unique plates tracked: {len(all_user_data)}")
-print(f"Users processed: {users.count_documents({})}")
-print(f"Visitors processed: {visitors.count_documents({})}")
-print(f"Total detections: {plates.count_documents({})}")
-
-# Summary of linked vs unlinked
-linked = plates.count_documents({'user_email': {'$ne': 'unknown'}})
-unlinked = plates.count_documents({'user_email': 'unknown'})
-print(f"\n📊 Statistics:")
-print(f"  Linked detections: {linked}")
-print(f"  Unlinked detections: {unlinked}")
+from LPR_Notifications.lpr_helpers import load_plate_owners, plate_detections_filter, load_job_state, save_job_state
+
+JOB_ID = 'consolidate_lpr_data'
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Link plate detections to their registered users/visitors')
+    p.add_argument('--full', action='store_true', help='Relink every registered plate, ignoring the previous snapshot')
+    p.add_argument('--stats', action='store_true', help='Print linked/unlinked statistics even when nothing changed')
+    p.add_argument('--dry-run', action='store_true', help='Show the plate diff without writing')
+    return p.parse_args()
+
+
+def link_fields(info):
+    return {'user_name': info['user_name'], 'user_email': info['user_email'], 'user_source': info['source']}
+
+
+def diff_owners(previous, current):
+    """Return (added, changed, removed) plate sets between two {plate: fields} mappings."""
+    added = {p for p in current if p not in previous}
+    removed = {p for p in previous if p not in current}
+    changed = {p for p in current if p in previous and previous[p] != current[p]}
+    return added, changed, removed
+
+
+def relink_ops(current, plates_to_link, plates_to_unlink):
+    """Build one UpdateMany per plate whose owner was added, changed or removed.
+
+    Misreads reconcile_misreads.py linked to a plate follow that plate's owner.
+    """
+    ops = [UpdateMany(plate_detections_filter(plate), {'$set': current[plate]}) for plate in sorted(plates_to_link)]
+    for plate in sorted(plates_to_unlink):
+        # Only detections this job linked earlier are reset
+        ops.append(UpdateMany(
+            {**plate_detections_filter(plate), 'user_source': {'$exists': True}},
+            {'$set': {'user_name': 'Unknown', 'user_email': 'unknown'}, '$unset': {'user_source': ''}},
+        ))
+    return ops
+
+
+def print_stats(plates):
+    """Linked/unlinked totals and the most frequent unlinked plates from a single aggregation."""
+    result = list(plates.aggregate([
+        {'$facet': {
+            'summary': [
+                {'$group': {
+                    '_id': None,
+                    'total': {'$sum': 1},
+                    'unlinked': {'$sum': {'$cond': [{'$eq': ['$user_email', 'unknown']}, 1, 0]}},
+                }},
+            ],
+            'top_unlinked': [
+                {'$match': {'user_email': 'unknown'}},
+                {'$group': {'_id': '$license_plate', 'count': {'$sum': 1}, 'last_seen': {'$max': '$timestamp'}}},
+                {'$sort': {'count': -1}},
+                {'$limit': 10},
+            ],
+        }},
+    ]))
+    data = result[0] if result else {}
+    summary = (data.get('summary') or [{}])[0]
+    total = summary.get('total', 0)
+    unlinked = summary.get('unlinked', 0)
+
+    print(f"\n📊 Statistics:")
+    print(f"  Total detections: {total}")
+    print(f"  Linked detections: {total - unlinked}")
+    print(f"  Unlinked detections: {unlinked}")
+    if data.get('top_unlinked'):
+        print("\n⚠️  Most frequent unlinked plates:")
+        for row in data['top_unlinked']:
+            print(f"  {row['_id']} - {row['count']} detections (last seen {row['last_seen']})")
+
+
+def main():
+    args = parse_args()
+
+    MONGO_URI = os.getenv('MONGODB_URI') or os.getenv('MONGO_URL')
+    if not MONGO_URI:
+        print('Error: MONGO_URI or MONGO_URL not set. See .env.example')
+        sys.exit(1)
+    DB_NAME = os.getenv('DB_NAME', 'web-portal')
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+
+    print("🔗 Consolidating LPR data...")
+    print(f"Connected to {DB_NAME} at {MONGO_URI}")
+
+    started = time.time()
+    plates = db['license_plates']
+
+    # Current plate -> owner mapping (users_cache takes precedence over visitors)
+    current = {plate: link_fields(info) for plate, info in load_plate_owners(db).items()}
+    from_users = sum(1 for f in current.values() if f['user_source'] == 'users_cache')
+    print(f"\n👥 {from_users} registered plates from users_cache, {len(current) - from_users} from visitors")
+
+    # Previous mapping from the last successful run
+    state = {} if args.full else load_job_state(db, JOB_ID)
+    previous = {row[0]: {'user_name': row[1], 'user_email': row[2], 'user_source': row[3]}
+                for row in state.get('plates', [])}
+
+    added, changed, removed = diff_owners(previous, current)
+    print(f"\n🔄 Plate diff: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+    for plate in sorted(added | changed):
+        print(f"  {plate}: {current[plate]['user_name']} ({current[plate]['user_email']})")
+    for plate in sorted(removed):
+        print(f"  {plate}: no longer registered")
+
+    updates_made = 0
+    ops = relink_ops(current, added | changed, removed)
+    if ops and not args.dry_run:
+        result = plates.bulk_write(ops, ordered=False)
+        updates_made = result.modified_count
+
+    if not args.dry_run:
+        # Snapshot as a list of rows: plate strings are not safe as document keys
+        save_job_state(db, JOB_ID, {
+            'plates': [[p, f['user_name'], f['user_email'], f['user_source']] for p, f in sorted(current.items())],
+            'last_run': datetime.utcnow(),
+        })
+
+    print(f"\n✅ Data consolidation complete!")
+    print(f"Total updates made: {updates_made}")
+    print(f"Unique plates tracked: {len(current)}")
+    print(f"Elapsed: {(time.time() - started) * 1000:.0f} ms")
+
+    if ops or args.stats:
+        print_stats(plates)
+
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
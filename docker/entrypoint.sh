@@ -5,6 +5,8 @@ set -eu
 # Starts:
 #  - ./query_and_delete_completed_visitors.sh (background)
 #  - python3 fast_lpr_capture.py (background)
+#  - python3 lpr_owner_relinker.py (background, when RUN_LPR_OWNER_RELINKER=1)
+#  - python3 lpr_rollup_worker.py (background, when RUN_LPR_ROLLUP_WORKER=1)
 #  - node index.js (foreground)
 
 if [ -d /app ]; then
@@ -52,22 +54,10 @@ else
   echo "No query_and_delete_completed_visitors.sh found in either ./ or ./scripts/"
 fi
 
-# Optionally run a backfill catch-up before starting the main LPR capture service
-CATCHUP_HOURS=${CATCHUP_HOURS:-24}
-RUN_LPR_CATCHUP_ON_STARTUP=${RUN_LPR_CATCHUP_ON_STARTUP:-1}
-CATCHUP_LOCK="/var/run/lpr_catchup.lock"
-
-if [ -f ./backfill_protect_hours.py ] && [ "${RUN_LPR_CATCHUP_ON_STARTUP}" != "0" ]; then
-  if [ -e "$CATCHUP_LOCK" ]; then
-    echo "Catchup already in progress (lock $CATCHUP_LOCK), skipping"
-  else
-    echo "[entrypoint] Running ${CATCHUP_HOURS}-hour catch-up before starting main service..."
-    touch "$CATCHUP_LOCK"
-    # Run catchup synchronously and capture logs
-    nohup python3 ./backfill_protect_hours.py "${CATCHUP_HOURS}" > /var/log/backfill_protect.log 2>&1 || echo "Catchup finished with non-zero exit (check /var/log/backfill_protect.log)"
-    rm -f "$CATCHUP_LOCK"
-  fi
-fi
+# Startup catch-up now runs inside fast_lpr_capture.py as a background task, so
+# neither live capture nor the portal waits for it. These are read by the service.
+export CATCHUP_HOURS=${CATCHUP_HOURS:-24}
+export RUN_LPR_CATCHUP_ON_STARTUP=${RUN_LPR_CATCHUP_ON_STARTUP:-1}
 
 # Start the Python LPR capture service in background
 if [ -f ./fast_lpr_capture.py ]; then
@@ -79,6 +69,22 @@ else
   echo "No fast_lpr_capture.py found"
 fi
 
+# Optionally keep detections linked to their owners as plates are added/removed
+# (uses change streams, so MongoDB must run as a replica set)
+if [ -f ./lpr_owner_relinker.py ] && [ "${RUN_LPR_OWNER_RELINKER:-0}" = "1" ]; then
+  echo "Starting lpr_owner_relinker.py in background"
+  python3 ./lpr_owner_relinker.py >> /var/log/lpr_owner_relinker.log 2>&1 &
+  P3=$!
+  PIDS="$PIDS $P3"
+fi
+
+if [ -f ./lpr_rollup_worker.py ] && [ "${RUN_LPR_ROLLUP_WORKER:-0}" = "1" ]; then
+  echo "Starting lpr_rollup_worker.py in background"
+  python3 ./lpr_rollup_worker.py >> /var/log/lpr_rollup_worker.log 2>&1 &
+  P4=$!
+  PIDS="$PIDS $P4"
+fi
+
 # Finally start Node in foreground (the main process)
 if [ -f ./index.js ]; then
   echo "Starting node index.js (foreground)"
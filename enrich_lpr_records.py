@@ -16,11 +16,24 @@ Required LPR camera entries should contain:
 - Car color
 - Car type
 - Owner
+
+The enrichment runs as a single-pass join: the plate-to-owner map is loaded once
+from `users_cache` and `visitors`, detections missing a field are streamed with a
+narrow projection, and updates are written as unordered bulk batches from a pool
+of worker threads.
+
+Usage:
+  python enrich_lpr_records.py                 # enrich every record missing a field
+  python enrich_lpr_records.py --incremental   # only records added since the last run
+  python enrich_lpr_records.py --workers 8 --batch-size 2000
 """
 
 import os
 import sys
+import time
 import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from pymongo import MongoClient, UpdateOne
 from dotenv import load_dotenv
@@ -28,11 +41,41 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+from LPR_Notifications.lpr_helpers import UNKNOWN_OWNER, load_plate_owners, load_job_state, save_job_state
+
 # Configure logging
-logging.basicConfig(level=logging.INFO, 
+logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+JOB_ID = 'enrich_lpr_records'
+
+# Fields to update if missing
+FIELDS_TO_CHECK = [
+    'user_email',     # Email
+    'user_name',      # Name
+    'vehicle_color',  # Car color
+    'vehicle_type',   # Car type
+    'owner',          # Owner
+    'user_type',      # Type of user
+]
+
+# Only the fields the enrichment inspects are read from each detection
+PROJECTION = dict.fromkeys(
+    FIELDS_TO_CHECK + ['license_plate', 'vehicle_data.color', 'vehicle_data.vehicleType',
+                       'vehicle_data.vehicle_type', 'vehicle_data.type'],
+    1,
+)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Fill missing owner/vehicle fields on LPR detections')
+    p.add_argument('--incremental', action='store_true', help='Only process records newer than the last run watermark')
+    p.add_argument('--workers', type=int, default=int(os.getenv('ENRICH_WORKERS', '4')), help='Bulk write worker threads')
+    p.add_argument('--batch-size', type=int, default=1000, help='Updates per bulk_write batch')
+    return p.parse_args()
+
+
 def connect_mongodb():
     """Connect to MongoDB"""
     try:
@@ -40,7 +83,7 @@ def connect_mongodb():
         mongo_host = os.getenv('MONGODB_HOST', 'localhost')
         mongo_port = os.getenv('MONGODB_PORT', '27017')
         mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
-        
+
         # Connect to MongoDB
         mongo = MongoClient(f"{mongo_host}:{mongo_port}")
         db = mongo[mongo_db]
@@ -49,152 +92,117 @@ def connect_mongodb():
         logger.error(f"Failed to connect to MongoDB: {e}")
         sys.exit(1)
 
-def look_up_user_info(db, license_plate):
-    """Look up user info by license plate"""
-    try:
-        users_cache = db['users_cache']
-        
-        # Search for the plate in users' license_plates array
-        user = users_cache.find_one({
-            'license_plates': {
-                '$elemMatch': {
-                    'credential': license_plate
-                }
-            }
-        })
-        
-        if user:
-            return {
-                'user_email': user.get('user_email') or user.get('email') or 'unknown',
-                'user_name': user.get('name') or user.get('user_name') or 'Unknown',
-                'user_type': user.get('user_type') or 'resident',
-                'owner': user.get('owner') or 'Unknown'
-            }
-        else:
-            return {
-                'user_email': 'unknown',
-                'user_name': 'Unknown',
-                'user_type': 'unknown',
-                'owner': 'Unknown'
-            }
-    except Exception as e:
-        logger.debug(f"User lookup error for plate {license_plate}: {e}")
-        return {
-            'user_email': 'unknown',
-            'user_name': 'Unknown',
-            'user_type': 'unknown',
-            'owner': 'Unknown'
-        }
-
-def enrich_lpr_records(db):
+
+def _missing(record, field):
+    return field not in record or record[field] is None or record[field] == ''
+
+
+def build_update(record, owners):
+    """Return the $set fields needed to complete a record (empty if nothing can be filled)."""
+    update_fields = {}
+    user_info = owners.get(str(record['license_plate']).upper(), UNKNOWN_OWNER)
+
+    for field in ('user_email', 'user_name', 'user_type', 'owner'):
+        if _missing(record, field):
+            update_fields[field] = user_info[field]
+
+    vehicle_data = record.get('vehicle_data')
+    if isinstance(vehicle_data, dict):
+        # Try to extract color / vehicle type from vehicle_data
+        if _missing(record, 'vehicle_color') and vehicle_data.get('color'):
+            update_fields['vehicle_color'] = vehicle_data['color']
+        if _missing(record, 'vehicle_type'):
+            vehicle_type = vehicle_data.get('vehicleType') or vehicle_data.get('vehicle_type') or vehicle_data.get('type')
+            if vehicle_type:
+                update_fields['vehicle_type'] = vehicle_type
+
+    return update_fields
+
+
+def enrich_lpr_records(db, incremental=False, workers=4, batch_size=1000):
     """Enrich LPR records with missing information"""
     lpr_collection = db['license_plates']
-    
-    # Fields to update if missing
-    fields_to_check = [
-        'user_email',     # Email
-        'user_name',      # Name
-        'vehicle_color',  # Car color
-        'vehicle_type',   # Car type
-        'owner',          # Owner
-        'user_type',      # Type of user
-    ]
-    
-    # Count total documents
-    total = lpr_collection.count_documents({'license_plate': {'$exists': True, '$ne': None, '$ne': ''}})
-    logger.info(f"Processing {total} LPR records for enrichment")
-    
-    # Get all license plate records
-    records = lpr_collection.find({'license_plate': {'$exists': True, '$ne': None, '$ne': ''}})
-    
-    # Prepare bulk operations
-    bulk_ops = []
+
+    started = time.time()
+    owners = load_plate_owners(db)
+    logger.info(f"Loaded {len(owners)} registered plates in {time.time() - started:.2f}s")
+
+    # Records with a plate and at least one field missing
+    query = {
+        'license_plate': {'$exists': True, '$nin': [None, '']},
+        '$or': [{field: {'$in': [None, '']}} for field in FIELDS_TO_CHECK],
+    }
+
+    # Fix the upper bound at the start so records inserted mid-run are left for the next one
+    newest = lpr_collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+    if not newest:
+        logger.info("No LPR records found")
+        return
+    id_range = {'$lte': newest['_id']}
+    if incremental:
+        watermark = load_job_state(db, JOB_ID).get('watermark')
+        if watermark:
+            id_range['$gt'] = watermark
+            logger.info(f"Incremental run: records after {watermark.generation_time.isoformat()}")
+    query['_id'] = id_range
+
     processed = 0
     enriched = 0
-    
-    # Process records
-    for record in records:
-        update_needed = False
-        update_fields = {}
-        
-        # Check for missing fields
-        for field in fields_to_check:
-            if field not in record or record[field] is None or record[field] == '':
-                update_needed = True
-                break
-        
-        # If updates needed, enrich the record
-        if update_needed:
-            # Look up user info
-            user_info = look_up_user_info(db, record['license_plate'])
-            
-            # Prepare update
-            for field, value in user_info.items():
-                if field not in record or record[field] is None or record[field] == '':
-                    update_fields[field] = value
-            
-            # Add vehicle info if missing
-            if ('vehicle_color' not in record or record['vehicle_color'] is None or record['vehicle_color'] == '') and 'vehicle_data' in record:
-                # Try to extract color from vehicle_data
-                try:
-                    vehicle_data = record['vehicle_data']
-                    if isinstance(vehicle_data, dict):
-                        color = vehicle_data.get('color')
-                        if color:
-                            update_fields['vehicle_color'] = color
-                except:
-                    pass
-            
-            if ('vehicle_type' not in record or record['vehicle_type'] is None or record['vehicle_type'] == '') and 'vehicle_data' in record:
-                # Try to extract vehicle type from vehicle_data
-                try:
-                    vehicle_data = record['vehicle_data']
-                    if isinstance(vehicle_data, dict):
-                        vehicle_type = vehicle_data.get('vehicleType') or vehicle_data.get('vehicle_type') or vehicle_data.get('type')
-                        if vehicle_type:
-                            update_fields['vehicle_type'] = vehicle_type
-                except:
-                    pass
-            
-            # If we have updates, add to bulk operations
+    modified = 0
+    batch = []
+    pending = set()
+
+    def collect(done):
+        nonlocal modified
+        for future in done:
+            modified += future.result().modified_count
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for record in lpr_collection.find(query, PROJECTION, batch_size=batch_size):
+            processed += 1
+            update_fields = build_update(record, owners)
             if update_fields:
-                bulk_ops.append(
-                    UpdateOne(
-                        {'_id': record['_id']},
-                        {'$set': update_fields}
-                    )
-                )
+                batch.append(UpdateOne({'_id': record['_id']}, {'$set': update_fields}))
                 enriched += 1
-        
-        processed += 1
-        
-        # Execute bulk operations in batches
-        if len(bulk_ops) >= 100:
-            if bulk_ops:
-                result = lpr_collection.bulk_write(bulk_ops)
-                logger.info(f"Batch update: {result.modified_count} records updated")
-            bulk_ops = []
-    
-    # Execute remaining bulk operations
-    if bulk_ops:
-        result = lpr_collection.bulk_write(bulk_ops)
-        logger.info(f"Final batch update: {result.modified_count} records updated")
-    
-    logger.info(f"Processed {processed} records, enriched {enriched} records")
+
+            if len(batch) >= batch_size:
+                # Bound in-flight batches so a slow server applies back-pressure to the cursor
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(pool.submit(lpr_collection.bulk_write, batch, ordered=False))
+                batch = []
+
+            if processed % 10000 == 0:
+                elapsed = time.time() - started
+                logger.info(f"Progress: {processed} records, {enriched} enriched ({processed / elapsed:.0f} records/sec)")
+
+        if batch:
+            pending.add(pool.submit(lpr_collection.bulk_write, batch, ordered=False))
+        done, _ = wait(pending)
+        collect(done)
+
+    save_job_state(db, JOB_ID, {'watermark': newest['_id'], 'last_run': datetime.utcnow(),
+                                'processed': processed, 'enriched': enriched})
+
+    elapsed = max(time.time() - started, 1e-6)
+    logger.info(f"Processed {processed} records, enriched {enriched} records, {modified} modified")
+    logger.info(f"Throughput: {processed / elapsed:.0f} records/sec over {elapsed:.1f}s")
 
 def main():
     """Main function"""
+    args = parse_args()
     logger.info("Starting LPR Records Enrichment")
-    
+
     # Connect to MongoDB
     mongo_client, db = connect_mongodb()
-    
+
     try:
         # Enrich LPR records
-        enrich_lpr_records(db)
-        
+        enrich_lpr_records(db, incremental=args.incremental, workers=args.workers, batch_size=args.batch_size)
+
         logger.info("LPR Records Enrichment completed successfully")
-    
+
     except Exception as e:
         logger.error(f"Error during enrichment: {e}")
         sys.exit(1)
@@ -203,4 +211,4 @@ def main():
         mongo_client.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
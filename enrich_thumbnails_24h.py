@@ -94,7 +94,7 @@ async def main():
 
     query = {
         '$and': [
-            {'timestamp': {'$gte': since.isoformat()}},
+            {'timestamp': {'$gte': since}},
             {'$or': [
                 {'thumbnails': {'$exists': False}},
                 {'thumbnails': {'$size': 0}}
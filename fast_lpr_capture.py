@@ -7,18 +7,59 @@ Stores directly to MongoDB
 Usage:
   python fast_lpr_capture.py              # Run continuously
   python fast_lpr_capture.py 120          # Run for 2 minutes
+  python fast_lpr_capture.py --no-catchup # Skip the background startup catch-up
+
+On startup a background task replays events missed while the service was down,
+starting from the last processed point persisted in `lpr_job_state` (capped at
+CATCHUP_HOURS, default 24). Live capture starts immediately and runs alongside it.
+
+With LPR_COALESCE_SECONDS set, repeat reads of a plate at a camera within that
+many seconds are written as one document (see LPR_Notifications/lpr_coalesce.py);
+held reads are written when their window passes and on shutdown.
+
+Unknown plates are counted in fixed-size day/week heavy-hitter summaries
+(LPR_Notifications/lpr_heavy_hitters.py) snapshotted to
+`lpr_unknown_heavy_hitters` every LPR_UNKNOWN_SNAPSHOT_SECONDS; a plate read
+LPR_UNKNOWN_ALERT_DAY / LPR_UNKNOWN_ALERT_WEEK times in a period gets a record
+in `lpr_unknown_alerts`. LPR_UNKNOWN_COUNTERS=0 turns this off.
+
+Every detection is checked against the `lpr_watchlist` plates as it is read
+(LPR_Notifications/lpr_watchlist.py, reloaded on change); hits are queued and
+written to `lpr_watchlist_hits` by a background task. LPR_WATCHLIST=0 turns
+this off. Events are polled every LPR_POLL_SECONDS (default 5).
+
+Watchlist hits are queued in `notification_jobs` for the entry's `notify`
+addresses plus LPR_WATCHLIST_NOTIFY; with LPR_NOTIFY_ARRIVALS=1 residents are
+queued a notice when their plate is read at a non-exit camera.
+notification_dispatcher.py sends them.
 """
 
 import asyncio
 import os
 import sys
+import time
 import logging
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from LPR_Notifications.lpr_helpers import (
+    iter_event_windows, timeseries_mode, timeseries_collection_name, insert_timeseries_detection, record_plate_activity,
+    plate_search_fields, load_plate_owners, vehicle_fields, parse_timestamp,
+)
+from LPR_Notifications.lpr_fuzzy import PlateFuzzyIndex, plate_candidate
+from LPR_Notifications.lpr_event_raw import raw_enabled, store_event_raw
+from LPR_Notifications.lpr_coalesce import ReadCoalescer
+from LPR_Notifications.lpr_watchlist import HITS_COLLECTION, WatchlistMatcher
+from LPR_Notifications.lpr_notify import enqueue_notification
+from LPR_Notifications.lpr_visits import camera_roles, camera_role
+from LPR_Notifications.lpr_heavy_hitters import HEAVY_HITTERS_COLLECTION, ALERTS_COLLECTION, GRANULARITIES, UnknownPlateTracker
+
+STATE_ID = 'fast_lpr_capture'
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -34,16 +75,61 @@ def mask_plate(plate: str) -> str:
         return '*' * len(plate)
     return '*' * (len(plate) - 2) + plate[-2:]
 
+def thumbnail_vehicle_data(thumb):
+    """Return `vehicle_data` ({attributes: {color, vehicleType}, group}) from a Protect vehicle thumbnail."""
+    vehicle_data = {}
+    attrs = getattr(thumb, 'attributes', None)
+    attributes = {}
+    for key, names in (('color', ('color',)), ('vehicleType', ('vehicle_type', 'vehicleType'))):
+        attr = next((getattr(attrs, n) for n in names if getattr(attrs, n, None) is not None), None)
+        value = getattr(attr, 'val', None) or getattr(attr, 'value', None)
+        if value:
+            attributes[key] = {'value': value, 'confidence': getattr(attr, 'confidence', None)}
+    if attributes:
+        vehicle_data['attributes'] = attributes
+    group = getattr(thumb, 'group', None)
+    name = getattr(group, 'matched_name', None) or getattr(group, 'name', None)
+    if name:
+        vehicle_data['group'] = {'name': name, 'confidence': getattr(group, 'confidence', None)}
+    return vehicle_data
+
 class FastLPRCapture:
     """Minimal, fast LPR capture service"""
     
-    def __init__(self, duration=0):
+    def __init__(self, duration=0, catchup_on_start=True):
         self.duration = duration
         self.protect = None
         self.db = None
         self.lpr_cameras = {}
-        self.stats = {'detected': 0, 'stored': 0}
+        self.stats = {'detected': 0, 'stored': 0, 'caught_up': 0}
         self.last_check = datetime.utcnow()
+        self.catchup_on_start = catchup_on_start
+        self.catchup_task = None
+        # Registered plates for misread matching, reloaded every LPR_FUZZY_REFRESH_SECONDS
+        self.fuzzy_index = None
+        self.plate_owners = {}
+        self.fuzzy_loaded_at = 0.0
+        # LPR_COALESCE_SECONDS > 0 folds repeat reads of a plate at a camera into one document
+        window = float(os.getenv('LPR_COALESCE_SECONDS', '0'))
+        max_pending = int(os.getenv('LPR_COALESCE_MAX_PENDING', '1000'))
+        self.coalescer = ReadCoalescer(window, max_pending) if window > 0 else None
+        # Top unknown plates per day/week in LPR_UNKNOWN_COUNTERS slots each; 0 disables
+        counters = int(os.getenv('LPR_UNKNOWN_COUNTERS', '500'))
+        thresholds = {'day': int(os.getenv('LPR_UNKNOWN_ALERT_DAY', '5')),
+                      'week': int(os.getenv('LPR_UNKNOWN_ALERT_WEEK', '15'))}
+        self.unknown_tracker = UnknownPlateTracker(counters, thresholds) if counters > 0 else None
+        self.unknown_snapshot_seconds = float(os.getenv('LPR_UNKNOWN_SNAPSHOT_SECONDS', '60'))
+        self.unknown_saved_at = time.monotonic()
+        # Watchlist hits go through a bounded queue so matching never waits on Mongo
+        self.watchlist = None
+        self.watchlist_enabled = os.getenv('LPR_WATCHLIST', '1') != '0'
+        self.hit_queue = None
+        self.hit_task = None
+        self.poll_seconds = float(os.getenv('LPR_POLL_SECONDS', '5'))
+        # Queued for notification_dispatcher.py
+        self.watchlist_notify = [e.strip() for e in os.getenv('LPR_WATCHLIST_NOTIFY', '').split(',') if e.strip()]
+        self.notify_arrivals = os.getenv('LPR_NOTIFY_ARRIVALS', '0') == '1'
+        self.roles = camera_roles()
         
     async def start(self):
         """Start the service"""
@@ -110,12 +196,30 @@ class FastLPRCapture:
 
             self.db = mongo[mongo_db]
             self.lpr_table = self.db['license_plates']
+            self.state_table = self.db['lpr_job_state']
+            # LPR_TIMESERIES_WRITE=dual|only also writes the time-series layout (see lpr_timeseries.py)
+            self.ts_mode = timeseries_mode()
+            self.ts_table = self.db[timeseries_collection_name()] if self.ts_mode != 'off' else None
             
             # Create indexes for efficient querying
             self.lpr_table.create_index('event_id', unique=True)
             self.lpr_table.create_index('timestamp')
             self.lpr_table.create_index('camera_id')
             self.lpr_table.create_index('license_plate')
+            self.lpr_table.create_index('plate_key')
+            self.lpr_table.create_index('plate_ngrams')
+            for field in ('color', 'vehicle_type', 'group'):
+                self.lpr_table.create_index([(field, 1), ('timestamp', -1)])
+            if self.coalescer is not None:
+                self.lpr_table.create_index('coalesced_event_ids', sparse=True)
+            if self.unknown_tracker is not None:
+                self._load_unknown_tracker()
+            if self.watchlist_enabled:
+                self.watchlist = WatchlistMatcher(self.db, float(os.getenv('LPR_WATCHLIST_REFRESH_SECONDS', '60')))
+                self.watchlist.start()
+                self.db[HITS_COLLECTION].create_index([('timestamp', -1)])
+                self.db[HITS_COLLECTION].create_index([('watch_plate', 1), ('timestamp', -1)])
+                self.hit_queue = asyncio.Queue(maxsize=int(os.getenv('LPR_WATCHLIST_QUEUE_SIZE', '1000')))
             
             logger.info("✓ Connected to MongoDB")
         except Exception as e:
@@ -125,15 +229,16 @@ class FastLPRCapture:
         logger.info(f"\n{'='*70}")
         logger.info("🎯 License Plate Capture Running")
         logger.info(f"{'='*70}\n")
-        
+
+        # Live capture starts from now; anything older is left to the catch-up task
+        self.last_check = datetime.utcnow()
         return True
     
     async def capture_plates(self):
         """Poll for new events since last check"""
         try:
-            # Get events from last 5 minutes
             start = self.last_check
-            self.last_check = datetime.utcnow()
+            now = datetime.utcnow()
             
             # Get events
             events = await self.protect.get_events(
@@ -142,58 +247,284 @@ class FastLPRCapture:
             )
             
             for event in events:
-                # Only process LPR camera events
-                if event.camera_id not in self.lpr_cameras:
-                    continue
-                
-                # Check for license plate detection
-                if not event.smart_detect_types:
-                    continue
-                
-                if 'licensePlate' not in event.smart_detect_types:
-                    continue
-                
-                # Check if already stored
-                if self.lpr_table.find_one({'event_id': event.id}):
-                    continue
-                
-                # Extract license plate from detected_thumbnails
-                license_plate = None
-                confidence = 0
-                
-                if event.metadata and event.metadata.detected_thumbnails:
-                    for thumb in event.metadata.detected_thumbnails:
-                        if thumb.type == 'vehicle' and thumb.name:
-                            license_plate = thumb.name
-                            confidence = thumb.confidence
-                            break
-                
-                if not license_plate:
-                    continue
-                
-                # Look up user by license plate
-                user_email = self._lookup_user_by_plate(license_plate)
-                
-                # Store event
-                doc = {
-                    'event_id': event.id,
-                    'timestamp': event.start,
-                    'camera_id': event.camera_id,
-                    'camera_name': self.lpr_cameras[event.camera_id],
-                    'license_plate': license_plate,
-                    'confidence': confidence,
-                    'user_email': user_email,
-                    'detected_at': datetime.utcnow().isoformat()
-                }
-                
-                self.lpr_table.insert_one(doc)
-                self.stats['stored'] += 1
-                
-                user_info = f" | User: {user_email}" if user_email != "unknown" else " | User: unknown"
-                logger.info(f"✓ Plate: {license_plate} | Camera: {self.lpr_cameras[event.camera_id]} | Confidence: {confidence}%{user_info}")
+                self._store_event(event)
+
+            # Only advance (and persist) the checkpoint once the batch is processed
+            self.last_check = now
+            state = {'last_processed': now}
+            if self.coalescer is not None:
+                # Reads still held in memory are not stored yet; keep the persisted checkpoint
+                # at the oldest of them so a restart's catch-up replays them
+                held = parse_timestamp(self.coalescer.oldest_pending())
+                if held is not None and held < now:
+                    state['last_processed'] = held
+                state['coalescing'] = self.coalescer.report()
+            if self.watchlist is not None:
+                state['watchlist'] = {**self.watchlist.report(), 'dropped': self.stats.get('watchlist_dropped', 0)}
+            self._save_state(state)
                 
         except Exception as e:
             logger.debug(f"Capture error: {e}")
+
+    async def catch_up(self, state, until):
+        """Replay events missed while the service was down, in bounded windows.
+
+        `state` is the checkpoint left by the previous run. Runs as a background
+        task alongside live capture. Progress is persisted as `catchup_from` so an
+        interrupted catch-up resumes where it stopped rather than being skipped
+        over by the live checkpoint.
+        """
+        hours = int(os.getenv('CATCHUP_HOURS', '24'))
+        window_minutes = int(os.getenv('LPR_CATCHUP_WINDOW_MINUTES', '15'))
+        page_size = int(os.getenv('LPR_CATCHUP_PAGE_SIZE', '100'))
+
+        floor = until - timedelta(hours=hours)
+        candidates = [t for t in (state.get('catchup_from'), state.get('last_processed')) if t]
+        start = max(min(candidates), floor) if candidates else floor
+
+        if start >= until:
+            logger.info("✓ Catch-up: nothing to replay")
+            return
+
+        gap_minutes = (until - start).total_seconds() / 60
+        logger.info(f"⏱️  Catch-up: replaying {gap_minutes:.0f} minutes in {window_minutes}-minute windows (live capture already running)")
+        self._save_state({'catchup_from': start})
+
+        try:
+            async for events, done_until in iter_event_windows(self.protect, start, until, window_minutes, page_size):
+                for event in events:
+                    if self._store_event(event, origin='catchup'):
+                        self.stats['caught_up'] += 1
+                self._save_state({'catchup_from': done_until})
+                # Yield to live capture between pages
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            logger.info("⚠️  Catch-up cancelled; will resume on next start")
+            raise
+        except Exception as e:
+            logger.error(f"Catch-up error: {e}")
+            return
+
+        self.state_table.update_one({'_id': STATE_ID}, {'$unset': {'catchup_from': ''}})
+        logger.info(f"✓ Catch-up complete: {self.stats['caught_up']} plates recovered")
+
+    def _store_event(self, event, origin=None):
+        """Store a single Protect event if it is a new LPR detection. Returns True if stored."""
+        # Only process LPR camera events
+        if event.camera_id not in self.lpr_cameras:
+            return False
+        
+        # Check for license plate detection
+        if not event.smart_detect_types:
+            return False
+        
+        if 'licensePlate' not in event.smart_detect_types:
+            return False
+        
+        # Check if already stored
+        dedupe_table = self.ts_table if self.ts_mode == 'only' else self.lpr_table
+        if self.coalescer is not None:
+            if self.coalescer.holds(event.id):
+                return False
+            seen = {'$or': [{'event_id': event.id}, {'coalesced_event_ids': event.id}]}
+        else:
+            seen = {'event_id': event.id}
+        if dedupe_table.find_one(seen, {'_id': 1}):
+            return False
+        
+        # Extract license plate from detected_thumbnails
+        license_plate = None
+        confidence = 0
+        vehicle_data = {}
+        
+        if event.metadata and event.metadata.detected_thumbnails:
+            for thumb in event.metadata.detected_thumbnails:
+                if thumb.type == 'vehicle' and thumb.name:
+                    license_plate = thumb.name
+                    confidence = thumb.confidence
+                    vehicle_data = thumbnail_vehicle_data(thumb)
+                    break
+        
+        if not license_plate:
+            return False
+        
+        # Look up user by license plate
+        user_email = self._lookup_user_by_plate(license_plate)
+        
+        # Store event
+        doc = {
+            'event_id': event.id,
+            'timestamp': event.start,
+            'camera_id': event.camera_id,
+            'camera_name': self.lpr_cameras[event.camera_id],
+            'license_plate': license_plate,
+            'confidence': confidence,
+            'user_email': user_email,
+            'detected_at': datetime.utcnow()
+        }
+        if origin:
+            doc['origin'] = origin
+        if vehicle_data:
+            doc['vehicle_data'] = vehicle_data
+        if self.watchlist is not None:
+            # Before coalescing, so a flagged plate is reported on its first read
+            self._check_watchlist(doc)
+        doc.update(plate_search_fields(license_plate))
+        doc.update(vehicle_fields(doc))
+        if user_email == 'unknown':
+            candidate = self._fuzzy_candidate(license_plate)
+            if candidate:
+                doc['plate_candidate'] = candidate
+        
+        if raw_enabled():
+            # Raw metadata stays out of the hot document; kept compressed for debugging/re-extraction
+            try:
+                store_event_raw(self.db, event.id, event.metadata, 'fast_capture')
+            except Exception as e:
+                logger.warning(f"event_raw write failed for {event.id}: {e}")
+
+        if self.coalescer is not None:
+            # Repeat reads fold into the held document; write whatever the coalescer releases
+            self._write_detections(self.coalescer.add(doc))
+            return True
+        return self._write_detection(doc)
+
+    def _write_detection(self, doc):
+        """Insert a detection (and its time-series copy). Returns True if stored."""
+        try:
+            if self.ts_mode != 'only':
+                self.lpr_table.insert_one(doc)
+            # The time-series copy is claimed per event_id, as the collection has no unique index
+            if self.ts_table is not None and not insert_timeseries_detection(self.db, doc) and self.ts_mode == 'only':
+                return False
+        except DuplicateKeyError:
+            # Live capture and catch-up can race on the same event
+            return False
+        self.stats['stored'] += 1
+        license_plate = doc['license_plate']
+        try:
+            record_plate_activity(self.db, doc)
+        except Exception as e:
+            logger.warning(f"plate_activity update failed for {license_plate}: {e}")
+        
+        user_info = f" | User: {doc['user_email']}"
+        reads = f" | Reads: {doc['read_count']}" if doc.get('read_count', 1) > 1 else ""
+        prefix = "↻ Caught" if doc.get('origin') == 'catchup' else "✓ Plate"
+        logger.info(f"{prefix}: {license_plate} | Camera: {doc['camera_name']} | Confidence: {doc['confidence']}%{user_info}{reads}")
+        if self.unknown_tracker is not None and doc['user_email'] == 'unknown':
+            self._record_unknown_alerts(self.unknown_tracker.add(doc))
+        if self.notify_arrivals and doc['user_email'] != 'unknown' and doc.get('origin') != 'catchup':
+            self._notify_arrival(doc)
+        return True
+
+    def _notify_arrival(self, doc):
+        if camera_role(doc, self.roles) == 'exit':
+            return
+        try:
+            enqueue_notification(
+                self.db, [doc['user_email']], f"Vehicle {doc['license_plate']} arrived",
+                f"Your vehicle {doc['license_plate']} was read by {doc['camera_name']} at "
+                f"{doc['timestamp']:%Y-%m-%d %H:%M:%S} UTC.",
+                kind='arrival', key=f"arrival:{doc['event_id']}", event_time=doc['timestamp'])
+        except Exception as e:
+            logger.warning(f"Arrival notification enqueue failed: {e}")
+
+    def _write_detections(self, docs):
+        for doc in docs:
+            self._write_detection(doc)
+
+    def _check_watchlist(self, doc):
+        hit = self.watchlist.check(doc)
+        if hit is None:
+            return
+        if doc.get('origin'):
+            hit['origin'] = doc['origin']
+        try:
+            self.hit_queue.put_nowait(hit)
+        except asyncio.QueueFull:
+            self.stats['watchlist_dropped'] = self.stats.get('watchlist_dropped', 0) + 1
+            logger.warning(f"Watchlist hit queue full; dropped hit for {mask_plate(hit['license_plate'])}")
+
+    async def deliver_watchlist_hits(self):
+        """Background task: write queued watchlist hits to lpr_watchlist_hits in batches."""
+        while True:
+            batch = [await self.hit_queue.get()]
+            while not self.hit_queue.empty() and len(batch) < 100:
+                batch.append(self.hit_queue.get_nowait())
+            await asyncio.to_thread(self._write_watchlist_hits, batch)
+
+    def _write_watchlist_hits(self, hits):
+        for hit in hits:
+            logger.warning(f"🚩 Watchlist hit: {mask_plate(hit['license_plate'])} ({hit['match']} match for "
+                           f"{hit.get('list') or 'watchlist'}) | Camera: {hit['camera_name']}")
+        try:
+            # Keyed by event id, so a replayed event does not raise a second hit
+            self.db[HITS_COLLECTION].bulk_write(
+                [UpdateOne({'_id': h['_id']}, {'$setOnInsert': h}, upsert=True) for h in hits], ordered=False)
+        except Exception as e:
+            logger.error(f"Watchlist hit write failed: {e}")
+        for hit in hits:
+            recipients = (hit.get('notify') or []) + self.watchlist_notify
+            if not recipients or hit.get('origin') == 'catchup':
+                continue
+            read = hit['license_plate'] if hit['match'] == 'exact' else f"{hit['license_plate']} (close to {hit['watch_plate']})"
+            try:
+                enqueue_notification(
+                    self.db, recipients, f"Watchlist: {hit['watch_plate']} read at {hit['camera_name']}",
+                    f"Plate {read} on the {hit.get('list') or 'watch'} list was read by {hit['camera_name']} at "
+                    f"{hit['timestamp']:%Y-%m-%d %H:%M:%S} UTC." + (f"\nReason: {hit['reason']}" if hit.get('reason') else ''),
+                    kind='watchlist', key=f"watchlist:{hit['event_id']}", event_time=hit['timestamp'])
+            except Exception as e:
+                logger.error(f"Watchlist notification enqueue failed: {e}")
+
+    def _load_unknown_tracker(self):
+        """Restore the latest day/week heavy-hitter snapshots and their alerts."""
+        hitters = self.db[HEAVY_HITTERS_COLLECTION]
+        alerts = self.db[ALERTS_COLLECTION]
+        hitters.create_index([('granularity', 1), ('period_start', -1)])
+        alerts.create_index([('period_start', -1), ('granularity', 1)])
+        alerts.create_index('plate_key')
+        alerts.create_index([('raised_at', -1)])
+        snaps = []
+        for granularity in GRANULARITIES:
+            snaps += list(hitters.find({'granularity': granularity}).sort('period_start', -1).limit(self.unknown_tracker.keep))
+        since = min((s['period_start'] for s in snaps), default=None)
+        raised = alerts.find({'period_start': {'$gte': since}}, {'plate_key': 1}) if since else []
+        self.unknown_tracker.load(snaps, raised)
+
+    def _record_unknown_alerts(self, alerts):
+        for alert in alerts:
+            logger.warning(f"🚨 Unknown plate {mask_plate(alert['license_plate'])} read {alert['count']} times "
+                           f"this {alert['granularity']} (threshold {alert['threshold']})")
+            try:
+                self.db[ALERTS_COLLECTION].update_one(
+                    {'_id': alert['_id']}, {'$setOnInsert': {**alert, 'raised_at': datetime.utcnow()}}, upsert=True)
+            except Exception as e:
+                logger.warning(f"Unknown plate alert write failed: {e}")
+
+    def _save_unknown_snapshots(self, force=False):
+        """Persist changed heavy-hitter summaries every LPR_UNKNOWN_SNAPSHOT_SECONDS (and on shutdown)."""
+        tracker = self.unknown_tracker
+        if tracker is None or (not force and time.monotonic() - self.unknown_saved_at < self.unknown_snapshot_seconds):
+            return
+        self.unknown_saved_at = time.monotonic()
+        now = datetime.utcnow()
+        snaps = tracker.take_snapshots()
+        if not snaps:
+            return
+        try:
+            self.db[HEAVY_HITTERS_COLLECTION].bulk_write(
+                [ReplaceOne({'_id': s['_id']}, {**s, 'updated_at': now}, upsert=True) for s in snaps], ordered=False)
+        except Exception as e:
+            logger.warning(f"Heavy-hitter snapshot failed: {e}")
+            tracker.dirty.update(s['_id'] for s in snaps if s['_id'] in tracker.periods)
+
+    def _save_state(self, fields):
+        """Persist capture progress so restarts resume from the last processed point."""
+        try:
+            self.state_table.update_one({'_id': STATE_ID}, {'$set': fields}, upsert=True)
+        except Exception as e:
+            logger.debug(f"State save error: {e}")
     
     def _lookup_user_by_plate(self, plate):
         """Look up user by license plate number"""
@@ -217,14 +548,34 @@ class FastLPRCapture:
             logger.debug("User lookup error for plate %s: %s", plate, e)
             return 'unknown'
 
+
+    def _fuzzy_candidate(self, plate):
+        """Return the nearest registered plate for an unmatched read (see lpr_fuzzy.py), or None."""
+        try:
+            refresh = int(os.getenv('LPR_FUZZY_REFRESH_SECONDS', '300'))
+            if self.fuzzy_index is None or time.monotonic() - self.fuzzy_loaded_at > refresh:
+                self.plate_owners = load_plate_owners(self.db)
+                self.fuzzy_index = PlateFuzzyIndex(self.plate_owners)
+                self.fuzzy_loaded_at = time.monotonic()
+            min_score = float(os.getenv('LPR_FUZZY_MIN_SCORE', '0.5'))
+            return plate_candidate(self.fuzzy_index, self.plate_owners, plate, min_score)
+        except Exception as e:
+            logger.debug("Fuzzy lookup error for plate %s: %s", plate, e)
+            return None
     
     async def run(self):
         """Main loop"""
         if not await self.start():
             return
         
-        import time
         start = time.time()
+
+        if self.catchup_on_start:
+            # Read the previous run's checkpoint before live capture overwrites it
+            state = self.state_table.find_one({'_id': STATE_ID}) or {}
+            self.catchup_task = asyncio.create_task(self.catch_up(state, self.last_check))
+        if self.hit_queue is not None:
+            self.hit_task = asyncio.create_task(self.deliver_watchlist_hits())
         
         try:
             while True:
@@ -232,19 +583,58 @@ class FastLPRCapture:
                     break
                 
                 await self.capture_plates()
-                await asyncio.sleep(5)  # Poll every 5 seconds
+                if self.coalescer is not None:
+                    self._write_detections(self.coalescer.expire())
+                self._save_unknown_snapshots()
+                await asyncio.sleep(self.poll_seconds)
                 
         except KeyboardInterrupt:
             logger.info("\n⚠️  Stopped")
         finally:
+            if self.catchup_task and not self.catchup_task.done():
+                self.catchup_task.cancel()
+                await asyncio.gather(self.catchup_task, return_exceptions=True)
+            if self.coalescer is not None:
+                # Held reads would otherwise be lost on shutdown
+                self._write_detections(self.coalescer.drain())
+            self._save_unknown_snapshots(force=True)
+            if self.hit_task is not None:
+                self.hit_task.cancel()
+                await asyncio.gather(self.hit_task, return_exceptions=True)
+                pending = []
+                while not self.hit_queue.empty():
+                    pending.append(self.hit_queue.get_nowait())
+                if pending:
+                    self._write_watchlist_hits(pending)
+            if self.watchlist is not None:
+                self.watchlist.stop()
             total = self.lpr_table.count_documents({})
             logger.info(f"\n{'='*70}")
             logger.info(f"Final Stats: {self.stats['stored']} plates stored | Total in DB: {total}")
+            if self.coalescer is not None:
+                r = self.coalescer.report()
+                logger.info(f"Coalescing: {r['reads']} reads -> {r['written']} documents "
+                            f"({r['ratio']:.2f} reads/document, {r['writes_saved_pct']:.0f}% fewer writes, "
+                            f"{r['evicted']} released early at the {self.coalescer.max_pending}-key cap)")
+            if self.unknown_tracker is not None:
+                u = self.unknown_tracker.stats
+                logger.info(f"Unknown plates: {u['reads']} reads tracked, {u['alerts']} alerts raised")
+            if self.watchlist is not None:
+                w = self.watchlist.report()
+                lat = w['latency']
+                logger.info(f"Watchlist: {w['checks']} checks, {w['hits']} hits ({w['exact']} exact, {w['fuzzy']} fuzzy) | "
+                            f"match latency p50 {lat['p50_us']:.0f}µs, p99 {lat['p99_us']:.0f}µs, max {lat['max_us']:.0f}µs")
             logger.info(f"{'='*70}")
 
 async def main():
-    duration = int(sys.argv[1]) if len(sys.argv) > 1 else 0
-    service = FastLPRCapture(duration=duration)
+    duration = 0
+    catchup = os.getenv('RUN_LPR_CATCHUP_ON_STARTUP', '1') != '0'
+    for arg in sys.argv[1:]:
+        if arg == '--no-catchup':
+            catchup = False
+        else:
+            duration = int(arg)
+    service = FastLPRCapture(duration=duration, catchup_on_start=catchup)
     await service.run()
 
 if __name__ == '__main__':
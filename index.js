@@ -462,6 +462,98 @@ function fetchAndCacheData() {
 
 setInterval(fetchAndCacheData, 30 * 60 * 1000);
 
+// Sum counters of lpr_rollups documents (written by lpr_rollup_worker.py)
+function sumLprRollups(docs) {
+    return docs.reduce((acc, d) => {
+        acc.count += d.count || 0;
+        acc.confidence_sum += d.confidence_sum || 0;
+        acc.confidence_count += d.confidence_count || 0;
+        acc.unread += d.unread || 0;
+        acc.known += d.known || 0;
+        if (d.last_seen && (!acc.last_seen || d.last_seen > acc.last_seen)) acc.last_seen = d.last_seen;
+        return acc;
+    }, { count: 0, confidence_sum: 0, confidence_count: 0, unread: 0, known: 0, last_seen: null });
+}
+
+function rollupAvgConfidence(summary) {
+    return summary.confidence_count ? (summary.confidence_sum / summary.confidence_count).toFixed(1) : null;
+}
+
+// Merge HyperLogLog register blobs from lpr_sketches and estimate the distinct plate count.
+// Same estimator as LPR_Notifications/lpr_hll.py: ~1.6% standard error with 4096 registers.
+function estimateLprUniquePlates(sketches) {
+    let merged = null;
+    for (const sketch of sketches) {
+        // Stored as BSON Binary; its .buffer holds the register bytes
+        const regs = sketch.registers instanceof Uint8Array ? sketch.registers : sketch.registers?.buffer;
+        if (!regs) continue;
+        if (!merged) merged = Uint8Array.from(regs);
+        else for (let i = 0; i < merged.length; i++) if (regs[i] > merged[i]) merged[i] = regs[i];
+    }
+    if (!merged) return 0;
+    const m = merged.length;
+    let sum = 0;
+    let zeros = 0;
+    for (const r of merged) {
+        sum += Math.pow(2, -r);
+        if (r === 0) zeros++;
+    }
+    const estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum;
+    return Math.round(estimate <= 2.5 * m && zeros ? m * Math.log(m / zeros) : estimate);
+}
+
+// LPR statistics from the hourly/lifetime rollups instead of scanning license_plates.
+// Window and "today" use hour buckets (the window starts at the top of its first hour).
+// Returns null when lpr_rollup_worker.py has never run so callers can fall back.
+async function readLprRollups(since, startOfDay, { byPlate = false } = {}) {
+    const state = await db.collection('lpr_job_state').findOne({ _id: 'lpr_rollup_worker' }, { projection: { last_id: 1, updated_at: 1 } });
+    if (!state || !state.last_id) return null;
+
+    const rollups = db.collection('lpr_rollups');
+    const hourFloor = (d) => new Date(Math.floor(d.getTime() / 3600000) * 3600000);
+    const windowStart = hourFloor(since);
+    const dayStart = hourFloor(startOfDay);
+    const from = windowStart < dayStart ? windowStart : dayStart;
+
+    // Unique plates come from merged HyperLogLog sketches; "week" is the last 7 UTC days
+    const sketches = db.collection('lpr_sketches');
+    const now = new Date();
+    const weekStart = new Date(Date.UTC(now.getUTCFullYear(), now.getUTCMonth(), now.getUTCDate() - 6));
+
+    const [hourly, cameraTotals, plateTotals, hourlySketches, weekSketches, totalSketches] = await Promise.all([
+        rollups.find({ granularity: 'hour', dim: 'camera', bucket: { $gte: from } }).toArray(),
+        rollups.find({ granularity: 'total', dim: 'camera' }).toArray(),
+        byPlate ? rollups.find({ granularity: 'total', dim: 'plate' }, { projection: { key: 1, count: 1 } }).toArray() : [],
+        sketches.find({ granularity: 'hour', dim: 'all', bucket: { $gte: from } }, { projection: { bucket: 1, registers: 1 } }).toArray(),
+        sketches.find({ granularity: 'day', dim: 'all', bucket: { $gte: weekStart } }, { projection: { registers: 1 } }).toArray(),
+        sketches.find({ granularity: 'total' }, { projection: { dim: 1, key: 1, estimate: 1 } }).toArray()
+    ]);
+    const cameraUnique = Object.fromEntries(totalSketches.filter(d => d.dim === 'camera').map(d => [d.key, d.estimate]));
+
+    return {
+        as_of: state.updated_at,
+        window: { ...sumLprRollups(hourly.filter(d => d.bucket >= windowStart)), unique_plates: estimateLprUniquePlates(hourlySketches.filter(d => d.bucket >= windowStart)) },
+        today: { ...sumLprRollups(hourly.filter(d => d.bucket >= dayStart)), unique_plates: estimateLprUniquePlates(hourlySketches.filter(d => d.bucket >= dayStart)) },
+        week: { unique_plates: estimateLprUniquePlates(weekSketches) },
+        all: { ...sumLprRollups(cameraTotals), unique_plates: totalSketches.find(d => d.dim === 'all')?.estimate || 0 },
+        by_camera: cameraTotals.map(d => ({ _id: d.key, count: d.count, unique_plates: cameraUnique[d.key] || 0, last_detection: d.last_seen })),
+        by_plate: plateTotals.map(d => ({ _id: d.key, count: d.count }))
+    };
+}
+
+// Partial-plate filter over the n-gram index (mirrors plate_search_filter in
+// LPR_Notifications/lpr_helpers.py): every 3-gram of the query narrows candidates
+// through the multikey plate_ngrams index, then the substring is verified on plate_key.
+// Returns null when the query has no plate characters.
+function plateSearchFilter(query) {
+    const key = String(query || '').toUpperCase().replace(/[^A-Z0-9]/g, '');
+    if (!key) return null;
+    const grams = [...new Set(Array.from({ length: Math.max(key.length - 2, 0) }, (_, i) => key.slice(i, i + 3)))].sort();
+    // key is alphanumeric only, so it is safe to use as a regex literal
+    const filter = { plate_key: { $regex: key } };
+    return grams.length ? { plate_ngrams: { $all: grams }, ...filter } : filter;
+}
+
 function startServer() {
     // License Plate Recognition API Endpoints
     // ==========================================
@@ -517,7 +609,7 @@ function startServer() {
     });
 
     // GET statistics
-    app.get('/api/license-plates/stats', (req, res) => {
+    app.get('/api/license-plates/stats', async (req, res) => {
         const hours = parseInt(req.query.hours) || 24;
 
         try {
@@ -529,8 +621,34 @@ function startServer() {
             const since = new Date(Date.now() - hours * 3600 * 1000);
             const startOfDay = new Date(); startOfDay.setHours(0,0,0,0);
 
+            // Add start_of_day and next_reset so clients can show reset countdown
+            const nextReset = new Date(startOfDay.getTime() + 24 * 60 * 60 * 1000);
+            const secondsUntilReset = Math.max(0, Math.floor((nextReset.getTime() - Date.now()) / 1000));
+
+            // Prefer the rollups maintained by lpr_rollup_worker.py
+            const rollups = await readLprRollups(since, startOfDay, { byPlate: true });
+            if (rollups) {
+                return res.json({
+                    hours: hours,
+                    total_detections: rollups.window.count,
+                    unique_plates: rollups.window.unique_plates,
+                    unique_plates_today: rollups.today.unique_plates,
+                    unique_plates_week: rollups.week.unique_plates,
+                    avg_confidence_all: rollupAvgConfidence(rollups.window),
+                    avg_confidence_today: rollupAvgConfidence(rollups.today),
+                    by_camera: rollups.by_camera,
+                    by_plate: rollups.by_plate,
+                    start_of_day: startOfDay.toISOString(),
+                    next_reset: nextReset.toISOString(),
+                    seconds_until_reset: secondsUntilReset,
+                    source: 'rollups',
+                    rollups_as_of: rollups.as_of,
+                    timestamp: new Date().toISOString()
+                });
+            }
+
             // Use aggregation with ts = $toDate(timestamp) to handle string/number timestamp variants
-            plates.aggregate([
+            const results = await plates.aggregate([
                 { $addFields: { ts: { $toDate: '$timestamp' } } },
                 {
                     $facet: {
@@ -546,34 +664,26 @@ function startServer() {
                         by_plate: [ { $group: { _id: '$license_plate', count: { $sum: 1 } } } ]
                     }
                 }
-            ]).toArray((err, results) => {
-                if (err) {
-                    res.status(500).json({ error: 'Database error', details: err.message });
-                    return;
-                }
-
-                const data = results[0] || {};
-                const w = data.window?.[0] || {};
-                const t = data.today?.[0] || {};
+            ]).toArray();
 
-                // Add start_of_day and next_reset so clients can show reset countdown
-                const nextReset = new Date(startOfDay.getTime() + 24 * 60 * 60 * 1000);
-                const secondsUntilReset = Math.max(0, Math.floor((nextReset.getTime() - Date.now()) / 1000));
+            const data = results[0] || {};
+            const w = data.window?.[0] || {};
+            const t = data.today?.[0] || {};
 
-                res.json({
-                    hours: hours,
-                    total_detections: w.total_detections || 0,
-                    unique_plates: (w.unique_plates && w.unique_plates.length) || 0,
-                    unique_plates_today: (t.unique_plates && t.unique_plates.length) || 0,
-                    avg_confidence_all: w.avg_confidence ? parseFloat(w.avg_confidence).toFixed(1) : null,
-                    avg_confidence_today: t.avg_confidence ? parseFloat(t.avg_confidence).toFixed(1) : null,
-                    by_camera: data.by_camera || [],
-                    by_plate: data.by_plate || [],
-                    start_of_day: startOfDay.toISOString(),
-                    next_reset: nextReset.toISOString(),
-                    seconds_until_reset: secondsUntilReset,
-                    timestamp: new Date().toISOString()
-                });
+            res.json({
+                hours: hours,
+                total_detections: w.total_detections || 0,
+                unique_plates: (w.unique_plates && w.unique_plates.length) || 0,
+                unique_plates_today: (t.unique_plates && t.unique_plates.length) || 0,
+                avg_confidence_all: w.avg_confidence ? parseFloat(w.avg_confidence).toFixed(1) : null,
+                avg_confidence_today: t.avg_confidence ? parseFloat(t.avg_confidence).toFixed(1) : null,
+                by_camera: data.by_camera || [],
+                by_plate: data.by_plate || [],
+                start_of_day: startOfDay.toISOString(),
+                next_reset: nextReset.toISOString(),
+                seconds_until_reset: secondsUntilReset,
+                source: 'license_plates',
+                timestamp: new Date().toISOString()
             });
         } catch (err) {
             res.status(500).json({ error: 'Server error', details: err.message });
@@ -680,7 +790,8 @@ function startServer() {
 
             // Filter by license plate
             if (req.query.plate) {
-                detectionQuery.license_plate = { $regex: req.query.plate, $options: 'i' };
+                // Indexed n-gram search; run plate_ngram_index.py migrate for older detections
+                Object.assign(detectionQuery, plateSearchFilter(req.query.plate) || { _id: null });
             }
 
             // Filter by camera
@@ -714,19 +825,24 @@ function startServer() {
                 }
             }
 
+            // Vehicle attributes are stored lowercased at the top level (see vehicle_fields in
+            // LPR_Notifications/lpr_helpers.py; migrate_vehicle_fields.py for older records),
+            // each indexed with timestamp
+            const attributeValue = (value) => String(value).trim().replace(/\s+/g, ' ').toLowerCase();
+
             // Filter by vehicle color
             if (req.query.color) {
-                detectionQuery['vehicle_data.attributes.color.value'] = { $regex: req.query.color, $options: 'i' };
+                detectionQuery.color = attributeValue(req.query.color);
             }
 
             // Filter by vehicle type
             if (req.query.vehicle_type) {
-                detectionQuery['vehicle_data.attributes.vehicleType.value'] = { $regex: req.query.vehicle_type, $options: 'i' };
+                detectionQuery.vehicle_type = attributeValue(req.query.vehicle_type);
             }
 
-            // Filter by owner/group name
+            // Filter by owner/group name (prefix match, which still uses the index)
             if (req.query.owner) {
-                detectionQuery['vehicle_data.group.name'] = { $regex: req.query.owner, $options: 'i' };
+                detectionQuery.group = { $regex: '^' + attributeValue(req.query.owner).replace(/[.*+?^${}()|[\]\\]/g, '\\$&') };
             }
 
             // If searching by user name or email, search users_cache first
@@ -2624,7 +2740,10 @@ app.get('/admin/dashboard', requireLogin, requireAdmin, async (req, res) => {
             const startOfDay = new Date();
             startOfDay.setHours(0,0,0,0);
 
-            const lprStats = await licensePlatesCollection.aggregate([
+            // Prefer the rollups maintained by lpr_rollup_worker.py; scan license_plates only without them
+            const rollups = await readLprRollups(startOfDay, startOfDay);
+
+            const lprStats = rollups ? null : await licensePlatesCollection.aggregate([
                 // Coerce timestamp to a Date field 'ts' so sorting/matching is reliable
                 { $addFields: { ts: { $toDate: '$timestamp' } } },
                 {
@@ -2691,7 +2810,31 @@ app.get('/admin/dashboard', requireLogin, requireAdmin, async (req, res) => {
                 }
             ]).toArray();
 
-            if (lprStats && lprStats.length > 0) {
+            if (rollups) {
+                const oldest = await licensePlatesCollection.find({}, { projection: { timestamp: 1, license_plate: 1, user_name: 1 } })
+                    .sort({ timestamp: 1 }).limit(1).toArray();
+                const nextReset = new Date(startOfDay.getTime() + 24 * 60 * 60 * 1000);
+                const secondsUntilReset = Math.max(0, Math.floor((nextReset.getTime() - Date.now()) / 1000));
+
+                lprMetrics = {
+                    total_detections: rollups.all.count,
+                    detections_today: rollups.today.count,
+                    unique_plates: rollups.all.unique_plates,
+                    unique_plates_today: rollups.today.unique_plates,
+                    unique_plates_week: rollups.week.unique_plates,
+                    avg_confidence_all: rollupAvgConfidence(rollups.all) || 0,
+                    avg_confidence_today: rollupAvgConfidence(rollups.today),
+                    cameras: rollups.by_camera,
+                    known_users: rollups.all.known,
+                    unknown_users: rollups.all.count - rollups.all.known,
+                    oldest_detection: oldest[0] || null,
+                    start_of_day: startOfDay.toISOString(),
+                    next_reset: nextReset.toISOString(),
+                    seconds_until_reset: secondsUntilReset,
+                    source: 'rollups',
+                    rollups_as_of: rollups.as_of
+                };
+            } else if (lprStats && lprStats.length > 0) {
                 const data = lprStats[0];
                 const userStatus = data.user_status?.[0] || { known: 0, unknown: 0 };
                 const oldestDetection = data.oldest?.[0] || null;
@@ -2760,21 +2903,12 @@ app.get('/admin/dashboard', requireLogin, requireAdmin, async (req, res) => {
             const nextReset = new Date(startOfDay.getTime() + 24 * 60 * 60 * 1000);
             const secondsUntilReset = Math.max(0, Math.floor((nextReset.getTime() - Date.now()) / 1000));
 
-            // Count and sample using aggregation to safely coerce timestamps
-            const aggCount = await plates.aggregate([
-                { $addFields: { ts: { $toDate: '$timestamp' } } },
-                { $match: { ts: { $gte: startOfDay } } },
-                { $count: 'count' }
-            ]).toArray();
-
-            const count = aggCount[0]?.count || 0;
-            const samples = await plates.aggregate([
-                { $addFields: { ts: { $toDate: '$timestamp' } } },
-                { $match: { ts: { $gte: startOfDay } } },
-                { $sort: { ts: -1 } },
-                { $limit: 10 },
-                { $project: { license_plate: 1, ts: 1, confidence: 1, camera_name: 1 } }
-            ]).toArray();
+            // Timestamps are native dates (see migrate_lpr_timestamps.py), so these use the timestamp index
+            const count = await plates.countDocuments({ timestamp: { $gte: startOfDay } });
+            const samples = await plates.find(
+                { timestamp: { $gte: startOfDay } },
+                { projection: { license_plate: 1, ts: '$timestamp', confidence: 1, camera_name: 1 } }
+            ).sort({ timestamp: -1 }).limit(10).toArray();
 
             res.json({
                 start_of_day: startOfDay.toISOString(),
@@ -3786,33 +3920,19 @@ app.get('/api/visitor-last-seen/:visitorId', requireLogin, async (req, res) => {
                     return res.json({ lastSeen: null, plateDetails: [] });
                 }
                 
-                // Find the most recent capture for any of the visitor's plates
-                const lprTable = db.collection('license_plates');
+                // Last seen per plate from plate_activity in a single query
                 const plateList = plates.map(p => typeof p === 'string' ? p : p.credential);
-                
-                // Get the last seen date for each plate
-                const plateDates = [];
-                
-                for (const plate of plateList) {
-                    const lastCapture = await lprTable.findOne(
-                        { license_plate: plate },
-                        { sort: { timestamp: -1 } }
-                    );
-                    
-                    plateDates.push({
-                        plate: plate,
-                        lastSeen: lastCapture ? lastCapture.timestamp : null
-                    });
-                }
-                
-                // Get the overall most recent capture
-                const allRecentCaptures = await lprTable
-                    .find({ license_plate: { $in: plateList } })
-                    .sort({ timestamp: -1 })
-                    .limit(1)
+                const activity = await db.collection('plate_activity')
+                    .find({ _id: { $in: plateList.map(normalizePlate) } }, { projection: { last_seen: 1 } })
                     .toArray();
+                const lastSeenByPlate = Object.fromEntries(activity.map(d => [d._id, d.last_seen]));
                 
-                const lastSeen = allRecentCaptures.length > 0 ? allRecentCaptures[0].timestamp : null;
+                const plateDates = plateList.map(plate => ({
+                    plate: plate,
+                    lastSeen: lastSeenByPlate[normalizePlate(plate)] || null
+                }));
+                
+                const lastSeen = plateDates.reduce((latest, pd) => (pd.lastSeen && (!latest || pd.lastSeen > latest) ? pd.lastSeen : latest), null);
                 
                 res.json({ 
                     lastSeen: lastSeen,
@@ -3829,6 +3949,56 @@ app.get('/api/visitor-last-seen/:visitorId', requireLogin, async (req, res) => {
     }
 });
 
+// Summaries from plate_activity (maintained by the Python producers, one document per plate).
+// Counts use the stored UTC buckets: hourly for 24h, daily for 7 and 30 days.
+function plateActivitySummary(doc, now = new Date()) {
+    const sumSince = (buckets, since) => (buckets || []).reduce((n, b) => (b.t >= since ? n + b.n : n), 0);
+    const hourStart = new Date(Math.floor(now.getTime() / 3600000) * 3600000);
+    const dayStart = new Date(Date.UTC(now.getUTCFullYear(), now.getUTCMonth(), now.getUTCDate()));
+    return {
+        lastSeen: doc ? doc.last_seen : null,
+        lastCamera: doc ? doc.last_camera || null : null,
+        count24h: doc ? sumSince(doc.hourly, new Date(hourStart.getTime() - 23 * 3600000)) : 0,
+        count7d: doc ? sumSince(doc.daily, new Date(dayStart.getTime() - 6 * 86400000)) : 0,
+        count30d: doc ? sumSince(doc.daily, new Date(dayStart.getTime() - 29 * 86400000)) : 0,
+        owner: doc && doc.user_email ? { email: doc.user_email, name: doc.user_name } : null
+    };
+}
+
+function normalizePlate(plate) {
+    return String(plate || '').trim().toUpperCase().replace(/[^A-Z0-9-]/g, '');
+}
+
+// Batch lookup for the dashboard: activity for many plates in one indexed query
+const PLATE_ACTIVITY_MAX_PLATES = 500;
+app.post('/api/plate-activity', requireLogin, async (req, res) => {
+    try {
+        if (!db) {
+            return res.status(500).json({ error: 'Database connection not available' });
+        }
+        const requested = Array.isArray(req.body?.plates) ? req.body.plates : [];
+        const plates = [...new Set(requested.map(normalizePlate).filter(p => p.length >= 2))];
+        if (plates.length > PLATE_ACTIVITY_MAX_PLATES) {
+            return res.status(400).json({ error: `At most ${PLATE_ACTIVITY_MAX_PLATES} plates per request (got ${plates.length})` });
+        }
+        if (plates.length === 0) {
+            return res.json({ plates: {} });
+        }
+
+        const docs = await db.collection('plate_activity').find({ _id: { $in: plates } }).toArray();
+        const byPlate = Object.fromEntries(docs.map(d => [d._id, d]));
+        const now = new Date();
+        const result = {};
+        for (const plate of plates) {
+            result[plate] = plateActivitySummary(byPlate[plate], now);
+        }
+        res.json({ plates: result });
+    } catch (error) {
+        console.error('Error fetching plate activity:', error);
+        res.status(500).json({ error: 'Failed to fetch plate activity' });
+    }
+});
+
 // Get last seen date for a specific license plate
 app.get('/api/license-plate-last-seen/:plate', (req, res) => {
     try {
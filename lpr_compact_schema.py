@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Migrate detections to the compact schema and report the space it saves.
+
+`migrate` streams `license_plates` in _id order and upserts the compact form of
+every detection (see LPR_Notifications/lpr_compact.py) into
+`license_plates_compact` (LPR_COMPACT_COLLECTION): short field names, camera
+names moved to the `lpr_cameras` lookup collection, 24-hex event ids stored as
+12-byte ObjectIds, owner e-mail/name copies replaced by a reference to the
+users_cache/visitors document, and `detected_at`, `plate_key`, `camera_name`
+and the raw `vehicle_data` dropped (the normalized color/type/group are kept).
+Writes are `ReplaceOne` upserts keyed on the original _id, so reruns are
+idempotent. A legacy row repeating an event already converted (same event id
+under event_id and protect_event_id) is rejected by the unique index on `e`
+and counted as a duplicate. Progress is checkpointed in `lpr_job_state`, so an interrupted run
+resumes and a later run converts only detections stored since.
+
+`report` compares both collections: document count, average document size,
+storage size and per-index sizes from collStats, plus the average BSON size of
+a sample of documents before and after conversion.
+
+Usage:
+  python lpr_compact_schema.py migrate              # resumable
+  python lpr_compact_schema.py migrate --restart    # ignore the checkpoint
+  python lpr_compact_schema.py report
+  python lpr_compact_schema.py report --sample 5000
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime
+from bson import BSON
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import load_job_state, save_job_state
+from LPR_Notifications.lpr_compact import CameraRegistry, load_owner_refs, to_compact
+
+JOB_ID = 'lpr_compact_schema'
+COMPACT_COLLECTION = os.getenv('LPR_COMPACT_COLLECTION', 'license_plates_compact')
+DUPLICATE_KEY = 11000
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Compact detection schema migration and size report')
+    sub = p.add_subparsers(dest='command', required=True)
+    m = sub.add_parser('migrate', help='Copy license_plates into the compact collection')
+    m.add_argument('--batch-size', type=int, default=2000)
+    m.add_argument('--restart', action='store_true', help='Start from the beginning instead of the checkpoint')
+    r = sub.add_parser('report', help='Compare sizes of license_plates and the compact collection')
+    r.add_argument('--sample', type=int, default=2000, help='Documents sampled for the BSON size comparison')
+    return p.parse_args()
+
+
+def create_indexes(coll):
+    coll.create_index([('p', 1), ('t', -1)])
+    coll.create_index([('c', 1), ('t', -1)])
+    coll.create_index([('t', -1)])
+    coll.create_index('e', unique=True, sparse=True)
+    coll.create_index('ng')
+
+
+def migrate(db, batch_size=2000, restart=False):
+    source = db['license_plates']
+    target = db[COMPACT_COLLECTION]
+    create_indexes(target)
+    cameras = CameraRegistry(db)
+    owner_refs = load_owner_refs(db)
+    last_id = None if restart else load_job_state(db, JOB_ID).get('last_id')
+
+    scanned = duplicates = 0
+    started = time.time()
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(source.find(query).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        ops = [ReplaceOne({'_id': doc['_id']}, to_compact(doc, cameras, owner_refs), upsert=True) for doc in docs]
+        try:
+            target.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Legacy rows can carry the same event under both event_id and protect_event_id;
+            # the unique index on `e` keeps the first copy, the rest are skipped
+            errors = e.details.get('writeErrors', [])
+            if any(err.get('code') != DUPLICATE_KEY for err in errors):
+                raise
+            duplicates += len(errors)
+        scanned += len(docs)
+        last_id = docs[-1]['_id']
+        save_job_state(db, JOB_ID, {'last_id': last_id, 'updated_at': datetime.utcnow()})
+        print(f"Progress: {scanned} converted ({scanned / max(time.time() - started, 1e-6):.0f} docs/sec)")
+
+    print(f"\n✓ Migration complete: {scanned - duplicates} converted into {COMPACT_COLLECTION}, "
+          f"{len(cameras.by_ref)} cameras in lpr_cameras")
+    if duplicates:
+        print(f"⚠️  {duplicates} detections skipped as duplicate events (same event id as an earlier row)")
+
+
+def coll_stats(db, name):
+    try:
+        return db.command('collStats', name)
+    except Exception:
+        return {}
+
+
+def sample_size(coll, ids):
+    sizes = [len(BSON.encode(doc)) for doc in coll.find({'_id': {'$in': ids}})]
+    return sum(sizes) / len(sizes) if sizes else 0
+
+
+def report(db, sample=2000):
+    source = db['license_plates']
+    target = db[COMPACT_COLLECTION]
+
+    print(f"{'':<22}{'license_plates':>18}{COMPACT_COLLECTION:>26}")
+    before, after = coll_stats(db, 'license_plates'), coll_stats(db, COMPACT_COLLECTION)
+    for label, key in (('documents', 'count'), ('avg doc bytes', 'avgObjSize'),
+                       ('storage bytes', 'storageSize'), ('index bytes', 'totalIndexSize')):
+        print(f"{label:<22}{before.get(key, 0):>18,.0f}{after.get(key, 0):>26,.0f}")
+    if before.get('storageSize') and after.get('storageSize'):
+        total_before = before['storageSize'] + before.get('totalIndexSize', 0)
+        total_after = after['storageSize'] + after.get('totalIndexSize', 0)
+        print(f"\nStorage + indexes: {total_before / 1e6:.1f} MB -> {total_after / 1e6:.1f} MB "
+              f"({(1 - total_after / total_before) * 100:.0f}% smaller)")
+
+    for label, stats in (('license_plates', before), (COMPACT_COLLECTION, after)):
+        sizes = stats.get('indexSizes') or {}
+        if sizes:
+            print(f"\nIndexes on {label}:")
+            for name, size in sorted(sizes.items(), key=lambda kv: -kv[1]):
+                print(f"  {name:<40}{size:>14,}")
+
+    # Same detections on both sides, so the comparison is not skewed by what has been migrated
+    ids = [doc['_id'] for doc in target.aggregate([{'$sample': {'size': sample}}, {'$project': {'_id': 1}}])]
+    if ids:
+        old, new = sample_size(source, ids), sample_size(target, ids)
+        print(f"\nSampled {len(ids)} detections: {old:.0f} -> {new:.0f} BSON bytes/document"
+              + (f" ({(1 - new / old) * 100:.0f}% smaller)" if old else ''))
+    else:
+        print(f"\n⚠️  {COMPACT_COLLECTION} is empty; run `migrate` first")
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+
+    try:
+        if args.command == 'migrate':
+            migrate(client[mongo_db], args.batch_size, args.restart)
+        else:
+            report(client[mongo_db], args.sample)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Index advisor for the `license_plates` query shapes.
+
+Keeps a catalogue of the queries `index.js` endpoints and the Python jobs run
+against `license_plates`, runs each one through `explain` with
+`executionStats`, and reports documents and keys examined against documents
+returned, execution time and the winning plan (collection scans and in-memory
+sorts are flagged). For every flagged shape it recommends a compound index
+built with the equality-sort-range rule, e.g. `(license_plate, timestamp)` or
+`(camera_name, timestamp)`, skips recommendations an existing index already
+serves, and lists single-field indexes a recommendation would make redundant.
+`--create` builds the recommended indexes and explains the shapes again.
+
+By default the shapes run against a scratch collection filled with synthetic
+detections (LPR_Notifications/lpr_synthetic.py) and the indexes producers
+create today; `--production` explains against `license_plates` itself (explain
+executes the query, so prefer a quiet period on large collections).
+
+Usage:
+  python lpr_index_advisor.py                           # 1M synthetic detections
+  python lpr_index_advisor.py --count 200000 --create   # recommend, create, re-explain
+  python lpr_index_advisor.py --production              # explain against license_plates
+  python lpr_index_advisor.py --production --create     # create the recommendations there
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import plate_search_fields, plate_search_filter, vehicle_fields
+from LPR_Notifications.lpr_synthetic import generate_detections
+
+SCRATCH = 'bench_index_advisor'
+# What fast_lpr_capture.py and the migrations create today
+PRODUCER_INDEXES = [
+    ([('event_id', 1)], {'unique': True}),
+    ([('timestamp', 1)], {}),
+    ([('camera_id', 1)], {}),
+    ([('license_plate', 1)], {}),
+    ([('plate_key', 1)], {}),
+    ([('plate_ngrams', 1)], {}),
+    ([('color', 1), ('timestamp', -1)], {}),
+    ([('vehicle_type', 1), ('timestamp', -1)], {}),
+    ([('group', 1), ('timestamp', -1)], {}),
+    ([('misread_link.plate', 1)], {'sparse': True}),
+]
+RANGE_OPS = {'$gt', '$gte', '$lt', '$lte'}
+# Shapes examining more documents than this per returned document are flagged
+EXAMINED_RATIO = 10
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Explain license_plates query shapes and recommend indexes')
+    p.add_argument('--production', action='store_true', help='Explain against license_plates instead of synthetic data')
+    p.add_argument('--count', type=int, default=1000000, help='Synthetic detections to load')
+    p.add_argument('--plates', type=int, default=50000, help='Distinct plates in the synthetic pool')
+    p.add_argument('--batch-size', type=int, default=10000)
+    p.add_argument('--create', action='store_true', help='Create the recommended indexes and explain again')
+    p.add_argument('--keep', action='store_true', help='Keep the scratch collection')
+    return p.parse_args()
+
+
+# Each shape: name, where it comes from, and a builder returning the explained command.
+# `p` carries sample values taken from the data: plate, partial, camera_name, camera_id, now.
+SHAPES = [
+    ('recent by camera', 'index.js GET /api/license-plates?camera=',
+     lambda p: {'find': {'timestamp': {'$gte': p['now'] - timedelta(hours=24)}, 'camera_name': p['camera_name']},
+                'sort': {'timestamp': -1}, 'limit': 100}),
+    ('recent by plate', 'index.js GET /api/license-plates?plate=',
+     lambda p: {'find': {'timestamp': {'$gte': p['now'] - timedelta(hours=24)}, 'license_plate': p['plate']},
+                'sort': {'timestamp': -1}, 'limit': 100}),
+    ('plate history', 'index.js GET /api/license-plates/search/:plate',
+     lambda p: {'find': {'license_plate': p['plate']}, 'sort': {'timestamp': -1}}),
+    ('last seen', 'index.js GET /api/license-plate-last-seen/:plate',
+     lambda p: {'find': {'license_plate': p['plate']}, 'sort': {'timestamp': -1}, 'limit': 1}),
+    ('plate count 7d', 'index.js GET /api/license-plate-7day-count/:plate',
+     lambda p: {'count': {'license_plate': p['plate'], 'timestamp': {'$gte': p['now'] - timedelta(days=7)}}}),
+    ('partial plate', 'index.js GET /api/lpr/search?plate=',
+     lambda p: {'find': plate_search_filter(p['partial']), 'sort': {'timestamp': -1}}),
+    ('camera + dates', 'index.js GET /api/lpr/search?camera=&start_date=',
+     lambda p: {'find': {'camera_name': p['camera_name'],
+                         'timestamp': {'$gte': p['now'] - timedelta(days=7), '$lte': p['now']}},
+                'sort': {'timestamp': -1}}),
+    ('color', 'index.js GET /api/lpr/search?color=',
+     lambda p: {'find': {'color': p['color']}, 'sort': {'timestamp': -1}}),
+    ('unknown status', 'index.js GET /api/lpr/search?status=unknown',
+     lambda p: {'find': {'user_email': 'unknown'}, 'sort': {'timestamp': -1}, 'limit': 100}),
+    ('newest detection', 'index.js GET /api/lpr-service-health',
+     lambda p: {'find': {}, 'sort': {'timestamp': -1}, 'limit': 1}),
+    ('today count', 'index.js GET /admin/lpr/reset-info',
+     lambda p: {'count': {'timestamp': {'$gte': p['now'].replace(hour=0, minute=0, second=0, microsecond=0)}}}),
+    ('event dedupe', 'fast_lpr_capture.py _store_event',
+     lambda p: {'find': {'event_id': p['event_id']}, 'limit': 1}),
+    ('plate + range', 'query_lpr_archive.py --plate --start',
+     lambda p: {'find': {'license_plate': p['plate'],
+                         'timestamp': {'$gte': p['now'] - timedelta(days=30), '$lt': p['now']}}}),
+    ('camera + range', 'query_lpr_archive.py --camera --start',
+     lambda p: {'find': {'$or': [{'camera_id': p['camera_id']}, {'camera_name': p['camera_id']}],
+                         'timestamp': {'$gte': p['now'] - timedelta(days=1), '$lt': p['now']}}}),
+    ('oldest before cutoff', 'archive_lpr_detections.py',
+     lambda p: {'find': {'timestamp': {'$lt': p['now'] - timedelta(days=20), '$type': 'date'}},
+                'sort': {'timestamp': 1}, 'limit': 1}),
+    ('stale owner links', 'lpr_owner_relinker.py relink',
+     lambda p: {'find': {'$or': [{'license_plate': p['plate']}, {'misread_link.plate': p['plate']}],
+                         'user_email': {'$ne': 'unknown'}}, 'limit': 500}),
+    ('unknown plates', 'reconcile_misreads.py',
+     lambda p: {'aggregate': [{'$match': {'user_email': 'unknown', 'license_plate': {'$type': 'string'}}},
+                              {'$group': {'_id': '$license_plate', 'count': {'$sum': 1}}}]}),
+    ('missing thumbnails', 'enrich_thumbnails_24h.py',
+     lambda p: {'find': {'$and': [{'timestamp': {'$gte': p['now'] - timedelta(hours=24)}},
+                                  {'$or': [{'thumbnails': {'$exists': False}}, {'thumbnails': {'$size': 0}}]}]}}),
+]
+
+
+def sample_params(coll):
+    """Pick plate/camera values from the newest detection so every shape matches real data."""
+    newest = coll.find_one({'license_plate': {'$type': 'string'}}, sort=[('_id', -1)]) or {}
+    plate = newest.get('license_plate') or 'ABC1234'
+    key = plate_search_fields(plate)['plate_key'] or plate
+    return {
+        'plate': plate,
+        'partial': key[1:4] if len(key) >= 4 else key,
+        'camera_name': newest.get('camera_name') or '',
+        'camera_id': newest.get('camera_id') or '',
+        'event_id': newest.get('event_id') or '',
+        'color': newest.get('color') or 'black',
+        'now': datetime.utcnow(),
+    }
+
+
+def explain(db, name, spec):
+    """Run one shape through explain('executionStats') and return the command result."""
+    if 'find' in spec:
+        cmd = {'find': name, 'filter': spec['find']}
+        if spec.get('sort'):
+            cmd['sort'] = spec['sort']
+        if spec.get('limit'):
+            cmd['limit'] = spec['limit']
+    elif 'count' in spec:
+        cmd = {'count': name, 'query': spec['count']}
+    else:
+        cmd = {'aggregate': name, 'pipeline': spec['aggregate'], 'cursor': {}}
+    return db.command('explain', cmd, verbosity='executionStats')
+
+
+def plan_stages(plan):
+    """Flatten a winning plan into [(stage, index name)] from the root down."""
+    stages = []
+    while plan:
+        plan = plan.get('queryPlan', plan)
+        stages.append((plan.get('stage'), plan.get('indexName')))
+        children = plan.get('inputStages') or ([plan['inputStage']] if plan.get('inputStage') else [])
+        for child in children[1:]:
+            stages.extend(plan_stages(child))
+        plan = children[0] if children else None
+    return stages
+
+
+def summarize(result):
+    """Return (returned, keys examined, docs examined, ms, stages) from an explain result."""
+    if 'stages' in result and 'queryPlanner' not in result:
+        result = result['stages'][0].get('$cursor', {})
+    stats = result.get('executionStats', {})
+    planner = result.get('queryPlanner', {})
+    return (stats.get('nReturned', 0), stats.get('totalKeysExamined', 0), stats.get('totalDocsExamined', 0),
+            stats.get('executionTimeMillis', 0), plan_stages(planner.get('winningPlan', {})))
+
+
+def shape_filter_sort(spec):
+    """Return (filter, sort) of a shape, with top-level $and clauses merged into the filter."""
+    if 'find' in spec:
+        flt, sort = spec['find'], spec.get('sort') or {}
+    elif 'count' in spec:
+        flt, sort = spec['count'], {}
+    else:
+        flt = next((s['$match'] for s in spec['aggregate'] if '$match' in s), {})
+        sort = next((s['$sort'] for s in spec['aggregate'] if '$sort' in s), {})
+    merged = {k: v for k, v in flt.items() if k != '$and'}
+    for clause in flt.get('$and', []):
+        merged.update({k: v for k, v in clause.items() if k not in merged})
+    return merged, sort
+
+
+def recommend(spec):
+    """Equality-sort-range compound index for a shape, or None when nothing is indexable."""
+    flt, sort = shape_filter_sort(spec)
+    equality, ranges = [], []
+    for field, cond in flt.items():
+        if field.startswith('$') or field == '_id':
+            continue
+        if isinstance(cond, dict) and any(op.startswith('$') for op in cond):
+            ops = set(cond)
+            if ops <= {'$eq', '$in', '$all'}:
+                equality.append(field)
+            elif ops & RANGE_OPS or ('$regex' in ops and str(cond['$regex']).startswith('^')):
+                ranges.append(field)
+        else:
+            equality.append(field)
+    keys = [(f, 1) for f in equality]
+    keys += [(f, d) for f, d in sort.items() if f not in equality]
+    keys += [(f, 1) for f in ranges if f not in sort and f not in equality]
+    return keys or None
+
+
+def served_by(keys, indexes):
+    """Return the name of an existing index whose leading fields are `keys`, or None."""
+    fields = [f for f, _ in keys]
+    for name, spec in indexes.items():
+        existing = [f for f, _ in spec['key']]
+        if existing[:len(fields)] == fields:
+            return name
+    return None
+
+
+def flagged(row):
+    returned, _, docs, _, stages = row
+    kinds = {s for s, _ in stages}
+    return 'COLLSCAN' in kinds or 'SORT' in kinds or docs > max(returned, 1) * EXAMINED_RATIO
+
+
+def format_plan(stages):
+    return ' > '.join(f"{s}({i})" if i else s for s, i in stages if s)
+
+
+def report(db, name, params):
+    rows = {}
+    print(f"\n{'shape':<22}{'returned':>10}{'keys':>10}{'docs':>10}{'ms':>7}  plan")
+    for shape, source, build in SHAPES:
+        spec = build(params)
+        try:
+            row = summarize(explain(db, name, spec))
+        except OperationFailure as e:
+            print(f"{shape:<22}explain failed: {e.details.get('errmsg', e)}")
+            continue
+        rows[shape] = (row, spec, source)
+        mark = '⚠️ ' if flagged(row) else ''
+        print(f"{shape:<22}{row[0]:>10}{row[1]:>10}{row[2]:>10}{row[3]:>7}  {mark}{format_plan(row[4])}")
+    return rows
+
+
+def recommendations(rows, indexes):
+    """Return {index keys tuple: [shape names]} for flagged shapes no existing index serves.
+
+    Shapes needing the same fields share one recommendation (the first one's
+    directions; a compound index can be walked in either direction).
+    """
+    wanted, by_fields = {}, {}
+    for shape, (row, spec, _) in rows.items():
+        if not flagged(row):
+            continue
+        keys = recommend(spec)
+        if not keys or served_by(keys, indexes):
+            continue
+        fields = tuple(f for f, _ in keys)
+        keys = by_fields.setdefault(fields, tuple(keys))
+        wanted.setdefault(keys, []).append(shape)
+    # An index also serves queries on any prefix of its fields
+    for keys in sorted(wanted, key=len):
+        fields = [f for f, _ in keys]
+        longer = next((k for k in wanted if len(k) > len(keys) and [f for f, _ in k[:len(keys)]] == fields), None)
+        if longer:
+            wanted[longer].extend(wanted.pop(keys))
+    return wanted
+
+
+def load_synthetic(db, args):
+    coll = db[SCRATCH]
+    coll.drop()
+    for keys, opts in PRODUCER_INDEXES:
+        coll.create_index(keys, **opts)
+    print(f"Loading {args.count:,} synthetic detections into {SCRATCH}...")
+    started = time.time()
+    batch = []
+    for doc in generate_detections(args.count, plates=args.plates):
+        doc.update(plate_search_fields(doc['license_plate']))
+        doc.update(vehicle_fields(doc))
+        batch.append(doc)
+        if len(batch) >= args.batch_size:
+            coll.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        coll.insert_many(batch, ordered=False)
+    print(f"Loaded in {time.time() - started:.1f}s")
+    return SCRATCH
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        name = 'license_plates' if args.production else load_synthetic(db, args)
+        coll = db[name]
+        params = sample_params(coll)
+        rows = report(db, name, params)
+
+        indexes = coll.index_information()
+        wanted = recommendations(rows, indexes)
+        if not wanted:
+            print("\n✓ Every flagged shape is already served by an index (or cannot use one)")
+            return
+
+        print("\n📋 Recommended indexes:")
+        for keys, shapes in wanted.items():
+            print(f"  {dict(keys)}  <- {', '.join(shapes)}")
+            redundant = [n for n, spec in indexes.items()
+                         if n != '_id_' and len(spec['key']) == 1 and not spec.get('unique')
+                         and spec['key'][0][0] == keys[0][0] and len(keys) > 1]
+            for n in redundant:
+                print(f"     makes {n} redundant once nothing else relies on it")
+
+        if args.create:
+            for keys in wanted:
+                created = coll.create_index(list(keys))
+                print(f"✓ Created {created}")
+            print("\nAfter:")
+            report(db, name, params)
+    finally:
+        if not args.production and not args.keep:
+            db.drop_collection(SCRATCH)
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+LPR Owner Relinker
+Watches `users_cache` and `visitors` via MongoDB change streams and relinks
+existing detections when a plate gains or loses an owner, so detections do not
+keep stale user_email/user_name until consolidate_lpr_data.py is rerun.
+
+Only the plates whose resolved owner actually changed are touched, in bounded
+`_id` batches. The change stream resume token and the resolved plate -> owner
+snapshot are persisted in `lpr_job_state`; on restart the stream resumes from
+the token and the snapshot is diffed against the current registrations, so
+changes made while the worker was down are relinked without a rescan. The first
+start (no snapshot) relinks every registered plate once.
+
+Change streams require MongoDB to run as a replica set (a single-node replica
+set is enough).
+
+Usage:
+  python lpr_owner_relinker.py                  # Run continuously
+  python lpr_owner_relinker.py --batch-size 200 # Smaller update batches
+"""
+
+import os
+import time
+import logging
+import argparse
+from datetime import datetime
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import owner_info, registered_plates, plate_detections_filter, load_job_state, save_job_state
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'lpr_owner_relinker'
+SOURCES = ('users_cache', 'visitors')
+# Fields that can change which plates a document registers or who owns them
+OWNER_FIELDS = ('license_plates', 'user_email', 'email', 'name', 'user_name', 'first_name')
+# Error code MongoDB returns when a resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Relink detections when plate registrations change')
+    p.add_argument('--batch-size', type=int, default=500, help='Detections updated per batch')
+    return p.parse_args()
+
+
+class OwnerRelinker:
+    """Keeps an in-memory plate -> claimants index and relinks on change events"""
+
+    def __init__(self, db, batch_size=500):
+        self.db = db
+        self.plates = db['license_plates']
+        self.batch_size = batch_size
+        self.doc_plates = {}  # (source, _id) -> {plate: owner fields}
+        self.claims = {}      # plate -> {(source, _id): owner fields}
+        self.stats = {'events': 0, 'plates_relinked': 0, 'detections_updated': 0}
+        self._last_save = 0.0
+
+    def load(self):
+        """Build the claim index from the current users_cache/visitors contents."""
+        self.doc_plates.clear()
+        self.claims.clear()
+        for source in SOURCES:
+            for doc in self.db[source].find({'license_plates.0': {'$exists': True}}, dict.fromkeys(OWNER_FIELDS, 1)):
+                self._set_claims((source, doc['_id']), doc)
+        logger.info(f"✓ Indexed {len(self.claims)} registered plates")
+
+    def _set_claims(self, key, doc):
+        """Replace the plates claimed by one document; returns the plates it touched."""
+        old = self.doc_plates.pop(key, {})
+        for plate in old:
+            claimants = self.claims.get(plate, {})
+            claimants.pop(key, None)
+            if not claimants:
+                self.claims.pop(plate, None)
+
+        new = {}
+        if doc is not None:
+            info = owner_info(doc, key[0])
+            fields = {'user_email': info['user_email'], 'user_name': info['user_name'], 'user_source': key[0]}
+            new = {plate: fields for plate in registered_plates(doc)}
+            for plate, fields in new.items():
+                self.claims.setdefault(plate, {})[key] = fields
+            if new:
+                self.doc_plates[key] = new
+        return set(old) | set(new)
+
+    def resolve(self, plate):
+        """Owner fields for a plate: users_cache claims win over visitors, then lowest _id."""
+        claimants = self.claims.get(plate)
+        if not claimants:
+            return None
+        key = min(claimants, key=lambda k: (SOURCES.index(k[0]), str(k[1])))
+        return claimants[key]
+
+    def snapshot(self):
+        """Resolved owners as rows (plate strings are not safe as document keys)."""
+        rows = []
+        for plate in sorted(self.claims):
+            owner = self.resolve(plate)
+            rows.append([plate, owner['user_name'], owner['user_email'], owner['user_source']])
+        return rows
+
+    def reconcile(self, state):
+        """Relink plates whose owner differs from the snapshot saved by the previous run."""
+        previous = {row[0]: {'user_email': row[2], 'user_name': row[1], 'user_source': row[3]}
+                    for row in state.get('plates', [])}
+        changed = 0
+        for plate in sorted(set(previous) | set(self.claims)):
+            owner = self.resolve(plate)
+            if owner != previous.get(plate):
+                self.relink(plate, owner)
+                changed += 1
+        logger.info(f"✓ Reconciled {changed} plates changed since the last run")
+        return changed
+
+    def handle(self, change):
+        """Apply one change event and relink the plates whose owner changed. Returns the plate count."""
+        self.stats['events'] += 1
+        op = change['operationType']
+        if op == 'update':
+            desc = change.get('updateDescription') or {}
+            touched = list(desc.get('updatedFields', {})) + list(desc.get('removedFields', []))
+            if not any(f.split('.')[0] in OWNER_FIELDS for f in touched):
+                # e.g. the 30-minute users_cache sync bumping lastSync only
+                return 0
+
+        key = (change['ns']['coll'], change['documentKey']['_id'])
+        doc = change.get('fullDocument') if op != 'delete' else None
+        affected = sorted(self._set_claims_diff(key, doc).items())
+        for plate, owner in affected:
+            self.relink(plate, owner)
+        return len(affected)
+
+    def _set_claims_diff(self, key, doc):
+        candidates = set(self.doc_plates.get(key, {}))
+        if doc is not None:
+            candidates |= set(registered_plates(doc))
+        before = {plate: self.resolve(plate) for plate in candidates}
+        self._set_claims(key, doc)
+        return {plate: self.resolve(plate) for plate in candidates if self.resolve(plate) != before[plate]}
+
+    def relink(self, plate, owner):
+        """Point every detection of `plate` (and misreads linked to it) at `owner` (None = unregistered), in bounded batches."""
+        if owner:
+            stale = {'$and': [plate_detections_filter(plate),
+                              {'$or': [{'user_email': {'$ne': owner['user_email']}},
+                                       {'user_name': {'$ne': owner['user_name']}}]}]}
+            update = {'$set': owner}
+        else:
+            stale = {**plate_detections_filter(plate), 'user_email': {'$ne': 'unknown'}}
+            update = {'$set': {'user_email': 'unknown', 'user_name': 'Unknown'}, '$unset': {'user_source': ''}}
+
+        updated = 0
+        while True:
+            ids = [d['_id'] for d in self.plates.find(stale, {'_id': 1}).limit(self.batch_size)]
+            if not ids:
+                break
+            updated += self.plates.update_many({'_id': {'$in': ids}}, update).modified_count
+            if len(ids) < self.batch_size:
+                break
+
+        self.stats['plates_relinked'] += 1
+        self.stats['detections_updated'] += updated
+        target = f"{owner['user_name']} ({owner['user_email']})" if owner else 'unknown'
+        logger.info(f"↻ {plate} -> {target}: {updated} detections updated")
+
+    def save_state(self, token, force=False):
+        """Persist the resume token (and owner snapshot); throttled unless forced."""
+        now = time.time()
+        if force or now - self._last_save >= 5:
+            fields = {'plates': self.snapshot(), 'saved_at': datetime.utcnow()}
+            if token is not None:
+                fields['resume_token'] = token
+            save_job_state(self.db, JOB_ID, fields)
+            self._last_save = now
+
+    def run(self):
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': list(SOURCES)},
+            'operationType': {'$in': ['insert', 'update', 'replace', 'delete']},
+        }}]
+
+        while True:
+            state = load_job_state(self.db, JOB_ID)
+            try:
+                # Open the stream before indexing so no change between the two is missed
+                with self.db.watch(pipeline, full_document='updateLookup',
+                                   resume_after=state.get('resume_token')) as stream:
+                    self.load()
+                    self.reconcile(state)
+                    self.save_state(stream.resume_token, force=True)
+                    logger.info("👀 Watching users_cache and visitors for plate changes")
+                    for change in stream:
+                        relinked = self.handle(change)
+                        self.save_state(stream.resume_token, force=relinked > 0)
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # The snapshot reconcile on the next pass covers the gap
+                    logger.error("Resume token no longer in the oplog; restarting the stream from now")
+                    self.db['lpr_job_state'].update_one({'_id': JOB_ID}, {'$unset': {'resume_token': ''}})
+                    continue
+                logger.error(f"Change stream failed: {e}")
+                time.sleep(5)
+            except PyMongoError as e:
+                logger.error(f"Change stream interrupted: {e}; reconnecting in 5s")
+                time.sleep(5)
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        mongo = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        mongo = MongoClient(f"{mongo_host}:{mongo_port}")
+
+    relinker = OwnerRelinker(mongo[mongo_db], batch_size=args.batch_size)
+    try:
+        relinker.run()
+    except KeyboardInterrupt:
+        logger.info("\n⚠️  Stopped")
+    finally:
+        logger.info(f"Events: {relinker.stats['events']} | Plates relinked: {relinker.stats['plates_relinked']} | "
+                    f"Detections updated: {relinker.stats['detections_updated']}")
+        mongo.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+LPR Rollup Worker
+Maintains pre-aggregated detection statistics in `lpr_rollups` so the portal
+stats endpoints read a few hundred small documents instead of aggregating the
+whole `license_plates` collection on every request.
+
+Rollups exist per camera (`dim: "camera"`, keyed by camera name) and per
+normalized plate (`dim: "plate"`) at three granularities: `hour` and `day`
+(UTC buckets) and `total` (lifetime). Each holds `count`, `confidence_sum`,
+`confidence_count`, `unread` (detections without a readable plate), `known`
+(detections linked to an owner when rolled up), `first_seen` and `last_seen`.
+Unique plates are tracked alongside in `lpr_sketches`: one HyperLogLog sketch
+(LPR_Notifications/lpr_hll.py, ~1.6% standard error) per hour, day and
+lifetime, per camera and for all cameras (`dim: "all"`), which the portal
+merges for any window instead of collecting distinct plates.
+
+The worker follows new detections by `_id`, a few seconds behind real time so
+inserts from concurrent producers are not skipped, and stores its watermark in
+`lpr_job_state`. Each rollup records the batch that last touched it, so a batch
+replayed after a crash is not counted twice. The first run works through the
+full history.
+
+`rebuild` recomputes hour/day rollups for a date range from the detections
+(after archiving, re-extraction or relinking changed history) and then
+re-derives the lifetime totals. Stop the worker while rebuilding.
+
+Usage:
+  python lpr_rollup_worker.py                                   # run continuously
+  python lpr_rollup_worker.py --once                            # catch up, then exit
+  python lpr_rollup_worker.py rebuild --start 2024-01-01 --end 2024-02-01
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import sanitize_plate, parse_timestamp, load_job_state, save_job_state
+from LPR_Notifications.lpr_hll import HyperLogLog
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'lpr_rollup_worker'
+ROLLUPS = 'lpr_rollups'
+SKETCHES = 'lpr_sketches'
+PROJECTION = {'timestamp': 1, 'camera_name': 1, 'camera_id': 1, 'license_plate': 1, 'confidence': 1, 'user_email': 1}
+COUNTERS = ('count', 'confidence_sum', 'confidence_count', 'unread', 'known')
+DUPLICATE_KEY = 11000
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Maintain hourly/daily LPR detection rollups')
+    p.add_argument('command', nargs='?', default='run', choices=['run', 'rebuild'])
+    p.add_argument('--batch-size', type=int, default=2000, help='Detections per rollup batch')
+    p.add_argument('--interval', type=float, default=5.0, help='Seconds between polls when caught up')
+    p.add_argument('--lag', type=float, default=10.0, help='Seconds to stay behind real time')
+    p.add_argument('--once', action='store_true', help='Exit once caught up')
+    p.add_argument('--start', help='rebuild: first day (YYYY-MM-DD, UTC)')
+    p.add_argument('--end', help='rebuild: day after the last one (YYYY-MM-DD, UTC)')
+    return p.parse_args()
+
+
+def bucket_start(ts, granularity):
+    if granularity == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return datetime(ts.year, ts.month, ts.day)
+    return None
+
+
+def rollup_id(granularity, dim, key, bucket):
+    return f"{granularity}|{dim}|{key}|{bucket:%Y-%m-%dT%H}" if bucket else f"{granularity}|{dim}|{key}"
+
+
+def accumulate(acc, doc, granularities=('hour', 'day', 'total')):
+    """Add one detection to the in-memory rollups; returns False if it has no usable timestamp."""
+    ts = parse_timestamp(doc.get('timestamp'))
+    if ts is None:
+        return False
+    plate = sanitize_plate(doc.get('license_plate'))
+    confidence = doc.get('confidence')
+    has_confidence = isinstance(confidence, (int, float)) and not isinstance(confidence, bool)
+    known = doc.get('user_email') not in (None, '', 'unknown')
+
+    dims = [('camera', doc.get('camera_name') or doc.get('camera_id') or 'unknown')]
+    if plate:
+        dims.append(('plate', plate))
+    for granularity in granularities:
+        bucket = bucket_start(ts, granularity)
+        for dim, key in dims:
+            rid = rollup_id(granularity, dim, key, bucket)
+            r = acc.get(rid)
+            if r is None:
+                r = acc[rid] = {'granularity': granularity, 'dim': dim, 'key': key, 'bucket': bucket,
+                                'first_seen': ts, 'last_seen': ts, **dict.fromkeys(COUNTERS, 0)}
+            r['count'] += 1
+            if has_confidence:
+                r['confidence_sum'] += confidence
+                r['confidence_count'] += 1
+            r['unread'] += 0 if plate else 1
+            r['known'] += 1 if known else 0
+            r['first_seen'] = min(r['first_seen'], ts)
+            r['last_seen'] = max(r['last_seen'], ts)
+    return True
+
+
+def accumulate_sketches(sketches, doc, granularities=('hour', 'day', 'total')):
+    """Add one detection's plate to the in-memory unique-plate sketches."""
+    ts = parse_timestamp(doc.get('timestamp'))
+    plate = sanitize_plate(doc.get('license_plate'))
+    if ts is None or not plate:
+        return
+    camera = doc.get('camera_name') or doc.get('camera_id') or 'unknown'
+    for granularity in granularities:
+        bucket = bucket_start(ts, granularity)
+        for dim, key in (('camera', camera), ('all', '*')):
+            sid = rollup_id(granularity, dim, key, bucket)
+            entry = sketches.get(sid)
+            if entry is None:
+                entry = sketches[sid] = ({'granularity': granularity, 'dim': dim, 'key': key, 'bucket': bucket}, HyperLogLog())
+            entry[1].add(plate)
+
+
+def save_sketches(coll, sketches, replace=False):
+    """Merge in-memory sketches into the stored ones (register-wise max, so replays are harmless)."""
+    if not sketches:
+        return
+    stored = {} if replace else {d['_id']: d['registers'] for d in coll.find({'_id': {'$in': list(sketches)}}, {'registers': 1})}
+    ops = []
+    for sid, (meta, hll) in sketches.items():
+        if sid in stored:
+            hll.merge(HyperLogLog.from_bytes(stored[sid]))
+        ops.append(UpdateOne({'_id': sid}, {'$set': {**meta, 'registers': hll.to_bytes(), 'estimate': hll.count()}}, upsert=True))
+    coll.bulk_write(ops, ordered=False)
+
+
+def increment_ops(acc, batch_id=None):
+    """Upserts adding the accumulated counters; with batch_id, rollups that already hold the batch are left alone."""
+    ops = []
+    for rid, r in acc.items():
+        query = {'_id': rid}
+        update = {
+            '$setOnInsert': {k: r[k] for k in ('granularity', 'dim', 'key', 'bucket')},
+            '$inc': {k: r[k] for k in COUNTERS},
+            '$min': {'first_seen': r['first_seen']},
+            '$max': {'last_seen': r['last_seen']},
+        }
+        if batch_id is not None:
+            query['$or'] = [{'batch_id': {'$lt': batch_id}}, {'batch_id': {'$exists': False}}]
+            update['$set'] = {'batch_id': batch_id}
+        ops.append(UpdateOne(query, update, upsert=True))
+    return ops
+
+
+def apply_ops(rollups, ops):
+    """bulk_write that treats duplicate-key upserts (batch already applied) as no-ops."""
+    if not ops:
+        return
+    try:
+        rollups.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        other = [err for err in e.details.get('writeErrors', []) if err.get('code') != DUPLICATE_KEY]
+        if other:
+            raise
+
+
+class RollupWorker:
+    """Applies new detections to lpr_rollups in _id order"""
+
+    def __init__(self, db, batch_size=2000, lag=10.0):
+        self.db = db
+        self.plates = db['license_plates']
+        self.rollups = db[ROLLUPS]
+        self.sketches = db[SKETCHES]
+        self.batch_size = batch_size
+        self.lag = lag
+        self.stats = {'detections': 0, 'skipped': 0, 'batches': 0}
+
+    def ensure_indexes(self):
+        self.rollups.create_index([('granularity', 1), ('dim', 1), ('bucket', 1)])
+        self.rollups.create_index([('granularity', 1), ('dim', 1), ('key', 1), ('bucket', 1)])
+        self.sketches.create_index([('granularity', 1), ('dim', 1), ('bucket', 1)])
+
+    def poll_once(self):
+        """Roll up the next batch of detections; returns how many were read."""
+        last_id = load_job_state(self.db, JOB_ID).get('last_id')
+        upper = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=self.lag))
+        query = {'_id': {'$lt': upper}}
+        if last_id is not None:
+            query['_id']['$gt'] = last_id
+        docs = list(self.plates.find(query, PROJECTION).sort('_id', 1).limit(self.batch_size))
+        if not docs:
+            return 0
+
+        acc = {}
+        sketches = {}
+        for doc in docs:
+            if not accumulate(acc, doc):
+                self.stats['skipped'] += 1
+            accumulate_sketches(sketches, doc)
+        batch_id = docs[-1]['_id']
+        apply_ops(self.rollups, increment_ops(acc, batch_id))
+        save_sketches(self.sketches, sketches)
+        save_job_state(self.db, JOB_ID, {'last_id': batch_id, 'updated_at': datetime.utcnow()})
+
+        self.stats['detections'] += len(docs)
+        self.stats['batches'] += 1
+        return len(docs)
+
+    def run(self, interval=5.0, once=False):
+        self.ensure_indexes()
+        logger.info("🚀 Rolling up detections into lpr_rollups")
+        while True:
+            started = time.time()
+            read = self.poll_once()
+            if read:
+                logger.info(f"✓ Rolled up {read} detections ({read / max(time.time() - started, 1e-6):.0f}/sec, "
+                            f"{self.stats['detections']} total)")
+            if read < self.batch_size:
+                if once:
+                    return
+                time.sleep(interval)
+
+    def rebuild(self, start, end):
+        """Recompute hour/day rollups for [start, end) from the detections, then re-derive the totals."""
+        last_id = load_job_state(self.db, JOB_ID).get('last_id')
+        if last_id is None:
+            logger.error("No watermark yet: run the worker first (its first run covers the full history)")
+            return False
+        self.ensure_indexes()
+
+        day = start
+        while day < end:
+            next_day = day + timedelta(days=1)
+            acc = {}
+            sketches = {}
+            # Detections after the watermark are still ahead of the worker; leave them to it
+            query = {'timestamp': {'$gte': day, '$lt': next_day}, '_id': {'$lte': last_id}}
+            for doc in self.plates.find(query, PROJECTION):
+                accumulate(acc, doc, granularities=('hour', 'day'))
+                accumulate_sketches(sketches, doc, granularities=('hour', 'day'))
+            in_range = {'granularity': {'$in': ['hour', 'day']}, 'bucket': {'$gte': day, '$lt': next_day}}
+            removed = self.rollups.delete_many(in_range).deleted_count
+            self.sketches.delete_many(in_range)
+            apply_ops(self.rollups, increment_ops(acc))
+            save_sketches(self.sketches, sketches, replace=True)
+            logger.info(f"✓ {day:%Y-%m-%d}: {len(acc)} rollups rebuilt ({removed} replaced)")
+            day = next_day
+
+        self.rebuild_totals()
+        return True
+
+    def rebuild_totals(self):
+        """Derive lifetime totals from the daily rollups."""
+        pipeline = [
+            {'$match': {'granularity': 'day'}},
+            {'$group': {
+                '_id': {'dim': '$dim', 'key': '$key'},
+                **{k: {'$sum': f'${k}'} for k in COUNTERS},
+                'first_seen': {'$min': '$first_seen'},
+                'last_seen': {'$max': '$last_seen'},
+            }},
+        ]
+        ops, keep = [], []
+        for row in self.rollups.aggregate(pipeline, allowDiskUse=True):
+            dim, key = row['_id']['dim'], row['_id']['key']
+            rid = rollup_id('total', dim, key, None)
+            keep.append(rid)
+            fields = {k: row[k] for k in COUNTERS + ('first_seen', 'last_seen')}
+            ops.append(UpdateOne({'_id': rid}, {'$set': {'granularity': 'total', 'dim': dim, 'key': key,
+                                                         'bucket': None, **fields}}, upsert=True))
+        for i in range(0, len(ops), 1000):
+            self.rollups.bulk_write(ops[i:i + 1000], ordered=False)
+        removed = self.rollups.delete_many({'granularity': 'total', '_id': {'$nin': keep}}).deleted_count
+        logger.info(f"✓ Totals rebuilt: {len(ops)} rollups ({removed} stale removed)")
+
+        totals = {}
+        for doc in self.sketches.find({'granularity': 'day'}, {'dim': 1, 'key': 1, 'registers': 1}):
+            sid = rollup_id('total', doc['dim'], doc['key'], None)
+            if sid not in totals:
+                totals[sid] = ({'granularity': 'total', 'dim': doc['dim'], 'key': doc['key'], 'bucket': None}, HyperLogLog())
+            totals[sid][1].merge(HyperLogLog.from_bytes(doc['registers']))
+        self.sketches.delete_many({'granularity': 'total', '_id': {'$nin': list(totals)}})
+        save_sketches(self.sketches, totals, replace=True)
+        logger.info(f"✓ Lifetime sketches rebuilt: {len(totals)}")
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        mongo = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        mongo = MongoClient(f"{mongo_host}:{mongo_port}")
+
+    worker = RollupWorker(mongo[mongo_db], batch_size=args.batch_size, lag=args.lag)
+    try:
+        if args.command == 'rebuild':
+            start = parse_timestamp(args.start) if args.start else None
+            end = parse_timestamp(args.end) if args.end else None
+            if start is None or end is None or start >= end:
+                logger.error("rebuild needs --start and --end dates (YYYY-MM-DD), start before end")
+                sys.exit(1)
+            start = datetime(start.year, start.month, start.day)
+            end = datetime(end.year, end.month, end.day) + (timedelta(days=1) if end.time() != datetime.min.time() else timedelta())
+            if not worker.rebuild(start, end):
+                sys.exit(1)
+        else:
+            worker.run(interval=args.interval, once=args.once)
+    except KeyboardInterrupt:
+        logger.info("\n⚠️  Stopped")
+    finally:
+        logger.info(f"Detections: {worker.stats['detections']} | Skipped (no timestamp): {worker.stats['skipped']} | "
+                    f"Batches: {worker.stats['batches']}")
+        mongo.close()
+
+
+if __name__ == '__main__':
+    main()
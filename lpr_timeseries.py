@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Time-series layout for LPR detections.
+
+Creates a MongoDB time-series collection for detections (`timestamp` as the
+timeField, camera id and site as the metaField), streams `license_plates` into
+it, and benchmarks the two layouts against each other on the same synthetic
+dataset. Producers write to the time-series collection when
+LPR_TIMESERIES_WRITE is `dual` (both collections) or `only`.
+
+Time-series collections cannot have unique indexes, so every writer claims the
+event id in `<collection>_keys` before inserting (`insert_timeseries_detection`
+in lpr_helpers.py). `migrate` claims the same keys and skips events already
+copied, so it can run while producers write `dual` and be rerun after a crash
+without duplicating detections. `create` also seeds keys for documents already
+in the collection; rerun it once after upgrading.
+
+Usage:
+  python lpr_timeseries.py create                     # create collection + indexes, seed event id keys
+  python lpr_timeseries.py migrate                    # stream license_plates into it (resumable)
+  python lpr_timeseries.py bench --count 1000000      # plain vs time-series benchmark
+
+Requires MongoDB 5.0+ (6.3+ for secondary indexes on arbitrary fields).
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import CollectionInvalid, BulkWriteError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import (
+    timeseries_collection_name, to_timeseries_doc, timeseries_keys_name, load_job_state, save_job_state,
+)
+from LPR_Notifications.lpr_synthetic import generate_detections
+
+TS_OPTIONS = {'timeField': 'timestamp', 'metaField': 'meta', 'granularity': 'seconds'}
+# Plate lookups and per-camera ranges; timestamp ranges are served by the bucket index
+TS_INDEXES = [
+    [('license_plate', 1), ('timestamp', -1)],
+    [('meta.camera_id', 1), ('timestamp', -1)],
+    [('event_id', 1)],
+]
+# A producer claim this old without its time-series document was abandoned mid-write
+STALE_CLAIM = timedelta(minutes=5)
+# Same indexes the producers create on the plain collection
+PLAIN_INDEXES = [[('event_id', 1)], [('timestamp', 1)], [('camera_id', 1)], [('license_plate', 1)]]
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Time-series collection for LPR detections')
+    sub = p.add_subparsers(dest='command', required=True)
+
+    c = sub.add_parser('create', help='Create the time-series collection and its indexes')
+    c.add_argument('--expire-days', type=int, default=0, help='Optional TTL for old detections (0 = keep forever)')
+
+    m = sub.add_parser('migrate', help='Stream license_plates into the time-series collection')
+    m.add_argument('--batch-size', type=int, default=2000)
+    m.add_argument('--restart', action='store_true', help='Ignore the checkpoint')
+
+    b = sub.add_parser('bench', help='Compare plain and time-series layouts on synthetic data')
+    b.add_argument('--count', type=int, default=200000, help='Synthetic detections to insert')
+    b.add_argument('--days', type=int, default=90, help='Days the dataset spans')
+    b.add_argument('--batch-size', type=int, default=5000)
+    b.add_argument('--repeat', type=int, default=5, help='Runs per query for latency percentiles')
+    b.add_argument('--keep', action='store_true', help='Keep the benchmark collections')
+    return p.parse_args()
+
+
+def create_timeseries(db, name, expire_days=0):
+    options = {'timeseries': TS_OPTIONS}
+    if expire_days:
+        options['expireAfterSeconds'] = expire_days * 86400
+    try:
+        db.create_collection(name, **options)
+        print(f"✓ Created time-series collection {name}")
+    except CollectionInvalid:
+        print(f"Collection {name} already exists")
+    for keys in TS_INDEXES:
+        db[name].create_index(keys)
+    print(f"✓ Indexes: {', '.join(db[name].index_information())}")
+    print(f"✓ Event id keys: {seed_keys(db, name)} added to {timeseries_keys_name()}")
+
+
+def seed_keys(db, name, batch_size=5000):
+    """Claim the event ids of documents already in the time-series collection (idempotent)."""
+    keys = db[timeseries_keys_name()]
+    added = 0
+    ops = []
+    now = datetime.utcnow()
+    for doc in db[name].find({'event_id': {'$exists': True}}, {'event_id': 1}):
+        ops.append(UpdateOne({'_id': doc['event_id']},
+                             {'$setOnInsert': {'source': 'existing', 'claimed_at': now}}, upsert=True))
+        if len(ops) >= batch_size:
+            added += keys.bulk_write(ops, ordered=False).upserted_count
+            ops = []
+    if ops:
+        added += keys.bulk_write(ops, ordered=False).upserted_count
+    return added
+
+
+def claim_keys(keys, event_ids, job_id, now):
+    """Claim event ids for this migration; returns the ids another writer already holds."""
+    if not event_ids:
+        return set()
+    try:
+        keys.insert_many([{'_id': e, 'source': job_id, 'claimed_at': now} for e in event_ids], ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(err.get('code') != 11000 for err in errors):
+            raise
+        return {event_ids[err['index']] for err in errors}
+    return set()
+
+
+def migrate(db, name, batch_size=2000, restart=False):
+    """Stream license_plates into the time-series collection in _id order with checkpoints.
+
+    Each batch skips event ids already in the collection (one `$in` lookup) and
+    claims the rest in the keys collection before inserting, so live producers
+    and reruns after a crash between insert and checkpoint never add a second copy.
+    """
+    source = db['license_plates']
+    target = db[name]
+    keys = db[timeseries_keys_name()]
+    job_id = f"lpr_timeseries_migrate:{name}"
+    last_id = None if restart else load_job_state(db, job_id).get('last_id')
+
+    copied = skipped = present = 0
+    started = time.time()
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(source.find(query).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        pending = {}
+        for doc in docs:
+            # timeField must be a BSON date (see migrate_lpr_timestamps.py)
+            if not isinstance(doc.get('timestamp'), datetime) or not doc.get('event_id'):
+                skipped += 1
+                continue
+            pending.setdefault(doc['event_id'], doc)
+        ids = list(pending)
+        copied_ids = set(target.distinct('event_id', {'event_id': {'$in': ids}})) if ids else set()
+        claims = {k['_id']: k for k in keys.find({'_id': {'$in': ids}})} if ids else {}
+        now = datetime.utcnow()
+        batch, unclaimed = [], []
+        for event_id, doc in pending.items():
+            claim = claims.get(event_id)
+            if event_id in copied_ids:
+                present += 1
+            elif claim is None:
+                unclaimed.append(event_id)
+            elif claim.get('source') == job_id or claim['claimed_at'] < now - STALE_CLAIM:
+                # Claimed by a crashed run of this migration, or by a writer that died mid-insert
+                batch.append(doc)
+            else:
+                # A producer is writing it right now
+                present += 1
+        taken = claim_keys(keys, unclaimed, job_id, now)
+        present += len(taken)
+        batch += [pending[e] for e in unclaimed if e not in taken]
+        if batch:
+            target.insert_many([to_timeseries_doc(doc) for doc in batch], ordered=False)
+        # Older copies made before keys existed still need one, so producers skip them
+        missing = [e for e in copied_ids if e not in claims]
+        if missing:
+            keys.bulk_write([UpdateOne({'_id': e}, {'$setOnInsert': {'source': 'existing', 'claimed_at': now}}, upsert=True)
+                             for e in missing], ordered=False)
+        copied += len(batch)
+        last_id = docs[-1]['_id']
+        save_job_state(db, job_id, {'last_id': last_id, 'updated_at': datetime.utcnow()})
+        print(f"Progress: copied={copied} already_present={present} skipped={skipped} "
+              f"({copied / max(time.time() - started, 1e-6):.0f} docs/sec)")
+
+    print(f"\n✓ Migration complete: {copied} copied, {present} already present, {skipped} skipped (non-Date timestamp or no event_id)")
+
+
+def coll_sizes(db, name):
+    stats = db.command('collStats', name)
+    return stats.get('storageSize', 0), stats.get('totalIndexSize', 0)
+
+
+def timed(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs), max(runs)
+
+
+def bench(db, count, days, batch_size, repeat, keep):
+    end = datetime.utcnow()
+    plain_name, ts_name = 'bench_lpr_plain', 'bench_lpr_ts'
+    db.drop_collection(plain_name)
+    db.drop_collection(ts_name)
+    db.create_collection(ts_name, timeseries=TS_OPTIONS)
+    for keys in PLAIN_INDEXES:
+        db[plain_name].create_index(keys)
+    for keys in TS_INDEXES:
+        db[ts_name].create_index(keys)
+
+    results = {}
+    for name, transform in ((plain_name, None), (ts_name, to_timeseries_doc)):
+        coll = db[name]
+        batch = []
+        t0 = time.perf_counter()
+        for doc in generate_detections(count, days=days, end=end):
+            batch.append(transform(doc) if transform else doc)
+            if len(batch) >= batch_size:
+                coll.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            coll.insert_many(batch, ordered=False)
+        insert_secs = time.perf_counter() - t0
+
+        camera_field = 'meta.camera_id' if transform else 'camera_id'
+        since_24h = {'timestamp': {'$gte': end - timedelta(hours=24)}}
+        since_7d = {'timestamp': {'$gte': end - timedelta(days=7)}}
+        per_camera = {camera_field: 'cam-lpr-left', 'timestamp': {'$gte': end - timedelta(days=7)}}
+        storage, index_size = coll_sizes(db, name)
+        results[name] = {
+            'insert_rate': count / insert_secs,
+            'storage_mb': storage / 1048576,
+            'index_mb': index_size / 1048576,
+            '24h': timed(lambda: list(coll.find(since_24h, {'license_plate': 1})), repeat),
+            '7d': timed(lambda: list(coll.find(since_7d, {'license_plate': 1})), repeat),
+            '7d_camera': timed(lambda: list(coll.find(per_camera, {'license_plate': 1})), repeat),
+        }
+
+    print(f"\n--- Layout benchmark: {count} detections over {days} days ---")
+    print(f"{'metric':<22}{'plain':>16}{'time-series':>16}")
+    p, t = results[plain_name], results[ts_name]
+    print(f"{'insert docs/sec':<22}{p['insert_rate']:>16.0f}{t['insert_rate']:>16.0f}")
+    print(f"{'storage MB':<22}{p['storage_mb']:>16.1f}{t['storage_mb']:>16.1f}")
+    print(f"{'index MB':<22}{p['index_mb']:>16.1f}{t['index_mb']:>16.1f}")
+    for key in ('24h', '7d', '7d_camera'):
+        print(f"{key + ' ms (p50/max)':<22}{p[key][0]:>9.1f}/{p[key][1]:<6.1f}{t[key][0]:>9.1f}/{t[key][1]:<6.1f}")
+
+    if not keep:
+        db.drop_collection(plain_name)
+        db.drop_collection(ts_name)
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+    name = timeseries_collection_name()
+
+    try:
+        if args.command == 'create':
+            create_timeseries(db, name, args.expire_days)
+        elif args.command == 'migrate':
+            migrate(db, name, args.batch_size, args.restart)
+        elif args.command == 'bench':
+            bench(db, args.count, args.days, args.batch_size, args.repeat, args.keep)
+    except BulkWriteError as e:
+        print(f"Write error: {e.details.get('writeErrors', [])[:3]}")
+        sys.exit(1)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
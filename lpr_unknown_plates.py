@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Report the unregistered plates that keep coming back.
+
+fast_lpr_capture.py counts every `user_email: 'unknown'` detection in
+fixed-size Space-Saving summaries per UTC day and ISO week
+(LPR_Notifications/lpr_heavy_hitters.py) and snapshots them to
+`lpr_unknown_heavy_hitters`; plates that reach LPR_UNKNOWN_ALERT_DAY /
+LPR_UNKNOWN_ALERT_WEEK reads in a period get one record in
+`lpr_unknown_alerts`. This tool reads those small documents only, so it never
+groups over `license_plates`. Counts are upper bounds; `min` is the count the
+summary guarantees (they differ only for plates that entered a full summary).
+
+Usage:
+  python lpr_unknown_plates.py top                      # today's top unknown plates
+  python lpr_unknown_plates.py top --week               # this ISO week
+  python lpr_unknown_plates.py top --period 2026-10-17  # a given day (or 2026-W42)
+  python lpr_unknown_plates.py alerts --days 7          # alerts raised in the last week
+"""
+
+import os
+import argparse
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_heavy_hitters import HEAVY_HITTERS_COLLECTION, ALERTS_COLLECTION, period_of
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Top unregistered plates per day/week from heavy-hitter snapshots')
+    sub = p.add_subparsers(dest='command', required=True)
+    t = sub.add_parser('top')
+    t.add_argument('--week', action='store_true', help='Weekly instead of daily')
+    t.add_argument('--period', help='Day (YYYY-MM-DD) or ISO week (YYYY-Www); default current')
+    t.add_argument('--limit', type=int, default=20)
+    a = sub.add_parser('alerts')
+    a.add_argument('--days', type=int, default=7)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        if args.command == 'top':
+            period = args.period
+            granularity = 'week' if args.week or (period and '-W' in period) else 'day'
+            period = period or period_of(datetime.utcnow(), granularity)[0]
+            snap = db[HEAVY_HITTERS_COLLECTION].find_one({'_id': f"{granularity}:{period}"})
+            if not snap:
+                print(f"No snapshot for {granularity} {period}")
+                return
+            print(f"🚗 Top unknown plates, {granularity} {period}: {snap['reads']:,} reads, "
+                  f"{len(snap['counters'])}/{snap['capacity']} counters (updated {snap.get('updated_at')})")
+            for c in snap['counters'][:args.limit]:
+                print(f"  {c.get('license_plate') or c['plate_key']:<12} {c['count']:>6,}"
+                      + (f"  (min {c['count'] - c['error']:,})" if c['error'] else ''))
+        else:
+            since = datetime.utcnow() - timedelta(days=args.days)
+            rows = list(db[ALERTS_COLLECTION].find({'raised_at': {'$gte': since}}).sort('raised_at', -1))
+            print(f"🚨 {len(rows)} unknown plate alerts in the last {args.days} days")
+            for r in rows:
+                print(f"  {r['raised_at']:%Y-%m-%d %H:%M}  {r.get('license_plate') or r['plate_key']:<12} "
+                      f"{r['count']:>4} reads this {r['granularity']} ({r['period']}, threshold {r['threshold']}) "
+                      f"last at {r.get('camera_name') or '-'}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
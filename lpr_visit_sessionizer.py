@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Pair entry and exit detections into visits.
+
+Feeds `license_plates` in timestamp order through the per-plate state machine
+in LPR_Notifications/lpr_visits.py and writes the result to `visits`
+(arrival, departure, dwell time, `missing_exit`/`missing_entry` flags) and
+`lpr_on_site`, one document per plate currently on site keyed by plate key,
+so "is this plate here" is a lookup by _id. Entry/exit cameras come from
+LPR_ENTRY_CAMERAS / LPR_EXIT_CAMERAS.
+
+`run` is incremental: it restores open visits, processes detections newer than
+the checkpoint in `lpr_job_state` and saves the new checkpoint; `--follow`
+keeps doing so every --interval seconds. `rebuild` clears both collections and
+recomputes all history in a single ordered pass over `timestamp` (use it after
+changing camera roles or when detections were back-filled behind the
+checkpoint).
+
+Usage:
+  python lpr_visit_sessionizer.py run                 # process new detections once
+  python lpr_visit_sessionizer.py run --follow        # keep processing every 30s
+  python lpr_visit_sessionizer.py rebuild             # recompute all visits
+  python lpr_visit_sessionizer.py on-site             # who is on site now
+  python lpr_visit_sessionizer.py visits ABC123       # visits of one plate
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime
+from pymongo import MongoClient, ReplaceOne, DeleteOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import plate_key, load_job_state, save_job_state
+from LPR_Notifications.lpr_visits import VISITS_COLLECTION, ON_SITE_COLLECTION, VisitSessionizer
+
+JOB_ID = 'lpr_visit_sessionizer'
+PROJECTION = {'event_id': 1, 'timestamp': 1, 'camera_id': 1, 'camera_name': 1, 'license_plate': 1, 'user_email': 1}
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Pair LPR entry/exit detections into visits')
+    sub = p.add_subparsers(dest='command', required=True)
+    for name in ('run', 'rebuild'):
+        s = sub.add_parser(name)
+        s.add_argument('--batch-size', type=int, default=5000)
+        s.add_argument('--repeat-seconds', type=int, default=300, help='Reads closer than this repeat the previous one')
+        s.add_argument('--max-visit-hours', type=float, default=24, help='Open visits older than this get missing_exit')
+        if name == 'run':
+            s.add_argument('--follow', action='store_true', help='Keep running')
+            s.add_argument('--interval', type=int, default=30, help='Seconds between passes with --follow')
+    sub.add_parser('on-site')
+    v = sub.add_parser('visits')
+    v.add_argument('plate')
+    v.add_argument('--limit', type=int, default=20)
+    return p.parse_args()
+
+
+def create_indexes(db):
+    visits = db[VISITS_COLLECTION]
+    visits.create_index([('plate_key', 1), ('arrival', -1)])
+    visits.create_index([('status', 1)])
+    visits.create_index([('arrival', -1)])
+    visits.create_index([('missing_exit', 1), ('arrival', -1)])
+
+
+def flush(db, engine):
+    """Write visits and on-site changes accumulated by the engine."""
+    changed, arrived, left = engine.take_changes()
+    if changed:
+        db[VISITS_COLLECTION].bulk_write([ReplaceOne({'_id': v['_id']}, v, upsert=True) for v in changed], ordered=False)
+    ops = [DeleteOne({'_id': key}) for key in left]
+    for key in arrived:
+        visit = engine.on_site[key]
+        ops.append(ReplaceOne({'_id': key}, {
+            'visit_id': visit['_id'], 'license_plate': visit['license_plate'], 'user_email': visit['user_email'],
+            'arrival': visit['arrival'], 'entry_camera': visit['entry_camera'], 'last_read': visit['last_read'],
+        }, upsert=True))
+    if ops:
+        db[ON_SITE_COLLECTION].bulk_write(ops, ordered=False)
+    return len(changed)
+
+
+def process(db, engine, batch_size, state):
+    """Feed detections after the checkpoint through the engine, checkpointing each batch. Returns visit writes."""
+    plates = db['license_plates']
+    last_ts = state.get('last_ts')
+    # Detections sharing the checkpoint timestamp that were already processed
+    done_ids = set(state.get('last_ids') or [])
+    written = 0
+    while True:
+        query = {'timestamp': {'$gte': last_ts}} if last_ts is not None else {'timestamp': {'$ne': None}}
+        docs = list(plates.find(query, PROJECTION).sort('timestamp', 1).limit(batch_size + len(done_ids)))
+        fresh = [d for d in docs if d['_id'] not in done_ids]
+        if not fresh:
+            break
+        for doc in fresh:
+            engine.process(doc)
+        ts = fresh[-1]['timestamp']
+        done_ids = {d['_id'] for d in docs if d['timestamp'] == ts} | (done_ids if ts == last_ts else set())
+        last_ts = ts
+        engine.expire(last_ts)
+        written += flush(db, engine)
+        save_job_state(db, JOB_ID, {'last_ts': last_ts, 'last_ids': list(done_ids), 'updated_at': datetime.utcnow()})
+    return written
+
+
+def run(db, args):
+    create_indexes(db)
+    while True:
+        engine = VisitSessionizer(repeat_seconds=args.repeat_seconds, max_visit_hours=args.max_visit_hours)
+        engine.load_open(db[VISITS_COLLECTION].find({'status': 'open'}))
+        state = load_job_state(db, JOB_ID)
+        if state.get('last_ts'):
+            engine.load_closed(db[VISITS_COLLECTION].find({
+                'status': 'closed', 'departure': {'$ne': None}, 'last_read': {'$gte': state['last_ts'] - engine.repeat}}))
+        started = time.time()
+        written = process(db, engine, args.batch_size, state)
+        print(f"✓ {engine.stats['reads']} detections -> {written} visit writes "
+              f"({engine.stats['opened']} opened, {engine.stats['closed']} closed, "
+              f"{engine.stats['missing_exit']} missing exit, {engine.stats['missing_entry']} missing entry, "
+              f"{engine.stats['ignored']} ignored); {len(engine.on_site)} on site "
+              f"({time.time() - started:.1f}s)")
+        if not args.follow:
+            return
+        time.sleep(args.interval)
+
+
+def rebuild(db, args):
+    db[VISITS_COLLECTION].delete_many({})
+    db[ON_SITE_COLLECTION].delete_many({})
+    db['lpr_job_state'].delete_one({'_id': JOB_ID})
+    create_indexes(db)
+    engine = VisitSessionizer(repeat_seconds=args.repeat_seconds, max_visit_hours=args.max_visit_hours)
+    started = time.time()
+    written = process(db, engine, args.batch_size, {})
+    elapsed = time.time() - started
+    s = engine.stats
+    print(f"✓ Rebuilt visits from {s['reads']:,} detections in {elapsed:.1f}s "
+          f"({s['reads'] / max(elapsed, 1e-6):,.0f} detections/sec)")
+    print(f"  {db[VISITS_COLLECTION].count_documents({}):,} visits ({written:,} writes), "
+          f"{s['missing_exit']:,} missing exit, {s['missing_entry']:,} missing entry, {s['ignored']:,} ignored, "
+          f"{len(engine.on_site):,} on site now")
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        if args.command == 'run':
+            run(db, args)
+        elif args.command == 'rebuild':
+            rebuild(db, args)
+        elif args.command == 'on-site':
+            rows = list(db[ON_SITE_COLLECTION].find().sort('arrival', 1))
+            print(f"🚗 {len(rows)} on site")
+            for row in rows:
+                print(f"  {row['license_plate']:<12} since {row['arrival']}  {row.get('user_email') or 'unknown'}")
+        else:
+            key = plate_key(args.plate)
+            here = db[ON_SITE_COLLECTION].find_one({'_id': key})
+            print(f"{key}: {'on site since ' + str(here['arrival']) if here else 'not on site'}")
+            for v in db[VISITS_COLLECTION].find({'plate_key': key}).sort('arrival', -1).limit(args.limit):
+                dwell = f"{v['dwell_seconds'] / 60:.0f} min" if v.get('dwell_seconds') is not None else '-'
+                flags = ' '.join(f for f in ('missing_exit', 'missing_entry') if v.get(f))
+                print(f"  {v.get('arrival')} -> {v.get('departure')}  {dwell:>8}  {v['status']} {flags}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Manage the LPR watchlist (banned vehicles, expired visitors, ...).
+
+fast_lpr_capture.py checks every read against the active `lpr_watchlist`
+entries (exact plate, or one edit / O-0 I-1 B-8 S-5 confusion away) and picks
+up changes within a second through a change stream, or every
+LPR_WATCHLIST_REFRESH_SECONDS without a replica set. Hits are written to
+`lpr_watchlist_hits`; the match latency distribution is kept under `watchlist`
+in the `fast_lpr_capture` checkpoint in `lpr_job_state`.
+
+Usage:
+  python manage_watchlist.py add ABC123 --list banned --reason "Trespass notice"
+  python manage_watchlist.py add XYZ789 --list expired_visitor --expires-days 30 --notify guard@example.com
+  python manage_watchlist.py remove ABC123
+  python manage_watchlist.py list
+  python manage_watchlist.py hits --hours 24
+  python manage_watchlist.py stats                   # capture-side match metrics
+"""
+
+import os
+import getpass
+import argparse
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import sanitize_plate, load_job_state
+from LPR_Notifications.lpr_watchlist import WATCHLIST_COLLECTION, HITS_COLLECTION
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Manage the LPR watchlist')
+    sub = p.add_subparsers(dest='command', required=True)
+    a = sub.add_parser('add')
+    a.add_argument('plate')
+    a.add_argument('--list', default='banned', help='Watchlist name, e.g. banned or expired_visitor')
+    a.add_argument('--reason', default='')
+    a.add_argument('--expires-days', type=float, help='Stop matching after this many days')
+    a.add_argument('--notify', action='append', default=[], help='E-mail to notify on a hit (repeatable)')
+    r = sub.add_parser('remove')
+    r.add_argument('plate')
+    sub.add_parser('list')
+    h = sub.add_parser('hits')
+    h.add_argument('--hours', type=float, default=24)
+    sub.add_parser('stats')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+    watchlist = db[WATCHLIST_COLLECTION]
+
+    try:
+        if args.command in ('add', 'remove'):
+            plate = sanitize_plate(args.plate)
+            if not plate:
+                print(f"❌ Not a valid plate: {args.plate!r}")
+                return
+            if args.command == 'remove':
+                n = watchlist.update_many({'plate': plate, 'active': {'$ne': False}},
+                                          {'$set': {'active': False, 'removed_at': datetime.utcnow()}}).modified_count
+                print(f"✓ {plate} removed from {n} watchlist entr{'y' if n == 1 else 'ies'}" if n else f"{plate} is not on the watchlist")
+                return
+            now = datetime.utcnow()
+            entry = {'list': args.list, 'reason': args.reason, 'active': True, 'notify': args.notify,
+                     'expires_at': now + timedelta(days=args.expires_days) if args.expires_days else None,
+                     'added_by': getpass.getuser(), 'updated_at': now}
+            watchlist.update_one({'plate': plate, 'list': args.list},
+                                 {'$set': entry, '$setOnInsert': {'created_at': now}}, upsert=True)
+            print(f"✓ {plate} on the {args.list} watchlist" + (f" until {entry['expires_at']:%Y-%m-%d}" if entry['expires_at'] else ''))
+        elif args.command == 'list':
+            rows = list(watchlist.find({'active': {'$ne': False}}).sort('plate', 1))
+            print(f"🚩 {len(rows)} watchlist entries")
+            for row in rows:
+                expires = f"until {row['expires_at']:%Y-%m-%d}" if row.get('expires_at') else ''
+                print(f"  {row['plate']:<12} {row.get('list', ''):<16} {expires:<17} {row.get('reason', '')}")
+        elif args.command == 'hits':
+            since = datetime.utcnow() - timedelta(hours=args.hours)
+            rows = list(db[HITS_COLLECTION].find({'matched_at': {'$gte': since}}).sort('matched_at', -1))
+            print(f"🚩 {len(rows)} watchlist hits in the last {args.hours:g}h")
+            for row in rows:
+                read = row['license_plate'] if row['match'] == 'exact' else f"{row['license_plate']} ~ {row['watch_plate']}"
+                print(f"  {row['matched_at']:%Y-%m-%d %H:%M:%S}  {read:<22} {row.get('list', ''):<16} {row.get('camera_name') or '-'}")
+        else:
+            stats = load_job_state(db, 'fast_lpr_capture').get('watchlist')
+            if not stats:
+                print("No watchlist metrics yet (fast_lpr_capture.py saves them every poll)")
+                return
+            lat = stats['latency']
+            print(f"🚩 {stats['entries']} active entries (loaded {stats['loaded_at']}, {stats['reloads']} reloads)")
+            print(f"  {stats['checks']:,} checks, {stats['hits']:,} hits ({stats['exact']:,} exact, {stats['fuzzy']:,} fuzzy), "
+                  f"{stats.get('dropped', 0):,} dropped")
+            print(f"  match latency: mean {lat['mean_us']}µs, p50 <{lat['p50_us']:.0f}µs, p90 <{lat['p90_us']:.0f}µs, "
+                  f"p99 <{lat['p99_us']:.0f}µs, max {lat['max_us']}µs")
+            for bucket, n in lat['buckets_us'].items():
+                print(f"    {bucket + 'µs':>10} {n:>10,}")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
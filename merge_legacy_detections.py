@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Merge the legacy detection collections into `license_plates`.
+
+`lpr_microservice.py` and `lpr_websocket_listener.py` wrote to
+`license_plate_detections`, `lpr_microservice_v2.py` to
+`license_plate_detections_v2`, and older `lpr_event_capture.py` releases keyed their
+`license_plates` documents by `protect_event_id` instead of `event_id`. This
+tool streams each legacy collection in _id order, maps every document onto the
+`license_plates` schema (sanitized plate, percentage confidence, owner lookup,
+plate search and vehicle fields, `legacy_source: {collection, _id}`) and
+upserts it on `event_id` with `$setOnInsert`, so events already present are
+never overwritten. Documents without a Protect event id get
+`legacy:<collection>:<_id>`, and are dropped as duplicates when
+`license_plates` already has the same plate from the same camera within
+--window seconds. Raw message fields go to the `event_raw` side store. Plates
+the microservice stored masked (`****12`) without `license_plate_raw`, and
+documents without a usable timestamp, are counted as unparseable.
+
+Before merging, `protect_event_id` on `license_plates` is renamed to
+`event_id` (its unique index is dropped first; documents whose event is
+already stored under `event_id` are removed as duplicates). Progress is
+checkpointed per collection in `lpr_job_state`. With --drop-legacy, legacy
+collections that merged completely with nothing unparseable are dropped with
+their indexes.
+
+Usage:
+  python merge_legacy_detections.py --dry-run      # counts only
+  python merge_legacy_detections.py                # merge (resumable)
+  python merge_legacy_detections.py --drop-legacy  # merge, then drop merged legacy collections
+"""
+
+import os
+import re
+import time
+import argparse
+from datetime import datetime, timedelta
+from collections import Counter
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import (
+    UNKNOWN_OWNER, sanitize_plate, plate_search_fields, vehicle_fields, parse_timestamp, load_plate_owners,
+    load_job_state, save_job_state,
+)
+from LPR_Notifications.lpr_extract import normalize_confidence
+from LPR_Notifications.lpr_event_raw import RAW_COLLECTION, raw_document
+
+JOB_ID = 'merge_legacy_detections'
+LEGACY_COLLECTIONS = ('license_plate_detections', 'license_plate_detections_v2')
+# Stringified message/detection fields the legacy producers stored next to the plate
+RAW_FIELDS = ('raw_message', 'raw_detection', 'metadata', 'new_obj', 'old_obj', 'changed_data', 'action_frame',
+              'data_frame', 'detected_thumbnails')
+_MASKED = re.compile(r'^\*+')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Merge legacy LPR detection collections into license_plates')
+    p.add_argument('--batch-size', type=int, default=1000)
+    p.add_argument('--window', type=int, default=10, help='Seconds within which an id-less detection duplicates a stored one')
+    p.add_argument('--restart', action='store_true', help='Ignore checkpoints')
+    p.add_argument('--dry-run', action='store_true', help='Count without writing')
+    p.add_argument('--drop-legacy', action='store_true', help='Drop legacy collections that merged cleanly')
+    return p.parse_args()
+
+
+def unify_event_ids(plates, dry_run):
+    """Rename `protect_event_id` to `event_id` on license_plates. Returns (renamed, duplicates removed)."""
+    legacy = list(plates.find({'protect_event_id': {'$exists': True}}, {'protect_event_id': 1, 'event_id': 1}))
+    if not legacy:
+        return 0, 0
+    ids = [d['protect_event_id'] for d in legacy]
+    present = {d['event_id'] for d in plates.find({'event_id': {'$in': ids}}, {'event_id': 1})}
+    renames = [d for d in legacy if 'event_id' not in d and d['protect_event_id'] not in present]
+    duplicates = [d['_id'] for d in legacy if 'event_id' not in d and d['protect_event_id'] in present]
+    if dry_run:
+        return len(renames), len(duplicates)
+
+    for name, spec in plates.index_information().items():
+        if spec['key'][0][0] == 'protect_event_id':
+            # Unique on a field most documents lack; event_id is the canonical unique key
+            plates.drop_index(name)
+    if renames:
+        plates.bulk_write([UpdateOne({'_id': d['_id']}, {'$rename': {'protect_event_id': 'event_id'}}) for d in renames],
+                          ordered=False)
+    if duplicates:
+        plates.delete_many({'_id': {'$in': duplicates}})
+    plates.update_many({'protect_event_id': {'$exists': True}, 'event_id': {'$exists': True}},
+                       {'$unset': {'protect_event_id': ''}})
+    return len(renames), len(duplicates)
+
+
+def to_canonical(doc, collection, owners):
+    """Return (license_plates document, raw payload) for a legacy document, or (None, reason)."""
+    plate = doc.get('license_plate_raw') or doc.get('license_plate')
+    if isinstance(plate, str) and _MASKED.match(plate):
+        return None, 'masked_plate'
+    plate = sanitize_plate(plate)
+    if not plate:
+        return None, 'no_plate'
+    timestamp = parse_timestamp(doc.get('timestamp')) or parse_timestamp(doc.get('created'))
+    if not timestamp:
+        return None, 'no_timestamp'
+
+    event_id = doc.get('event_id') or doc.get('protect_event_id')
+    canonical = {
+        'event_id': event_id or f"legacy:{collection}:{doc['_id']}",
+        'timestamp': timestamp,
+        'camera_id': doc.get('camera_id'),
+        'camera_name': doc.get('camera_name'),
+        'license_plate': plate,
+        # Both legacy producers stored Protect's value as-is, a 0-100 percentage
+        'confidence': normalize_confidence(doc.get('confidence')),
+        'detected_at': parse_timestamp(doc.get('detected_at')) or doc['_id'].generation_time.replace(tzinfo=None),
+        'origin': doc.get('origin') or collection,
+        'legacy_source': {'collection': collection, '_id': doc['_id']},
+    }
+    owner = owners.get(plate, UNKNOWN_OWNER)
+    canonical['user_email'] = owner['user_email']
+    canonical['user_name'] = owner['user_name']
+    canonical.update(plate_search_fields(plate))
+    canonical.update(vehicle_fields(doc))
+    canonical = {k: v for k, v in canonical.items() if v is not None}
+    raw = {f: doc[f] for f in RAW_FIELDS if doc.get(f) and doc[f] != '[REDACTED]'}
+    return canonical, raw
+
+
+def content_duplicates(plates, docs, window):
+    """Return the event_ids of id-less documents that license_plates already holds (same plate/camera, close in time)."""
+    synthetic = [d for d in docs if d['event_id'].startswith('legacy:')]
+    if not synthetic:
+        return set()
+    delta = timedelta(seconds=window)
+    stored = plates.find({
+        'plate_key': {'$in': list({d['plate_key'] for d in synthetic})},
+        'timestamp': {'$gte': min(d['timestamp'] for d in synthetic) - delta,
+                      '$lte': max(d['timestamp'] for d in synthetic) + delta},
+        'legacy_source': {'$exists': False},
+    }, {'plate_key': 1, 'camera_id': 1, 'timestamp': 1})
+    by_plate = {}
+    for s in stored:
+        by_plate.setdefault(s['plate_key'], []).append(s)
+    dupes = set()
+    for d in synthetic:
+        for s in by_plate.get(d['plate_key'], []):
+            same_camera = not d.get('camera_id') or not s.get('camera_id') or d['camera_id'] == s['camera_id']
+            if same_camera and abs(s['timestamp'] - d['timestamp']) <= delta:
+                dupes.add(d['event_id'])
+                break
+    return dupes
+
+
+def merge_collection(db, name, owners, args):
+    plates = db['license_plates']
+    state_id = f"{JOB_ID}:{name}"
+    state = {} if args.restart or args.dry_run else load_job_state(db, state_id)
+    counts = Counter(state.get('counts') or {})
+    last_id = state.get('last_id')
+    started = time.time()
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(db[name].find(query).sort('_id', 1).limit(args.batch_size))
+        if not docs:
+            break
+        mapped, raw_ops = [], []
+        for doc in docs:
+            counts['scanned'] += 1
+            canonical, raw = to_canonical(doc, name, owners)
+            if canonical is None:
+                counts['unparseable'] += 1
+                counts[f"unparseable:{raw}"] += 1
+                continue
+            mapped.append(canonical)
+            if raw:
+                stored = raw_document(canonical['event_id'], raw, canonical['origin'])
+                raw_ops.append(UpdateOne({'_id': stored['_id']},
+                                         {'$setOnInsert': {k: v for k, v in stored.items() if k != '_id'}}, upsert=True))
+        dupes = content_duplicates(plates, mapped, args.window)
+        counts['duplicate'] += len(dupes)
+        ops = [UpdateOne({'event_id': d['event_id']}, {'$setOnInsert': d}, upsert=True)
+               for d in mapped if d['event_id'] not in dupes]
+        if args.dry_run:
+            ids = [d['event_id'] for d in mapped if d['event_id'] not in dupes]
+            present = {p['event_id'] for p in plates.find({'event_id': {'$in': ids}}, {'event_id': 1})}
+            counts['duplicate'] += len(present)
+            counts['merged'] += len(ops) - len(present)
+        elif ops:
+            result = plates.bulk_write(ops, ordered=False)
+            counts['merged'] += result.upserted_count
+            counts['duplicate'] += result.matched_count
+            if raw_ops:
+                db[RAW_COLLECTION].bulk_write(raw_ops, ordered=False)
+        last_id = docs[-1]['_id']
+        if not args.dry_run:
+            save_job_state(db, state_id, {'last_id': last_id, 'counts': dict(counts), 'updated_at': datetime.utcnow()})
+        print(f"{name}: {counts['scanned']:,} scanned, {counts['merged']:,} merged, {counts['duplicate']:,} duplicate, "
+              f"{counts['unparseable']:,} unparseable ({counts['scanned'] / max(time.time() - started, 1e-6):.0f} docs/sec)")
+    return counts
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        plates = db['license_plates']
+        renamed, removed = unify_event_ids(plates, args.dry_run)
+        verb = 'would be' if args.dry_run else 'were'
+        print(f"🔑 license_plates: {renamed:,} protect_event_id keys {verb} renamed to event_id, "
+              f"{removed:,} duplicates {verb} removed")
+        if not args.dry_run:
+            # Upserts on event_id rely on its unique index (created by fast_lpr_capture.py)
+            if not any(spec['key'][0][0] == 'event_id' for spec in plates.index_information().values()):
+                plates.create_index('event_id', unique=True)
+            plates.create_index('legacy_source._id', sparse=True)
+
+        owners = load_plate_owners(db)
+        existing = set(db.list_collection_names())
+        results = {}
+        for name in LEGACY_COLLECTIONS:
+            if name not in existing:
+                print(f"{name}: not present")
+                continue
+            results[name] = merge_collection(db, name, owners, args)
+
+        print(f"\n✓ {'Dry run' if args.dry_run else 'Merge'} complete:")
+        for name, counts in results.items():
+            reasons = ', '.join(f"{k.split(':', 1)[1]}: {v:,}" for k, v in sorted(counts.items()) if k.startswith('unparseable:'))
+            indexes = ', '.join(db[name].index_information())
+            print(f"  {name}: {counts['scanned']:,} scanned, {counts['merged']:,} merged, "
+                  f"{counts['duplicate']:,} duplicate, {counts['unparseable']:,} unparseable"
+                  + (f" ({reasons})" if reasons else ''))
+            print(f"    indexes: {indexes}")
+            clean = counts['unparseable'] == 0 and counts['scanned'] == db[name].estimated_document_count()
+            if args.drop_legacy and not args.dry_run:
+                if clean:
+                    db.drop_collection(name)
+                    print(f"    🗑️  dropped {name} and its indexes")
+                else:
+                    print(f"    ⚠️  kept {name}: unparseable documents or documents added since the merge")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Normalize LPR detection timestamps to native BSON dates.
+
+Older producers stored `timestamp` and `detected_at` as ISO strings (and a few
+as epoch numbers). Mixed types force the dashboards to `$toDate` every document
+and keep range queries off the `timestamp` index. This migration walks the
+collection in `_id` order, converts every string/numeric `timestamp` and
+`detected_at` to a Date with unordered bulk writes, and checkpoints the last
+`_id` in `lpr_job_state` so an interrupted run resumes where it stopped.
+
+Usage:
+  python migrate_lpr_timestamps.py              # migrate (resumes from checkpoint)
+  python migrate_lpr_timestamps.py --restart    # ignore the checkpoint
+  python migrate_lpr_timestamps.py --dry-run    # count what would change
+  python migrate_lpr_timestamps.py --verify     # prove no non-Date timestamps remain
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import parse_timestamp, load_job_state, save_job_state
+
+FIELDS = ('timestamp', 'detected_at')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Convert string/numeric LPR timestamps to BSON dates')
+    p.add_argument('--collection', default='license_plates', help='Detections collection (default: license_plates)')
+    p.add_argument('--batch-size', type=int, default=1000, help='Documents per _id range / bulk_write')
+    p.add_argument('--restart', action='store_true', help='Start from the beginning instead of the checkpoint')
+    p.add_argument('--dry-run', action='store_true', help='Report conversions without writing')
+    p.add_argument('--verify', action='store_true', help='Only run the verification pass')
+    return p.parse_args()
+
+
+def not_a_date(field):
+    return {field: {'$exists': True, '$not': {'$type': 'date'}}}
+
+
+def migrate(db, coll, batch_size=1000, restart=False, dry_run=False):
+    job_id = f"migrate_lpr_timestamps:{coll.name}"
+    state = {} if restart else load_job_state(db, job_id)
+    last_id = state.get('last_id')
+    if last_id is not None:
+        print(f"Resuming after _id {last_id}")
+
+    needs_fix = {'$or': [not_a_date(f) for f in FIELDS]}
+    converted = 0
+    unparseable = 0
+    samples = []
+    scanned = 0
+    started = time.time()
+
+    while True:
+        query = dict(needs_fix)
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        docs = list(coll.find(query, {f: 1 for f in FIELDS}).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+
+        ops = []
+        for doc in docs:
+            update = {}
+            for field in FIELDS:
+                if field not in doc or isinstance(doc[field], datetime):
+                    continue
+                value = parse_timestamp(doc[field])
+                if value is None:
+                    unparseable += 1
+                    if len(samples) < 10:
+                        samples.append((doc['_id'], field, doc[field]))
+                    continue
+                update[field] = value
+            if update:
+                ops.append(UpdateOne({'_id': doc['_id']}, {'$set': update}))
+
+        if ops and not dry_run:
+            coll.bulk_write(ops, ordered=False)
+        converted += len(ops)
+        scanned += len(docs)
+        last_id = docs[-1]['_id']
+        if not dry_run:
+            save_job_state(db, job_id, {'last_id': last_id, 'updated_at': datetime.utcnow()})
+
+        elapsed = max(time.time() - started, 1e-6)
+        print(f"Progress: scanned={scanned} converted={converted} unparseable={unparseable} ({scanned / elapsed:.0f} docs/sec)")
+
+    if not dry_run:
+        save_job_state(db, job_id, {'completed_at': datetime.utcnow()})
+
+    print("\n--- Timestamp Migration Summary ---")
+    print(f"Documents {'to convert' if dry_run else 'converted'}: {converted}")
+    print(f"Unparseable values left as-is: {unparseable}")
+    for _id, field, value in samples:
+        print(f"  {_id} {field}={value!r}")
+
+
+def verify(coll):
+    """Return True when every present timestamp/detected_at is a BSON date."""
+    ok = True
+    print(f"\n--- Verification ({coll.name}) ---")
+    for field in FIELDS:
+        remaining = coll.count_documents(not_a_date(field))
+        print(f"{field}: {remaining} non-Date values")
+        ok = ok and remaining == 0
+    missing = coll.count_documents({'timestamp': {'$exists': False}})
+    if missing:
+        print(f"timestamp: {missing} documents have no timestamp at all")
+    print("OK: all timestamps are BSON dates" if ok else "FAILED: non-Date timestamps remain")
+    return ok
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+    coll = db[args.collection]
+
+    try:
+        if not args.verify:
+            migrate(db, coll, batch_size=args.batch_size, restart=args.restart, dry_run=args.dry_run)
+        ok = verify(coll)
+    finally:
+        client.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
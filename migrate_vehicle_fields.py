@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Derive normalized vehicle attribute fields on existing detections.
+
+Producers now store lowercase top-level `color`, `vehicle_type` and `group`
+(see `vehicle_fields` in LPR_Notifications/lpr_helpers.py) next to the raw
+`vehicle_data`, so `/api/lpr/search` can filter with indexed equality matches
+instead of case-insensitive regexes on nested paths. This script creates the
+`{field: 1, timestamp: -1}` indexes and streams `license_plates` in _id order,
+setting the fields from whichever shape each record was stored in. Progress is
+checkpointed in `lpr_job_state`, so an interrupted run resumes where it stopped.
+
+Usage:
+  python migrate_vehicle_fields.py              # create indexes + migrate (resumable)
+  python migrate_vehicle_fields.py --restart    # ignore the checkpoint
+  python migrate_vehicle_fields.py --dry-run    # count changes without writing
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import vehicle_fields, load_job_state, save_job_state
+
+JOB_ID = 'migrate_vehicle_fields'
+FIELDS = ('color', 'vehicle_type', 'group')
+PROJECTION = {'vehicle_data': 1, 'vehicle_color': 1, 'vehicle_type': 1, 'color': 1, 'group': 1}
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Fill color/vehicle_type/group on existing detections')
+    p.add_argument('--batch-size', type=int, default=2000)
+    p.add_argument('--restart', action='store_true', help='Start from the beginning instead of the checkpoint')
+    p.add_argument('--dry-run', action='store_true', help='Count documents that would change without writing')
+    return p.parse_args()
+
+
+def create_indexes(coll):
+    for field in FIELDS:
+        coll.create_index([(field, 1), ('timestamp', -1)])
+
+
+def migrate(db, batch_size=2000, restart=False, dry_run=False):
+    coll = db['license_plates']
+    if not dry_run:
+        create_indexes(coll)
+    last_id = None if restart or dry_run else load_job_state(db, JOB_ID).get('last_id')
+
+    scanned = updated = 0
+    counts = dict.fromkeys(FIELDS, 0)
+    started = time.time()
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(coll.find(query, PROJECTION).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        ops = []
+        for doc in docs:
+            fields = vehicle_fields(doc)
+            for field in fields:
+                counts[field] += 1
+            changed = {k: v for k, v in fields.items() if doc.get(k) != v}
+            if changed:
+                ops.append(UpdateOne({'_id': doc['_id']}, {'$set': changed}))
+        if ops and not dry_run:
+            coll.bulk_write(ops, ordered=False)
+        scanned += len(docs)
+        updated += len(ops)
+        last_id = docs[-1]['_id']
+        if not dry_run:
+            save_job_state(db, JOB_ID, {'last_id': last_id, 'updated_at': datetime.utcnow()})
+        print(f"Progress: scanned={scanned} updated={updated} ({scanned / max(time.time() - started, 1e-6):.0f} docs/sec)")
+
+    verb = 'would update' if dry_run else 'updated'
+    print(f"\n✓ Migration complete: {scanned} scanned, {updated} {verb}")
+    print('  ' + ', '.join(f"{field}: {n}" for field, n in counts.items()))
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+
+    try:
+        migrate(client[mongo_db], args.batch_size, args.restart, args.dry_run)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Notification dispatcher: send queued `notification_jobs` as e-mail.
+
+Producers (fast_lpr_capture.py for resident arrivals and watchlist hits,
+Mongo-Filter/monitor_write_errors.py for admins) queue one job per recipient
+with LPR_Notifications/lpr_notify.py. This service claims due jobs, and once a
+recipient's oldest pending job is --window seconds old folds everything
+pending for that recipient into one message, so a burst of events becomes one
+e-mail. Messages go out over a pool of --connections persistent SMTP
+connections (STARTTLS and login once per connection, not per message) behind
+a --rate messages/sec token bucket. Failed sends are retried with exponential
+backoff up to --max-attempts; refused recipients fail at once. Jobs claimed by
+a dispatcher that died are released after --lease seconds, so several
+dispatchers can share the queue.
+
+Every --report-seconds the sends/sec, jobs per message, queue latency (job
+created -> sent, p50/p95/max) and queue depth are logged and saved under
+`notification_dispatcher` in `lpr_job_state`.
+
+To try it without a real mail server, run a local SMTP sink
+(`pip install aiosmtpd && python -m aiosmtpd -n -l localhost:1025`) and start
+the dispatcher with EMAIL_HOST=localhost EMAIL_PORT=1025 and EMAIL_USER unset.
+
+Usage:
+  python notification_dispatcher.py                          # run continuously
+  python notification_dispatcher.py --once                   # send what is due, then exit
+  python notification_dispatcher.py test you@example.com -n 5  # queue 5 test notifications
+  python notification_dispatcher.py status                   # queue depth and recent failures
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timedelta
+from collections import defaultdict, deque
+from pymongo import MongoClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import save_job_state
+from LPR_Notifications.lpr_notify import (
+    NOTIFICATION_JOBS, PERMANENT_ERRORS, email_settings, notification_indexes, enqueue_notification, digest_message,
+    RateLimiter, SMTPPool,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+JOB_ID = 'notification_dispatcher'
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Send queued notification jobs over pooled SMTP connections')
+    p.add_argument('--window', type=float, default=float(os.getenv('NOTIFY_COALESCE_SECONDS', '60')),
+                   help='Seconds to collect further jobs for a recipient before sending')
+    p.add_argument('--connections', type=int, default=int(os.getenv('NOTIFY_SMTP_CONNECTIONS', '2')))
+    p.add_argument('--rate', type=float, default=float(os.getenv('NOTIFY_RATE_PER_SECOND', '5')),
+                   help='Messages per second across all connections (0 = unlimited)')
+    p.add_argument('--max-attempts', type=int, default=5)
+    p.add_argument('--backoff', type=float, default=30, help='First retry delay in seconds, doubling per attempt')
+    p.add_argument('--lease', type=float, default=300, help='Seconds before a claimed, unsent job is released')
+    p.add_argument('--batch-size', type=int, default=500, help='Due jobs read per poll')
+    p.add_argument('--poll', type=float, default=2, help='Seconds between queue polls')
+    p.add_argument('--report-seconds', type=float, default=60)
+    p.add_argument('--once', action='store_true', help='Send everything due now (ignoring --window), then exit')
+    sub = p.add_subparsers(dest='command')
+    t = sub.add_parser('test', help='Queue test notifications')
+    t.add_argument('recipient')
+    t.add_argument('-n', type=int, default=1)
+    sub.add_parser('status')
+    return p.parse_args()
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class Dispatcher:
+    def __init__(self, db, args):
+        self.db = db
+        self.jobs = db[NOTIFICATION_JOBS]
+        self.args = args
+        self.settings = email_settings()
+        self.pool = SMTPPool(self.settings, size=args.connections)
+        self.limiter = RateLimiter(args.rate)
+        self.claim_id = f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {'messages': 0, 'jobs_sent': 0, 'failed': 0, 'retried': 0}
+        self.latencies = deque(maxlen=10000)  # queue latency (s) of jobs sent since the last report
+        self.in_flight = set()
+        self.reported_at = datetime.utcnow()
+        self.reported = dict(self.stats)
+
+    def release_stale(self, now):
+        released = self.jobs.update_many(
+            {'status': 'sending', 'claimed_at': {'$lt': now - timedelta(seconds=self.args.lease)}},
+            {'$set': {'status': 'pending'}, '$unset': {'claim': '', 'claimed_at': ''}}).modified_count
+        if released:
+            logger.warning(f"↻ Released {released} jobs left claimed by a stopped dispatcher")
+
+    def claim_due(self, now, flush=False, max_recipients=None):
+        """Claim the pending jobs of recipients whose oldest due job has waited out the window."""
+        due = list(self.jobs.find({'status': 'pending', 'next_attempt_at': {'$lte': now}},
+                                  {'recipient': 1, 'created_at': 1})
+                   .sort('next_attempt_at', 1).limit(self.args.batch_size))
+        by_recipient = defaultdict(list)
+        for job in due:
+            by_recipient[job['recipient']].append(job)
+        ready_before = now - timedelta(seconds=0 if flush else self.args.window)
+        ready = [jobs for jobs in by_recipient.values() if min(j['created_at'] for j in jobs) <= ready_before]
+        ids = [j['_id'] for jobs in ready[:max_recipients] for j in jobs]
+        if not ids:
+            return {}
+        claim = f"{self.claim_id}:{uuid.uuid4().hex[:8]}"
+        self.jobs.update_many({'_id': {'$in': ids}, 'status': 'pending'},
+                              {'$set': {'status': 'sending', 'claim': claim, 'claimed_at': now}})
+        claimed = defaultdict(list)
+        for job in self.jobs.find({'claim': claim}).sort('created_at', 1):
+            claimed[job['recipient']].append(job)
+        return claimed
+
+    async def deliver(self, recipient, jobs):
+        ids = [j['_id'] for j in jobs]
+        try:
+            await self.limiter.acquire()
+            await self.pool.send(digest_message(recipient, jobs, self.settings['sender']))
+        except Exception as e:
+            await asyncio.to_thread(self.record_failure, recipient, jobs, e)
+            return
+        now = datetime.utcnow()
+        await asyncio.to_thread(self.jobs.update_many, {'_id': {'$in': ids}},
+                                {'$set': {'status': 'sent', 'sent_at': now, 'batch_size': len(jobs)},
+                                 '$unset': {'claim': '', 'last_error': ''}})
+        self.stats['messages'] += 1
+        self.stats['jobs_sent'] += len(jobs)
+        self.latencies.extend((now - j['created_at']).total_seconds() for j in jobs)
+
+    def record_failure(self, recipient, jobs, error):
+        now = datetime.utcnow()
+        permanent = isinstance(error, PERMANENT_ERRORS)
+        for job in jobs:
+            attempts = job.get('attempts', 0) + 1
+            fields = {'attempts': attempts, 'last_error': f"{type(error).__name__}: {error}"[:500]}
+            if permanent or attempts >= self.args.max_attempts:
+                fields['status'] = 'failed'
+                self.stats['failed'] += 1
+            else:
+                fields['status'] = 'pending'
+                fields['next_attempt_at'] = now + timedelta(seconds=self.args.backoff * 2 ** (attempts - 1))
+                self.stats['retried'] += 1
+            self.jobs.update_one({'_id': job['_id']}, {'$set': fields, '$unset': {'claim': '', 'claimed_at': ''}})
+        logger.warning(f"✗ Send to {recipient} failed ({len(jobs)} jobs, "
+                       f"{'permanent' if permanent else 'will retry'}): {error}")
+
+    def report(self, now):
+        elapsed = max((now - self.reported_at).total_seconds(), 1e-6)
+        sent = self.stats['messages'] - self.reported['messages']
+        latencies = list(self.latencies)
+        self.latencies.clear()
+        summary = {
+            **self.stats,
+            'sends_per_sec': round(sent / elapsed, 3),
+            'jobs_per_message': round(self.stats['jobs_sent'] / self.stats['messages'], 2) if self.stats['messages'] else 0,
+            'queue_latency_p50': round(percentile(latencies, 50), 2),
+            'queue_latency_p95': round(percentile(latencies, 95), 2),
+            'queue_latency_max': round(max(latencies, default=0.0), 2),
+            'pending': self.jobs.count_documents({'status': 'pending'}),
+            'smtp': dict(self.pool.stats),
+            'updated_at': now,
+        }
+        save_job_state(self.db, JOB_ID, summary)
+        logger.info(f"📨 {sent} messages in {elapsed:.0f}s ({summary['sends_per_sec']:.2f}/s), "
+                    f"{summary['jobs_per_message']} jobs/message | queue latency p50 {summary['queue_latency_p50']:.1f}s, "
+                    f"p95 {summary['queue_latency_p95']:.1f}s, max {summary['queue_latency_max']:.1f}s | "
+                    f"{summary['pending']} pending | {summary['smtp']['connects']} SMTP logins for "
+                    f"{summary['smtp']['sends']} sends")
+        self.reported_at, self.reported = now, dict(self.stats)
+        return summary
+
+    async def poll(self, flush=False):
+        """Claim due jobs and start their sends; returns the number of messages started."""
+        # Claim no more than the pool can send well within the lease
+        room = self.args.connections * 10 - len(self.in_flight)
+        if room <= 0:
+            return 0
+        now = datetime.utcnow()
+        await asyncio.to_thread(self.release_stale, now)
+        claimed = await asyncio.to_thread(self.claim_due, now, flush, room)
+        for recipient, jobs in claimed.items():
+            task = asyncio.create_task(self.deliver(recipient, jobs))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+        return len(claimed)
+
+    async def run(self):
+        if not self.settings['host'] or not self.settings['sender']:
+            logger.error('EMAIL_HOST and EMAIL_FROM (or EMAIL_USER) must be set. See .env.example')
+            return
+        await asyncio.to_thread(notification_indexes, self.db)
+        logger.info(f"📬 Dispatching {NOTIFICATION_JOBS} via {self.settings['host']}:{self.settings['port']} "
+                    f"({self.args.connections} connections, {self.args.rate:g} msg/s, {self.args.window:g}s window)")
+        try:
+            while True:
+                started = await self.poll(flush=self.args.once)
+                if self.args.once and not started:
+                    await asyncio.gather(*self.in_flight)
+                    if not await self.poll(flush=True):
+                        break
+                now = datetime.utcnow()
+                if (now - self.reported_at).total_seconds() >= self.args.report_seconds:
+                    await asyncio.to_thread(self.report, now)
+                if not self.args.once:
+                    await asyncio.sleep(self.args.poll)
+        finally:
+            if self.in_flight:
+                await asyncio.gather(*self.in_flight, return_exceptions=True)
+            await self.pool.close()
+            self.report(datetime.utcnow())
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        if args.command == 'test':
+            for i in range(args.n):
+                enqueue_notification(db, [args.recipient], f"Test notification {i + 1}",
+                                     f"Test notification {i + 1} of {args.n} from notification_dispatcher.py",
+                                     kind='test', event_time=datetime.utcnow())
+            print(f"✓ Queued {args.n} test notifications for {args.recipient}")
+        elif args.command == 'status':
+            jobs = db[NOTIFICATION_JOBS]
+            counts = {s: jobs.count_documents({'status': s}) for s in ('pending', 'sending', 'sent', 'failed')}
+            print('📬 ' + ', '.join(f"{n:,} {s}" for s, n in counts.items()))
+            oldest = jobs.find_one({'status': 'pending'}, sort=[('created_at', 1)])
+            if oldest:
+                print(f"  oldest pending: {oldest['created_at']} ({oldest['recipient']}, {oldest['kind']})")
+            for job in jobs.find({'status': 'failed'}).sort('created_at', -1).limit(10):
+                print(f"  ✗ {job['created_at']:%Y-%m-%d %H:%M} {job['recipient']}: {job['subject']} - {job.get('last_error')}")
+        else:
+            try:
+                asyncio.run(Dispatcher(db, args).run())
+            except KeyboardInterrupt:
+                logger.info("\n⚠️  Stopped")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Move raw Protect payloads out of detection documents into the `event_raw` side store.
+
+Older detections carry the whole event `metadata` (lpr_event_capture.py) or the
+stringified websocket message (`raw_message` plus one string per message
+attribute, lpr_websocket_listener.py). This script streams `license_plates` and
+`license_plate_detections` in _id order, writes those fields zstd/zlib
+compressed to `event_raw` keyed by event id (see
+LPR_Notifications/lpr_event_raw.py) and unsets them on the detection. Progress
+and byte counts are checkpointed per collection in `lpr_job_state`, so an
+interrupted run resumes where it stopped.
+
+Usage:
+  python offload_event_raw.py                 # offload (resumable)
+  python offload_event_raw.py --dry-run       # measure savings without writing
+  python offload_event_raw.py --report        # bytes stored in event_raw by source
+  python offload_event_raw.py --show EVENT_ID # print a stored payload
+"""
+
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+from bson import BSON, ObjectId
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import load_job_state, save_job_state
+from LPR_Notifications.lpr_event_raw import RAW_COLLECTION, raw_document, load_event_raw
+
+JOB_ID = 'offload_event_raw'
+COLLECTIONS = ('license_plates', 'license_plate_detections')
+# metadata: lpr_event_capture.py; the rest: str() of websocket message attributes
+RAW_FIELDS = ('metadata', 'raw_message', 'new_obj', 'old_obj', 'changed_data', 'action_frame', 'data_frame')
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Offload raw event payloads to the event_raw side store')
+    p.add_argument('--batch-size', type=int, default=1000)
+    p.add_argument('--restart', action='store_true', help='Start from the beginning instead of the checkpoint')
+    p.add_argument('--dry-run', action='store_true', help='Measure savings without writing')
+    p.add_argument('--report', action='store_true', help='Summarize event_raw and exit')
+    p.add_argument('--show', metavar='EVENT_ID', help='Print the stored payload for an event id and exit')
+    return p.parse_args()
+
+
+def raw_key(doc):
+    return doc.get('event_id') or doc.get('protect_event_id') or doc['_id']
+
+
+def offload_collection(db, name, batch_size, restart, dry_run):
+    coll = db[name]
+    raw = db[RAW_COLLECTION]
+    state = {} if restart or dry_run else load_job_state(db, f"{JOB_ID}:{name}")
+    last_id = state.get('last_id')
+    totals = {k: state.get(k, 0) for k in ('moved', 'hot_before', 'hot_after', 'raw_bytes', 'stored_bytes')}
+
+    query_fields = {'$or': [{f: {'$exists': True}} for f in RAW_FIELDS]}
+    started = time.time()
+    while True:
+        query = dict(query_fields)
+        if last_id is not None:
+            query['_id'] = {'$gt': last_id}
+        docs = list(coll.find(query).sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        hot_ops, raw_ops = [], []
+        for doc in docs:
+            payload = {f: doc[f] for f in RAW_FIELDS if f in doc}
+            trimmed = {k: v for k, v in doc.items() if k not in payload}
+            stored = raw_document(raw_key(doc), payload, doc.get('origin') or name)
+            totals['moved'] += 1
+            totals['hot_before'] += len(BSON.encode(doc))
+            totals['hot_after'] += len(BSON.encode(trimmed))
+            totals['raw_bytes'] += stored['raw_bytes']
+            totals['stored_bytes'] += stored['stored_bytes']
+            fields = {k: v for k, v in stored.items() if k != '_id'}
+            raw_ops.append(UpdateOne({'_id': stored['_id']}, {'$setOnInsert': fields}, upsert=True))
+            hot_ops.append(UpdateOne({'_id': doc['_id']}, {'$unset': dict.fromkeys(payload, '')}))
+        if not dry_run:
+            # Side store first: a crash in between leaves the payload in both places, never in neither
+            raw.bulk_write(raw_ops, ordered=False)
+            coll.bulk_write(hot_ops, ordered=False)
+        last_id = docs[-1]['_id']
+        if not dry_run:
+            save_job_state(db, f"{JOB_ID}:{name}", {'last_id': last_id, **totals, 'updated_at': datetime.utcnow()})
+        print(f"{name}: {totals['moved']} offloaded ({totals['moved'] / max(time.time() - started, 1e-6):.0f} docs/sec)")
+    return totals
+
+
+def print_savings(name, t):
+    if not t['moved']:
+        print(f"  {name}: nothing to offload")
+        return
+    saved = t['hot_before'] - t['hot_after']
+    print(f"  {name}: {t['moved']:,} documents, hot {t['hot_before'] / t['moved']:,.0f} -> "
+          f"{t['hot_after'] / t['moved']:,.0f} bytes/doc ({saved / 1e6:,.1f} MB removed); "
+          f"raw {t['raw_bytes'] / 1e6:,.1f} MB stored as {t['stored_bytes'] / 1e6:,.1f} MB "
+          f"({t['raw_bytes'] / max(t['stored_bytes'], 1):.1f}x)")
+
+
+def report(db):
+    rows = list(db[RAW_COLLECTION].aggregate([
+        {'$group': {'_id': {'source': '$source', 'codec': '$codec'}, 'count': {'$sum': 1},
+                    'raw': {'$sum': '$raw_bytes'}, 'stored': {'$sum': '$stored_bytes'}}},
+        {'$sort': {'count': -1}},
+    ]))
+    if not rows:
+        print(f"{RAW_COLLECTION} is empty")
+        return
+    print(f"{'source':<24}{'codec':<8}{'events':>10}{'raw MB':>12}{'stored MB':>12}{'ratio':>8}")
+    for row in rows:
+        print(f"{row['_id']['source']:<24}{row['_id']['codec']:<8}{row['count']:>10,}"
+              f"{row['raw'] / 1e6:>12,.2f}{row['stored'] / 1e6:>12,.2f}{row['raw'] / max(row['stored'], 1):>7.1f}x")
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        if args.show:
+            key = args.show
+            # Payloads without an event id are keyed by the detection's ObjectId
+            if not db[RAW_COLLECTION].find_one({'_id': key}, {'_id': 1}) and ObjectId.is_valid(key):
+                key = ObjectId(key)
+            payload = load_event_raw(db, key)
+            print(json.dumps(payload, indent=2, default=str) if payload is not None else f"No payload stored for {args.show}")
+            return
+        if args.report:
+            report(db)
+            return
+
+        results = {name: offload_collection(db, name, args.batch_size, args.restart, args.dry_run) for name in COLLECTIONS}
+        print(f"\n✓ {'Dry run' if args.dry_run else 'Offload'} complete:")
+        for name, totals in results.items():
+            print_savings(name, totals)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+N-gram plate index for partial-plate search.
+
+Producers store `plate_key` (the sanitized plate without hyphens) and
+`plate_ngrams` (its distinct 3-grams) on every detection; the multikey index on
+`plate_ngrams` lets a search for "7KX" or "212" intersect the query's n-grams
+instead of running an unanchored regex over every document. The `migrate`
+command creates the indexes and streams existing `license_plates` documents in
+_id order, filling in the fields with checkpoints in lpr_job_state. The `bench`
+command compares the regex scan against the n-gram search on synthetic data.
+
+Usage:
+  python plate_ngram_index.py migrate                  # create indexes + populate (resumable)
+  python plate_ngram_index.py migrate --restart        # ignore the checkpoint
+  python plate_ngram_index.py bench --count 1000000    # regex vs n-gram latency
+"""
+
+import os
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import (
+    plate_key, plate_search_fields, plate_search_filter, load_job_state, save_job_state,
+)
+from LPR_Notifications.lpr_synthetic import generate_detections, plate_pool
+
+JOB_ID = 'plate_ngram_migrate'
+SEARCH_INDEXES = ['plate_key', 'plate_ngrams']
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Populate and benchmark the plate n-gram index')
+    sub = p.add_subparsers(dest='command', required=True)
+
+    m = sub.add_parser('migrate', help='Create indexes and fill plate_key/plate_ngrams on license_plates')
+    m.add_argument('--batch-size', type=int, default=2000)
+    m.add_argument('--restart', action='store_true', help='Start from the beginning instead of the checkpoint')
+
+    b = sub.add_parser('bench', help='Compare regex and n-gram partial-plate search')
+    b.add_argument('--count', type=int, default=1000000, help='Synthetic detections to load')
+    b.add_argument('--plates', type=int, default=50000, help='Distinct plates in the synthetic pool')
+    b.add_argument('--queries', type=int, default=20, help='Partial plates to search per length')
+    b.add_argument('--batch-size', type=int, default=10000)
+    b.add_argument('--keep', action='store_true', help='Keep the scratch collection')
+    return p.parse_args()
+
+
+def migrate(db, batch_size=2000, restart=False):
+    """Fill plate_key/plate_ngrams in _id order; documents already up to date are not rewritten."""
+    coll = db['license_plates']
+    for field in SEARCH_INDEXES:
+        coll.create_index(field)
+    last_id = None if restart else load_job_state(db, JOB_ID).get('last_id')
+
+    scanned = updated = 0
+    started = time.time()
+    while True:
+        query = {'_id': {'$gt': last_id}} if last_id is not None else {}
+        docs = list(coll.find(query, {'license_plate': 1, 'plate_key': 1, 'plate_ngrams': 1})
+                    .sort('_id', 1).limit(batch_size))
+        if not docs:
+            break
+        ops = []
+        for doc in docs:
+            fields = plate_search_fields(doc.get('license_plate'))
+            if doc.get('plate_key') != fields['plate_key'] or doc.get('plate_ngrams') != fields['plate_ngrams']:
+                ops.append(UpdateOne({'_id': doc['_id']}, {'$set': fields}))
+        if ops:
+            coll.bulk_write(ops, ordered=False)
+        scanned += len(docs)
+        updated += len(ops)
+        last_id = docs[-1]['_id']
+        save_job_state(db, JOB_ID, {'last_id': last_id, 'updated_at': datetime.utcnow()})
+        print(f"Progress: scanned={scanned} updated={updated} ({scanned / max(time.time() - started, 1e-6):.0f} docs/sec)")
+
+    print(f"\n✓ Migration complete: {scanned} scanned, {updated} updated")
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def sample_queries(pool, length, count, rng):
+    """Return `count` substrings of `length` characters taken from random pool plates."""
+    queries = []
+    for plate in rng.sample(pool, count):
+        start = rng.randrange(len(plate) - length + 1)
+        queries.append(plate[start:start + length])
+    return queries
+
+
+def search(coll, flt):
+    """What /api/lpr/search runs: the newest page plus the total match count."""
+    page = list(coll.find(flt).sort('timestamp', -1).limit(100))
+    return len(page), coll.count_documents(flt)
+
+
+def bench(db, args):
+    coll = db['bench_plate_ngrams']
+    coll.drop()
+    for field in ['license_plate', 'timestamp'] + SEARCH_INDEXES:
+        coll.create_index(field)
+
+    print(f"Loading {args.count:,} detections ({args.plates:,} plate pool)...")
+    batch = []
+    t0 = time.perf_counter()
+    for doc in generate_detections(args.count, plates=args.plates):
+        doc.update(plate_search_fields(doc['license_plate']))
+        batch.append(doc)
+        if len(batch) >= args.batch_size:
+            coll.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        coll.insert_many(batch, ordered=False)
+    print(f"Loaded in {time.perf_counter() - t0:.1f}s")
+
+    rng = random.Random(7)
+    pool = [plate_key(p) for p in plate_pool(args.plates)]
+    print(f"\n{'query':<8}{'method':<10}{'median ms':>12}{'max ms':>10}{'matches':>10}{'docs examined':>16}")
+    for length in (2, 3, 4, 5):
+        queries = sample_queries(pool, length, args.queries, rng)
+        for method, make_filter in (
+            ('regex', lambda q: {'license_plate': {'$regex': q, '$options': 'i'}}),
+            ('ngram', plate_search_filter),
+        ):
+            runs, matches, examined = [], [], []
+            for q in queries:
+                flt = make_filter(q)
+                (_, total), ms = timed(lambda: search(coll, flt))
+                runs.append(ms)
+                matches.append(total)
+                stats = coll.find(flt).explain().get('executionStats', {})
+                examined.append(stats.get('totalDocsExamined', 0))
+            print(f"{length:<8}{method:<10}{statistics.median(runs):>12.1f}{max(runs):>10.1f}"
+                  f"{statistics.median(matches):>10.0f}{statistics.median(examined):>16.0f}")
+
+    if not args.keep:
+        coll.drop()
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        if args.command == 'migrate':
+            migrate(db, args.batch_size, args.restart)
+        else:
+            bench(db, args)
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
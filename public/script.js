@@ -3,6 +3,27 @@
 
 let currentVisitor = null;
 
+// Plates are stored uppercase without spaces/punctuation (same as the server)
+function normalizePlate(plate) {
+    return String(plate || '').trim().toUpperCase().replace(/[^A-Z0-9-]/g, '');
+}
+
+// Batch lookup of last seen / 24h / 7d / 30d counts: { PLATE: { lastSeen, count24h, ... } }
+// The server takes at most 500 plates per request
+async function fetchPlateActivity(plates) {
+    const unique = [...new Set(plates.map(normalizePlate).filter(p => p.length >= 2))];
+    const result = {};
+    for (let i = 0; i < unique.length; i += 500) {
+        const response = await fetch('/api/plate-activity', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ plates: unique.slice(i, i + 500) })
+        });
+        if (!response.ok) throw new Error(`plate activity request failed (${response.status})`);
+        Object.assign(result, (await response.json()).plates || {});
+    }
+    return result;
+}
 
 window.openEditVisitorModal = async function(visitorId) {
     console.log('Opening edit modal for visitor:', visitorId);
@@ -37,13 +58,11 @@ window.openEditVisitorModal = async function(visitorId) {
         let plateLastSeenMap = {};
         if (window._showLprData !== false) {
             try {
-                const response = await fetch(`/api/visitor-last-seen/${visitor.id}`);
-                if (response.ok) {
-                    const data = await response.json();
-                    data.plateDetails.forEach(pd => {
-                        plateLastSeenMap[pd.plate] = pd.lastSeen;
-                    });
-                }
+                const credentials = (visitor.license_plates || []).map(p => p.credential);
+                const activity = await fetchPlateActivity(credentials);
+                credentials.forEach(plate => {
+                    plateLastSeenMap[plate] = activity[normalizePlate(plate)]?.lastSeen || null;
+                });
             } catch (error) {
                 console.error('Error fetching plate last seen:', error);
             }
@@ -115,20 +134,18 @@ window.deletePlateFromModal = async function(visitorId, plate) {
             currentVisitor = await updatedResponse.json();
             
             // Fetch last seen data for plates
+            const visitor2 = currentVisitor.data || currentVisitor;
             let plateLastSeenMap = {};
             try {
-                const lastSeenResponse = await fetch(`/api/visitor-last-seen/${visitorId}`);
-                if (lastSeenResponse.ok) {
-                    const data = await lastSeenResponse.json();
-                    data.plateDetails.forEach(pd => {
-                        plateLastSeenMap[pd.plate] = pd.lastSeen;
-                    });
-                }
+                const credentials = (visitor2.license_plates || []).map(p => p.credential);
+                const activity = await fetchPlateActivity(credentials);
+                credentials.forEach(plate => {
+                    plateLastSeenMap[plate] = activity[normalizePlate(plate)]?.lastSeen || null;
+                });
             } catch (error) {
                 console.error('Error fetching plate last seen:', error);
             }
             
-            const visitor2 = currentVisitor.data || currentVisitor;
             const platesContainer = document.getElementById('editVisitorPlates');
             platesContainer.innerHTML = '';
             if (visitor2.license_plates && visitor2.license_plates.length > 0) {
@@ -553,6 +570,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         
         // Create body
         const tbody = document.createElement('tbody');
+        const lprCells = {};
         
         plates.forEach(plate => {
             const row = document.createElement('tr');
@@ -626,63 +644,43 @@ document.addEventListener('DOMContentLoaded', async () => {
             
             tbody.appendChild(row);
             
-            if (!showLpr) return; // Skip fetching LPR counts/last-seen when disabled
-            
-            // Fetch last seen
-            fetch(`/api/license-plate-last-seen/${plate.plate}`)
-                .then(response => response.ok ? response.json() : null)
-                .then(data => {
-                    if (data && data.lastSeen) {
-                        const lastSeenDate = new Date(data.lastSeen);
-                        const formattedDate = lastSeenDate.toLocaleDateString('en-US', { 
-                            year: 'numeric', month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit'
-                        });
-                        lastSeenCell.textContent = formattedDate;
-                    } else {
-                        lastSeenCell.textContent = 'Never';
-                    }
-                })
-                .catch(error => {
-                    console.error('Error fetching last seen:', error);
-                    lastSeenCell.textContent = 'Unknown';
-                });
-            
-            // Fetch 24h count
-            fetch(`/api/license-plate-24hour-count/${plate.plate}`)
-                .then(response => response.ok ? response.json() : null)
-                .then(data => {
-                    count24hCell.textContent = data ? data.count : '0';
-                })
-                .catch(error => {
-                    console.error('Error fetching 24h count:', error);
-                    count24hCell.textContent = 'Unknown';
-                });
-            
-            // Fetch 7-day count
-            fetch(`/api/license-plate-7day-count/${plate.plate}`)
-                .then(response => response.ok ? response.json() : null)
-                .then(data => {
-                    count7dCell.textContent = data ? data.count : '0';
-                })
-                .catch(error => {
-                    console.error('Error fetching 7-day count:', error);
-                    count7dCell.textContent = 'Unknown';
-                });
-            
-            // Fetch 30-day count
-            fetch(`/api/license-plate-30day-count/${plate.plate}`)
-                .then(response => response.ok ? response.json() : null)
-                .then(data => {
-                    count30dCell.textContent = data ? data.count : '0';
-                })
-                .catch(error => {
-                    console.error('Error fetching 30-day count:', error);
-                    count30dCell.textContent = 'Unknown';
-                });
+            if (showLpr) {
+                lprCells[plate.plate] = { lastSeenCell, count24hCell, count7dCell, count30dCell };
+            }
         });
         
         table.appendChild(tbody);
         licensePlatesList.appendChild(table);
+
+        // Last seen and detection counts for every plate in one request
+        if (showLpr) {
+            fetchPlateActivity(Object.keys(lprCells))
+                .then(activity => {
+                    Object.entries(lprCells).forEach(([plate, cells]) => {
+                        const data = activity[normalizePlate(plate)];
+                        if (data && data.lastSeen) {
+                            const lastSeenDate = new Date(data.lastSeen);
+                            cells.lastSeenCell.textContent = lastSeenDate.toLocaleDateString('en-US', { 
+                                year: 'numeric', month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit'
+                            });
+                        } else {
+                            cells.lastSeenCell.textContent = 'Never';
+                        }
+                        cells.count24hCell.textContent = data ? data.count24h : '0';
+                        cells.count7dCell.textContent = data ? data.count7d : '0';
+                        cells.count30dCell.textContent = data ? data.count30d : '0';
+                    });
+                })
+                .catch(error => {
+                    console.error('Error fetching plate activity:', error);
+                    Object.values(lprCells).forEach(cells => {
+                        cells.lastSeenCell.textContent = 'Unknown';
+                        cells.count24hCell.textContent = 'Unknown';
+                        cells.count7dCell.textContent = 'Unknown';
+                        cells.count30dCell.textContent = 'Unknown';
+                    });
+                });
+        }
     }
 
     function createLicensePlateListItem(plate, selectedUserEmail) {
@@ -1087,6 +1085,7 @@ document.addEventListener('DOMContentLoaded', async () => {
     // Visitor caching
     let visitorCache = null;
     let visitorCacheTime = null;
+    let lastSeenCache = {};
     const VISITOR_CACHE_DURATION = 5 * 60 * 1000; // 5 minutes in milliseconds
     let visitorRefreshInterval = null;
 
@@ -1148,6 +1147,10 @@ document.addEventListener('DOMContentLoaded', async () => {
             
             visitorsList.appendChild(container);
             hideLoading();
+
+            if (window._showLprData !== false) {
+                fillVisitorLastSeen(visitors);
+            }
         }
         
         // Start background refresh if not already running
@@ -1156,6 +1159,35 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     }
 
+    // Last seen for every visitor card from one plate-activity request
+    async function fillVisitorLastSeen(visitors) {
+        const pending = visitors.filter(v => !lastSeenCache[v.id]);
+        const plates = pending.flatMap(v => (v.license_plates || []).map(p => p.credential));
+        try {
+            const activity = await fetchPlateActivity(plates);
+            pending.forEach(visitor => {
+                const lastSeen = (visitor.license_plates || [])
+                    .map(p => activity[normalizePlate(p.credential)]?.lastSeen)
+                    .filter(Boolean)
+                    .sort()
+                    .pop() || null;
+                lastSeenCache[visitor.id] = { lastSeen };
+                const el = document.getElementById(`visitor-last-seen-${visitor.id}`);
+                if (!el) return;
+                if (lastSeen) {
+                    const formattedDate = new Date(lastSeen).toLocaleDateString('en-US', { 
+                        year: 'numeric', month: 'short', day: 'numeric', hour: '2-digit', minute: '2-digit'
+                    });
+                    el.innerHTML = `<strong>${formattedDate}</strong>`;
+                } else {
+                    el.innerHTML = '<span class="text-muted">No detections</span>';
+                }
+            });
+        } catch (error) {
+            console.error('Error fetching visitor last seen:', error);
+        }
+    }
+
     // Synchronous version of card creation (no async calls)
     function createVisitorCardSync(visitor) {
         const col = document.createElement('div');
@@ -1228,7 +1260,7 @@ document.addEventListener('DOMContentLoaded', async () => {
                     <small class="text-muted d-block">Access: ${startDate} to ${endDate}</small>
                 </div>
                 <div class="mb-3">
-                    <small class="text-muted d-block"><strong>Last Seen:</strong> ${lastSeenHTML}</small>
+                    <small class="text-muted d-block"><strong>Last Seen:</strong> <span id="visitor-last-seen-${visitor.id}">${lastSeenHTML}</span></small>
                 </div>
                 <div class="mb-3">
                     <small><strong>License Plates:</strong></small>
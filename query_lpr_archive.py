@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Search LPR detections across MongoDB and the cold archive.
+
+Hot detections come from MongoDB; archived ones from the day partitions written
+by archive_lpr_detections.py. Partitions are pruned with the manifest before
+any file is opened: by date against the time range, by plate against each
+file's min/max plate, and by camera against the cameras it contains.
+
+Usage:
+  python query_lpr_archive.py --plate ABC123                       # all time, both tiers
+  python query_lpr_archive.py --plate ABC123 --start 2024-01-01 --end 2024-02-01
+  python query_lpr_archive.py --camera "LPR Camera Left" --start 2024-03-01 --source archive
+  python query_lpr_archive.py --plate ABC123 --json                # extended JSON output
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from pymongo import MongoClient
+from bson import json_util
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_archive import archive_dir, load_manifest, prune_partitions, read_partition
+from LPR_Notifications.lpr_helpers import sanitize_plate, parse_timestamp
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Search LPR detections in MongoDB and the archive')
+    p.add_argument('--plate', help='Exact plate (normalized like producers do)')
+    p.add_argument('--camera', help='Camera id or name')
+    p.add_argument('--start', help='Start time (ISO date/datetime, UTC)')
+    p.add_argument('--end', help='End time, exclusive (ISO date/datetime, UTC)')
+    p.add_argument('--source', choices=['both', 'mongo', 'archive'], default='both')
+    p.add_argument('--collection', default='license_plates')
+    p.add_argument('--archive-dir', default=None, help='Archive root (default: LPR_ARCHIVE_DIR or ./lpr_archive)')
+    p.add_argument('--limit', type=int, default=100, help='Maximum results printed (0 = all)')
+    p.add_argument('--json', action='store_true', help='Print matches as extended JSON lines')
+    return p.parse_args()
+
+
+def search_mongo(coll, plate, camera, start, end):
+    query = {}
+    if plate:
+        query['license_plate'] = plate
+    if camera:
+        query['$or'] = [{'camera_id': camera}, {'camera_name': camera}]
+    if start or end:
+        query['timestamp'] = {}
+        if start:
+            query['timestamp']['$gte'] = start
+        if end:
+            query['timestamp']['$lt'] = end
+    return list(coll.find(query))
+
+
+def search_archive(root, plate, camera, start, end):
+    manifest = load_manifest(root)
+    candidates = prune_partitions(manifest['partitions'], plate, camera, start, end)
+    results = {}
+    for entry in candidates:
+        for doc in read_partition(os.path.join(root, entry['file']), entry['format'], plate, camera, start, end):
+            # A document can be in several parts (re-archived after a change, older --keep runs);
+            # parts are listed in write order, so the last copy is the newest
+            results[doc['_id']] = doc
+    return list(results.values()), len(candidates), len(manifest['partitions'])
+
+
+def main():
+    args = parse_args()
+    plate = sanitize_plate(args.plate) if args.plate else None
+    start = parse_timestamp(args.start) if args.start else None
+    end = parse_timestamp(args.end) if args.end else None
+    if (args.start and start is None) or (args.end and end is None):
+        print('Error: --start/--end must be ISO dates, e.g. 2024-01-31 or 2024-01-31T08:00:00')
+        sys.exit(1)
+
+    matches = []
+    seen = set()
+    t0 = time.perf_counter()
+
+    if args.source in ('both', 'mongo'):
+        mongo_url = os.getenv('MONGO_URL')
+        mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+        if mongo_url:
+            client = MongoClient(mongo_url)
+        else:
+            mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+            mongo_port = os.getenv('MONGODB_PORT', '27017')
+            client = MongoClient(f"{mongo_host}:{mongo_port}")
+        try:
+            for doc in search_mongo(client[mongo_db][args.collection], plate, args.camera, start, end):
+                seen.add(doc['_id'])
+                matches.append(('mongo', doc))
+        finally:
+            client.close()
+
+    if args.source in ('both', 'archive'):
+        root = os.path.join(args.archive_dir or archive_dir(), args.collection)
+        docs, scanned, total = search_archive(root, plate, args.camera, start, end)
+        print(f"Archive: scanned {scanned} of {total} partitions")
+        # A partition whose delete has not finished yet still has its docs in Mongo
+        matches.extend(('archive', doc) for doc in docs if doc['_id'] not in seen)
+
+    # Detections not yet converted by migrate_lpr_timestamps.py still have string timestamps
+    matches.sort(key=lambda m: parse_timestamp(m[1].get('timestamp')) or datetime.min, reverse=True)
+    elapsed = (time.perf_counter() - t0) * 1000
+    shown = matches[:args.limit] if args.limit else matches
+
+    for source, doc in shown:
+        if args.json:
+            print(json_util.dumps(doc))
+        else:
+            print(f"{doc.get('timestamp')}  {doc.get('license_plate', ''):<10} {doc.get('camera_name', doc.get('camera_id', '')):<18} "
+                  f"{doc.get('user_email', 'unknown'):<30} [{source}]")
+    print(f"\n{len(matches)} detections ({sum(1 for s, _ in matches if s == 'archive')} archived) in {elapsed:.0f} ms"
+          + (f", showing {len(shown)}" if len(shown) < len(matches) else ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Rebuild the `plate_activity` summaries from `license_plates`.
+
+Producers keep one `plate_activity` document per normalized plate up to date as
+they store detections (see `record_plate_activity` in
+LPR_Notifications/lpr_helpers.py). Run this once to seed the summaries from the
+existing history, or again after bulk changes (archiving, re-extraction). It
+recomputes last/first seen, last camera, total count, the rolling 30-day daily
+and 24-hour hourly buckets and the owner, and replaces each summary. Detections
+stored while it runs may be missed until their plate is seen again.
+
+Usage:
+  python rebuild_plate_activity.py            # rebuild every plate
+  python rebuild_plate_activity.py --dry-run  # report without writing
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime, timedelta
+from pymongo import MongoClient, ReplaceOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import sanitize_plate, PLATE_ACTIVITY_DAYS, PLATE_ACTIVITY_HOURS
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Rebuild plate_activity from license_plates')
+    p.add_argument('--batch-size', type=int, default=1000, help='Summaries per bulk_write')
+    p.add_argument('--dry-run', action='store_true', help='Report counts without writing')
+    return p.parse_args()
+
+
+def summarize(plates, now):
+    """Return {PLATE: summary} in four server-side groupings (lifetime, owner, daily, hourly)."""
+    day_cutoff = datetime(now.year, now.month, now.day) - timedelta(days=PLATE_ACTIVITY_DAYS - 1)
+    hour_cutoff = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=PLATE_ACTIVITY_HOURS - 1)
+    summaries = {}
+
+    lifetime = plates.aggregate([
+        {'$match': {'timestamp': {'$type': 'date'}, 'license_plate': {'$type': 'string'}}},
+        {'$sort': {'timestamp': 1}},
+        {'$group': {
+            '_id': '$license_plate',
+            'first_seen': {'$first': '$timestamp'},
+            'last_seen': {'$last': '$timestamp'},
+            'last_camera': {'$last': {'$ifNull': ['$camera_name', '$camera_id']}},
+            'count': {'$sum': 1},
+        }},
+    ], allowDiskUse=True)
+    # Latest known owner per raw plate; $last keeps one owner per group instead of every read's
+    owners = {row['_id']: row for row in plates.aggregate([
+        {'$match': {'timestamp': {'$type': 'date'}, 'license_plate': {'$type': 'string'},
+                    'user_email': {'$nin': [None, '', 'unknown']}}},
+        {'$sort': {'timestamp': 1}},
+        {'$group': {'_id': '$license_plate', 't': {'$last': '$timestamp'},
+                    'e': {'$last': '$user_email'}, 'n': {'$last': '$user_name'}}},
+    ], allowDiskUse=True)}
+    for row in lifetime:
+        row['owner'] = owners.get(row['_id'])
+        plate = sanitize_plate(row['_id'])
+        if not plate:
+            continue
+        s = summaries.get(plate)
+        if s is None:
+            s = summaries[plate] = {'_id': plate, 'first_seen': row['first_seen'], 'last_seen': row['last_seen'],
+                                    'last_camera': row['last_camera'], 'count': 0, 'daily': {}, 'hourly': {}}
+        # Raw plates that normalize to the same value are folded together
+        s['count'] += row['count']
+        s['first_seen'] = min(s['first_seen'], row['first_seen'])
+        if row['last_seen'] >= s['last_seen']:
+            s['last_seen'], s['last_camera'] = row['last_seen'], row['last_camera']
+            if row.get('owner'):
+                s['user_email'], s['user_name'] = row['owner']['e'], row['owner'].get('n') or 'Unknown'
+        elif row.get('owner') and 'user_email' not in s:
+            s['user_email'], s['user_name'] = row['owner']['e'], row['owner'].get('n') or 'Unknown'
+
+    for field, cutoff, unit in (('daily', day_cutoff, 'day'), ('hourly', hour_cutoff, 'hour')):
+        # $dateTrunc needs MongoDB 5.0; buckets are UTC
+        rows = plates.aggregate([
+            {'$match': {'timestamp': {'$gte': cutoff}, 'license_plate': {'$type': 'string'}}},
+            {'$group': {'_id': {'p': '$license_plate', 't': {'$dateTrunc': {'date': '$timestamp', 'unit': unit}}},
+                        'n': {'$sum': 1}}},
+        ], allowDiskUse=True)
+        for row in rows:
+            plate = sanitize_plate(row['_id']['p'])
+            if plate in summaries:
+                buckets = summaries[plate][field]
+                buckets[row['_id']['t']] = buckets.get(row['_id']['t'], 0) + row['n']
+
+    for s in summaries.values():
+        for field in ('daily', 'hourly'):
+            s[field] = [{'t': t, 'n': n} for t, n in sorted(s[field].items())]
+        s['updated_at'] = now
+    return summaries
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+
+    try:
+        started = time.time()
+        summaries = summarize(db['license_plates'], datetime.utcnow())
+        active = sum(1 for s in summaries.values() if s['daily'])
+        print(f"Summarized {len(summaries)} plates ({active} seen in the last {PLATE_ACTIVITY_DAYS} days) "
+              f"in {time.time() - started:.1f}s")
+        if args.dry_run:
+            return
+
+        ops = [ReplaceOne({'_id': plate}, s, upsert=True) for plate, s in summaries.items()]
+        for i in range(0, len(ops), args.batch_size):
+            db['plate_activity'].bulk_write(ops[i:i + args.batch_size], ordered=False)
+        stale = db['plate_activity'].delete_many({'_id': {'$nin': list(summaries)}}).deleted_count
+        print(f"✓ plate_activity rebuilt: {len(ops)} summaries written, {stale} stale removed")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
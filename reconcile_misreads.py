@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Link historical detections of misread plates to their registered owners.
+
+Loads the distinct plates of detections still at `user_email: 'unknown'` and
+every plate registered in `users_cache`/`visitors`, and computes the edit
+distance between every unknown and every registered plate. Distances are taken
+over the confusable-normalized alphabet of LPR_Notifications/lpr_fuzzy.py, so
+O/0, I/1, B/8 and S/5 substitutions cost nothing; adjacent swaps count as one
+edit. The unknown plates are split into chunks that run on a process pool;
+each chunk is one `rapidfuzz.process.cdist` distance matrix when rapidfuzz is
+installed, otherwise a NumPy dynamic program vectorized across all registered
+plates, otherwise the symmetric-deletion index from lpr_fuzzy.py.
+
+A link is proposed when exactly one owner holds the nearest registered plate,
+within --max-distance edits, scoring at least --min-score (see `match_score`).
+Proposals are applied with bulk `UpdateMany` writes that set the owner fields
+and a `misread_link` audit field (matched plate, distance, score, run time);
+the raw `license_plate` is kept. Reads that are exactly a registered plate are
+left to consolidate_lpr_data.py. `--undo` reverts every linked detection.
+
+Usage:
+  python reconcile_misreads.py --dry-run           # print proposals only
+  python reconcile_misreads.py                     # apply proposals
+  python reconcile_misreads.py --max-distance 2 --min-score 0.7
+  python reconcile_misreads.py --undo              # revert misread links
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from pymongo import MongoClient, UpdateMany
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import plate_key, load_plate_owners
+from LPR_Notifications.lpr_fuzzy import PlateFuzzyIndex, fuzzy_key, max_edits, match_score
+
+try:
+    import numpy as np
+except ImportError:  # optional: vectorized distances
+    np = None
+
+try:
+    from rapidfuzz.process import cdist
+    from rapidfuzz.distance import OSA
+except ImportError:  # optional: fastest distance matrix
+    cdist = None
+
+JOB_ID = 'reconcile_misreads'
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Link unknown detections to registered plates they are misreads of')
+    p.add_argument('--max-distance', type=int, default=1, help='Maximum edits after confusable folding (1 for short plates)')
+    p.add_argument('--min-score', type=float, default=0.8, help='Minimum match score to link')
+    p.add_argument('--chunk-size', type=int, default=2000, help='Unknown plates per worker task')
+    p.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    p.add_argument('--backend', choices=('auto', 'rapidfuzz', 'numpy', 'index'), default='auto')
+    p.add_argument('--batch-size', type=int, default=500, help='UpdateMany operations per bulk_write')
+    p.add_argument('--dry-run', action='store_true', help='Print proposals without writing')
+    p.add_argument('--undo', action='store_true', help='Revert detections linked by this job')
+    return p.parse_args()
+
+
+def pick_backend(name):
+    if name == 'auto':
+        return 'rapidfuzz' if cdist is not None and np is not None else 'numpy' if np is not None else 'index'
+    if name == 'rapidfuzz' and (cdist is None or np is None):
+        raise SystemExit('rapidfuzz backend requested but rapidfuzz/numpy is not installed')
+    if name == 'numpy' and np is None:
+        raise SystemExit('numpy backend requested but numpy is not installed')
+    return name
+
+
+# Worker state, set once per process by _init_worker
+_registered = []
+_encoded = None
+_lengths = None
+_index = None
+_backend = None
+_max_distance = 1
+
+
+def _init_worker(registered, backend, max_distance):
+    global _registered, _encoded, _lengths, _index, _backend, _max_distance
+    _registered, _backend, _max_distance = registered, backend, max_distance
+    if backend == 'numpy':
+        # Column-major (position, plate) so every DP step reads contiguous memory
+        width = max(len(k) for k in registered)
+        _encoded = np.zeros((width, len(registered)), dtype=np.uint8)
+        for i, key in enumerate(registered):
+            _encoded[:len(key), i] = np.frombuffer(key.encode('ascii'), dtype=np.uint8)
+        _lengths = np.array([len(k) for k in registered], dtype=np.intp)
+    elif backend == 'index':
+        _index = PlateFuzzyIndex(registered, max_distance=max_distance)
+
+
+def _numpy_distances(key):
+    """OSA distance from key to every registered key; each DP cell is one vectorized step."""
+    width, rows = _encoded.shape
+    chars = key.encode('ascii')
+    prev2 = None
+    prev = np.repeat(np.arange(width + 1, dtype=np.uint8)[:, None], rows, axis=1)
+    for i in range(1, len(chars) + 1):
+        differs = _encoded != chars[i - 1]
+        cur = np.empty_like(prev)
+        cur[0] = i
+        for j in range(1, width + 1):
+            step = cur[j]
+            np.add(prev[j - 1], differs[j - 1], out=step)
+            np.minimum(step, prev[j] + 1, out=step)
+            np.minimum(step, cur[j - 1] + 1, out=step)
+            if i > 1 and j > 1:
+                swap = (_encoded[j - 2] == chars[i - 1]) & (_encoded[j - 1] == chars[i - 2])
+                np.minimum(step, np.where(swap, prev2[j - 2] + 1, step), out=step)
+        prev2, prev = prev, cur
+    return prev[_lengths, np.arange(rows)]
+
+
+def _best_in_row(distances, budget):
+    """Return (distance, [registered indexes]) of the nearest keys."""
+    best = int(distances.min())
+    if best > budget:
+        return None
+    return best, [int(i) for i in np.flatnonzero(distances == best)]
+
+
+def match_chunk(keys):
+    """Return [(key, distance, [registered keys at that distance])] for the matched keys of a chunk."""
+    results = []
+    if _backend == 'rapidfuzz':
+        matrix = cdist(keys, _registered, scorer=OSA.distance, score_cutoff=_max_distance, dtype=np.int32, workers=1)
+        for key, row in zip(keys, matrix):
+            best = _best_in_row(row, max_edits(key, _max_distance))
+            if best:
+                results.append((key, best[0], [_registered[i] for i in best[1]]))
+    elif _backend == 'numpy':
+        for key in keys:
+            best = _best_in_row(_numpy_distances(key), max_edits(key, _max_distance))
+            if best:
+                results.append((key, best[0], [_registered[i] for i in best[1]]))
+    else:
+        for key in keys:
+            matches = _index.lookup(key, limit=10)
+            if matches and matches[0].distance <= max_edits(key, _max_distance):
+                best = matches[0].distance
+                results.append((key, best, [m.plate for m in matches if m.distance == best]))
+    return results
+
+
+def load_unknown_plates(plates):
+    """Return {raw plate: detection count} for detections without an owner."""
+    rows = plates.aggregate([
+        {'$match': {'user_email': 'unknown', 'license_plate': {'$type': 'string'}}},
+        {'$group': {'_id': '$license_plate', 'count': {'$sum': 1}}},
+    ], allowDiskUse=True)
+    return {row['_id']: row['count'] for row in rows}
+
+
+def propose(unknown, owners, args):
+    """Return (proposals, ambiguous) where each proposal is (raw plate, registered plate, distance, score)."""
+    by_key = {}
+    for plate in owners:
+        key = fuzzy_key(plate)
+        if key:
+            by_key.setdefault(key, []).append(plate)
+    registered = sorted(by_key)
+
+    raw_by_key = {}
+    for plate in unknown:
+        key = fuzzy_key(plate)
+        if key:
+            raw_by_key.setdefault(key, []).append(plate)
+    keys = sorted(raw_by_key)
+    if not keys or not registered:
+        return [], 0
+
+    backend = pick_backend(args.backend)
+    print(f"Matching {len(keys):,} unknown keys x {len(registered):,} registered keys "
+          f"({backend}, {args.workers} workers, chunks of {args.chunk_size})")
+    chunks = [keys[i:i + args.chunk_size] for i in range(0, len(keys), args.chunk_size)]
+    started = time.time()
+    matched = []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(registered, backend, args.max_distance)) as pool:
+        for done, results in enumerate(pool.map(match_chunk, chunks), 1):
+            matched.extend(results)
+            print(f"Progress: {done}/{len(chunks)} chunks ({time.time() - started:.1f}s)")
+
+    proposals, ambiguous = [], 0
+    for key, distance, keys_at_best in matched:
+        # Short registered plates only match within one edit, as in the capture-time index
+        candidates = [p for k in keys_at_best if distance <= max_edits(k, args.max_distance) for p in by_key[k]]
+        if not candidates:
+            continue
+        # Several nearest plates are fine as long as they belong to the same owner
+        if len({owners[p]['user_email'] for p in candidates}) != 1:
+            ambiguous += 1
+            continue
+        target = candidates[0]
+        for raw in raw_by_key[key]:
+            # Exact registrations are consolidate_lpr_data.py's job, not misreads
+            if plate_key(raw) == plate_key(target):
+                continue
+            score = round(match_score(raw, target, distance), 3)
+            if score >= args.min_score:
+                proposals.append((raw, target, distance, score))
+    return proposals, ambiguous
+
+
+def apply_links(plates, proposals, owners, batch_size):
+    now = datetime.utcnow()
+    ops = []
+    for raw, target, distance, score in proposals:
+        info = owners[target]
+        ops.append(UpdateMany(
+            {'license_plate': raw, 'user_email': 'unknown'},
+            {'$set': {
+                'user_name': info['user_name'],
+                'user_email': info['user_email'],
+                'user_source': info['source'],
+                'misread_link': {'plate': target, 'distance': distance, 'score': score,
+                                 'linked_at': now, 'job': JOB_ID},
+            }},
+        ))
+    # Owner relinks (consolidate_lpr_data.py, lpr_owner_relinker.py) find linked misreads by target plate
+    plates.create_index('misread_link.plate', sparse=True)
+    updated = 0
+    for i in range(0, len(ops), batch_size):
+        updated += plates.bulk_write(ops[i:i + batch_size], ordered=False).modified_count
+    return updated
+
+
+def undo_links(plates):
+    result = plates.update_many(
+        {'misread_link.job': JOB_ID},
+        {'$set': {'user_name': 'Unknown', 'user_email': 'unknown'}, '$unset': {'user_source': '', 'misread_link': ''}},
+    )
+    return result.modified_count
+
+
+def main():
+    args = parse_args()
+
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    db = client[mongo_db]
+    plates = db['license_plates']
+
+    try:
+        if args.undo:
+            print(f"↩️  Reverted {undo_links(plates)} linked detections")
+            return
+
+        started = time.time()
+        unknown = load_unknown_plates(plates)
+        owners = load_plate_owners(db)
+        print(f"🔎 {len(unknown):,} distinct unknown plates ({sum(unknown.values()):,} detections), "
+              f"{len(owners):,} registered plates")
+
+        proposals, ambiguous = propose(unknown, owners, args)
+        detections = sum(unknown[raw] for raw, *_ in proposals)
+        print(f"\n🔗 {len(proposals):,} plates to link ({detections:,} detections), {ambiguous:,} ambiguous skipped")
+        for raw, target, distance, score in sorted(proposals, key=lambda p: -unknown[p[0]])[:20]:
+            print(f"  {raw} -> {target} ({owners[target]['user_email']}) distance={distance} "
+                  f"score={score:.2f} detections={unknown[raw]}")
+
+        if not args.dry_run and proposals:
+            updated = apply_links(plates, proposals, owners, args.batch_size)
+            print(f"\n✓ Linked {updated:,} detections")
+        print(f"Elapsed: {time.time() - started:.1f}s")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
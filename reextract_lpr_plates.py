@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Re-run plate extraction over stored raw event payloads and fix historical detections.
+
+When extraction rules change (plate sanitizing, confidence scaling, vehicle
+attribute flattening), detections keep the values they were stored with and
+Protect no longer has the old events. This job reads each detection's raw
+payload from the `event_raw` side store (see offload_event_raw.py), applies
+the current pipeline in LPR_Notifications/lpr_extract.py and diffs the result
+against the stored document. Only fields that changed are written, with bulk
+`UpdateOne`s, plus a `reextracted_at` timestamp. When the plate itself changes
+the owner fields are looked up again (detections linked by
+reconcile_misreads.py keep their owner). Detections without a stored payload
+are counted and left alone.
+
+The collection is split into `_id` ranges that run on a process pool; each
+range checkpoints its progress in `lpr_job_state`, and the range plan is saved
+with them, so an interrupted run resumes every range where it stopped.
+
+Usage:
+  python reextract_lpr_plates.py --dry-run              # count and print diffs only
+  python reextract_lpr_plates.py                        # apply (resumable)
+  python reextract_lpr_plates.py --workers 8 --partitions 32
+  python reextract_lpr_plates.py --restart              # new range plan, ignore checkpoints
+"""
+
+import os
+import time
+import argparse
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from LPR_Notifications.lpr_helpers import UNKNOWN_OWNER, load_plate_owners, load_job_state, save_job_state
+from LPR_Notifications.lpr_event_raw import RAW_COLLECTION, decode_raw
+from LPR_Notifications.lpr_extract import extract_detection
+
+JOB_ID = 'reextract_lpr_plates'
+COMPARED = ('license_plate', 'confidence', 'vehicle_data', 'color', 'vehicle_type', 'group', 'plate_key', 'plate_ngrams')
+PROJECTION = dict.fromkeys(COMPARED + ('event_id', 'protect_event_id', 'user_email', 'misread_link'), 1)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Recompute detection fields from stored raw event payloads')
+    p.add_argument('--collection', default='license_plates')
+    p.add_argument('--workers', type=int, default=os.cpu_count())
+    p.add_argument('--partitions', type=int, default=0, help='_id ranges (default: 4 per worker)')
+    p.add_argument('--batch-size', type=int, default=1000)
+    p.add_argument('--restart', action='store_true', help='Plan new ranges and ignore checkpoints')
+    p.add_argument('--dry-run', action='store_true', help='Count and show diffs without writing')
+    p.add_argument('--show-diffs', type=int, default=10, help='Example diffs to print')
+    return p.parse_args()
+
+
+def connect():
+    mongo_url = os.getenv('MONGO_URL')
+    mongo_db = os.getenv('MONGODB_DATABASE', 'web-portal')
+    if mongo_url:
+        client = MongoClient(mongo_url)
+    else:
+        mongo_host = os.getenv('MONGODB_HOST', 'localhost')
+        mongo_port = os.getenv('MONGODB_PORT', '27017')
+        client = MongoClient(f"{mongo_host}:{mongo_port}")
+    return client, client[mongo_db]
+
+
+def plan_partitions(coll, count):
+    """Split the collection into `count` _id ranges of equal insert-time span: [(lo, hi)], hi exclusive."""
+    first = coll.find_one({}, {'_id': 1}, sort=[('_id', 1)])
+    last = coll.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+    if not first:
+        return []
+    if not isinstance(first['_id'], ObjectId) or not isinstance(last['_id'], ObjectId):
+        return [(None, None)]
+    lo = first['_id'].generation_time.timestamp()
+    hi = last['_id'].generation_time.timestamp() + 1
+    step = (hi - lo) / count
+    bounds = sorted({ObjectId.from_datetime(datetime.utcfromtimestamp(lo + step * i)) for i in range(1, count)})
+    bounds = [b for b in bounds if b > first['_id']]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def diff_fields(doc, fields):
+    """Return {field: new value} for extracted fields that differ from the stored document."""
+    return {k: v for k, v in fields.items() if k in COMPARED and doc.get(k) != v}
+
+
+def process_range(collection, index, lo, hi, batch_size, dry_run, show_diffs):
+    """Worker: re-extract range number `index`, _ids in [lo, hi). Returns counters and example diffs."""
+    client, db = connect()
+    coll = db[collection]
+    raw = db[RAW_COLLECTION]
+    state_id = f"{JOB_ID}:{collection}:{index}"
+    state = {} if dry_run else load_job_state(db, state_id)
+    if state.get('done'):
+        client.close()
+        return Counter(), []
+    last_id = state.get('last_id')
+    owners = load_plate_owners(db)
+    counts = Counter()
+    examples = []
+    try:
+        while True:
+            bounds = {}
+            if last_id is not None:
+                bounds['$gt'] = last_id
+            elif lo is not None:
+                bounds['$gte'] = lo
+            if hi is not None:
+                bounds['$lt'] = hi
+            docs = list(coll.find({'_id': bounds} if bounds else {}, PROJECTION).sort('_id', 1).limit(batch_size))
+            if not docs:
+                break
+            keys = {doc['_id']: doc.get('event_id') or doc.get('protect_event_id') or doc['_id'] for doc in docs}
+            payloads = {r['_id']: r for r in raw.find({'_id': {'$in': list(set(keys.values()))}})}
+            ops = []
+            now = datetime.utcnow()
+            for doc in docs:
+                counts['scanned'] += 1
+                stored = payloads.get(keys[doc['_id']])
+                if not stored:
+                    counts['no_payload'] += 1
+                    continue
+                try:
+                    fields = extract_detection(decode_raw(stored))
+                except Exception:
+                    counts['unparseable'] += 1
+                    continue
+                if not fields:
+                    counts['no_plate'] += 1
+                    continue
+                changed = diff_fields(doc, fields)
+                if 'license_plate' in changed and not doc.get('misread_link'):
+                    info = owners.get(changed['license_plate'].upper(), UNKNOWN_OWNER)
+                    for k in ('user_email', 'user_name'):
+                        changed[k] = info[k]
+                if not changed:
+                    continue
+                counts['changed'] += 1
+                counts.update(f"field:{k}" for k in changed)
+                if len(examples) < show_diffs:
+                    examples.append((doc['_id'], {k: (doc.get(k), v) for k, v in changed.items()}))
+                ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {**changed, 'reextracted_at': now}}))
+            if ops and not dry_run:
+                coll.bulk_write(ops, ordered=False)
+            last_id = docs[-1]['_id']
+            if not dry_run:
+                save_job_state(db, state_id, {'last_id': last_id, 'updated_at': now})
+        if not dry_run:
+            save_job_state(db, state_id, {'done': True, 'updated_at': datetime.utcnow()})
+    finally:
+        client.close()
+    return counts, examples
+
+
+def main():
+    args = parse_args()
+    client, db = connect()
+    started = time.time()
+    try:
+        plan_id = f"{JOB_ID}:{args.collection}"
+        plan = None if args.restart or args.dry_run else load_job_state(db, plan_id).get('partitions')
+        if not plan:
+            if args.restart:
+                db['lpr_job_state'].delete_many({'_id': {'$regex': f"^{JOB_ID}:{args.collection}:"}})
+            plan = plan_partitions(db[args.collection], args.partitions or args.workers * 4)
+            if not args.dry_run:
+                save_job_state(db, plan_id, {'partitions': [list(p) for p in plan], 'updated_at': datetime.utcnow()})
+    finally:
+        client.close()
+    if not plan:
+        print(f"{args.collection} is empty")
+        return
+
+    print(f"🔁 Re-extracting {args.collection} in {len(plan)} _id ranges on {args.workers} workers"
+          f"{' (dry run)' if args.dry_run else ''}")
+    totals = Counter()
+    examples = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(process_range, args.collection, i, lo, hi, args.batch_size, args.dry_run, args.show_diffs)
+                   for i, (lo, hi) in enumerate(plan)]
+        for done, future in enumerate(as_completed(futures), 1):
+            counts, found = future.result()
+            totals.update(counts)
+            examples.extend(found)
+            print(f"Progress: {done}/{len(plan)} ranges, {totals['scanned']:,} scanned, "
+                  f"{totals['changed']:,} changed ({time.time() - started:.1f}s)")
+
+    verb = 'would change' if args.dry_run else 'changed'
+    print(f"\n✓ {totals['scanned']:,} scanned, {totals['changed']:,} {verb}, "
+          f"{totals['no_payload']:,} without raw payload, {totals['no_plate']:,} without a plate, "
+          f"{totals['unparseable']:,} unparseable")
+    for key, n in sorted(totals.items()):
+        if key.startswith('field:'):
+            print(f"  {key[6:]}: {n:,}")
+    for _id, changes in examples[:args.show_diffs]:
+        print(f"\n  {_id}")
+        for field, (old, new) in changes.items():
+            print(f"    {field}: {old!r} -> {new!r}")
+    print(f"Elapsed: {time.time() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()